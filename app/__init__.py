@@ -2,29 +2,35 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-import requests
-import xml.dom.minidom
 import json
 import threading
+import time
 from flask_apscheduler import APScheduler
 from datetime import datetime, timedelta
 import pytz
 from sqlalchemy import func
 from flask import jsonify
 from flask import request
+from flask import current_app, url_for
+from flask import Response, stream_with_context
+from dotenv import load_dotenv
+
+# config reads the environment when it is imported, so .env goes first
+load_dotenv()
+
 from config import app_config
 import sqlite3
 from flask import render_template
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from passlib.hash import pbkdf2_sha256
 import os
-from dotenv import load_dotenv
 
 db = SQLAlchemy()
 # login_manager = LoginManager()
 lock = threading.Lock()
-
-load_dotenv()  # Add this after imports
+# The application whose scheduler runs the jobs, set by create_app so the
+# jobs push a context on it instead of building a new app every run
+scheduled_app = None
 
 def map_frontend_custno_to_actual(custnos):
     """
@@ -49,7 +55,7 @@ class Config:
     JOBS = [
         {
             'id': 'job1',
-            'func': 'app.__init__:fetch_and_store_fund_data',
+            'func': 'app:fetch_and_store_fund_data',
             'args': (1, 2), 
             'trigger': 'cron',
             'day_of_week': 'mon-sun', 
@@ -64,16 +70,47 @@ class Config:
 
 def create_app(config_name):
     app = Flask(__name__, instance_relative_config=True)
-    app.config.from_object(app_config["default"])
+    app.config.from_object(app_config.get(config_name, app_config["default"]))
     # app.config.from_pyfile('config.py')
     # app.config.from_object(Config())
     db.init_app(app)
 
+    # Snapshot ids are only meaningful for the database this app is bound to
+    from app.snapshots import snapshot_cache
+    snapshot_cache.clear()
+    snapshot_cache.configure(app.config.get('SNAPSHOT_CACHE_MAX_ENTRIES'), app.config.get('SNAPSHOT_CACHE_MAX_BYTES'))
+
+    from app.jobs import refresh_queue
+    refresh_queue.configure(app.config.get('REFRESH_MAX_WORKERS'), app.config.get('REFRESH_JOB_HISTORY'))
+
+    from app.compression import codec, load_dictionaries
+    codec.configure(load_dictionaries(app.config.get('PAYLOAD_ZDICT')), app.config.get('PAYLOAD_COMPRESS_LEVEL'))
+
+    # orjson for jsonify when installed, compressed API bodies
+    from app.encoding import compress_response, json_provider
+    app.json = json_provider(app)
+
+    @app.after_request
+    def encode_api_response(response):
+        if request.path.startswith('/api/funds/') and app.config.get('COMPRESS_LEVEL'):
+            return compress_response(response, app.config.get('COMPRESS_MIN_SIZE', 1024), app.config['COMPRESS_LEVEL'])
+        return response
+
+    # Not cleared: a memory backend starts empty, the SQLite file is shared
+    # with the workers already running
+    from app.response_cache import cache_path, make_backend, response_cache
+    response_cache.configure(make_backend(app), cache_path(app) + ".generation")
+
     scheduler = APScheduler()                  # Instantiate APScheduler
     # it is also possible to enable the API directly
     scheduler.api_enabled = True
     scheduler.init_app(app)                    # Put the job list into flask
-    scheduler.start()                          # Start the job list
+    # Every worker starts it paused, only the elected leader runs the jobs
+    from app.leader import LeaderElector, make_lease
+    lease = make_lease(app)
+    scheduler.start(paused=lease is not None)  # Start the job list
+    global scheduled_app
+    scheduled_app = app
 
     # --- flask-login setup ---
     login_manager = LoginManager()
@@ -89,12 +126,20 @@ def create_app(config_name):
 
     # Initialize database
     with app.app_context():
+        from app.engine import apply_sqlite_pragmas
+        apply_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS'))
         try:
             # Create all database tables
             db.create_all()
             print("✅ Database tables created successfully")
         except Exception as e:
             print(f"⚠️  Database initialization warning: {e}")
+        from app.columnar import init_column_store
+        init_column_store(app)
+
+    if lease is not None:
+        interval = app.config.get('SCHEDULER_LEASE_TTL', 60) / 3
+        app.extensions['scheduler_leader'] = LeaderElector(lease, scheduler, interval).start()
 
     # Home page
     @app.route('/')
@@ -108,14 +153,18 @@ def create_app(config_name):
         return jsonify({
             'status': 'healthy',
             'timestamp': datetime.now().isoformat(),
-            'service': 'fund-monitoring-system'
+            'service': 'fund-monitoring-system',
+            # Whether this process runs the scheduled jobs
+            'scheduler_leader': app.extensions['scheduler_leader'].leader if 'scheduler_leader' in app.extensions else True
         })
 
     # Get today's fund changes (text format)
     @app.route('/api/funds/today-changes', methods=['GET', 'POST'])
     @login_required
     def get_today_fund_changes():
-        from app.models import JsonString
+        from app.conditional import snapshot_validators
+        from app.deltas import changed, load_deltas
+        from app.pointers import snapshot_pair
         custno = request.args.get("custno")
         if not custno:
             return "Missing custno parameter", 400
@@ -123,51 +172,31 @@ def create_app(config_name):
         # Map frontend custno to actual custno
         actual_custno = map_frontend_custno_to_actual([custno])[0]
         
-        # Find the latest record
-        peter1 = JsonString.query.filter_by(custno=actual_custno).order_by(JsonString.date.desc(), JsonString.id.desc()).first()
+        # The latest record and the previous record with a different date
+        peter1, lastpeter1 = snapshot_pair(actual_custno)
         if not peter1:
             return "No data for this custno", 404
-        # Find the previous record with a different date
-        lastpeter1 = JsonString.query.filter(JsonString.custno==actual_custno, JsonString.date < peter1.date).order_by(JsonString.date.desc(), JsonString.id.desc()).first()
         if not lastpeter1:
             return f"No valid comparison data: could not find data before {peter1.date}"
-        try:
-            jsonObject = json.loads(peter1.jsonString)
-            lastJsonObject = json.loads(lastpeter1.jsonString)
-        except json.JSONDecodeError:
-            return "Fund data format error", 500
-        navInfo = {}
-        for item in jsonObject[0]:
-            navInfo[item["fundcode"]] = float(item["nav"])
-        volInfo = {}
-        for item in jsonObject[0]:
-            if item["fundcode"] in volInfo:
-                volInfo[item["fundcode"]] = volInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                volInfo[item["fundcode"]] = float(item["fundvol"])
-        lastVolInfo = {}
-        for item in lastJsonObject[0]:
-            if item["fundcode"] in lastVolInfo:
-                lastVolInfo[item["fundcode"]] = lastVolInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                lastVolInfo[item["fundcode"]] = float(item["fundvol"])
-        newVolInfo = {}
-        for k, v in volInfo.items():
-            newVolInfo[k] = volInfo[k] - lastVolInfo.get(k, 0)
+        validators = snapshot_validators(peter1, lastpeter1)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
         # Show both dates in the result
         result_string = f'Fund share changes (custno={custno})\nDate comparison: {peter1.date} vs {lastpeter1.date}\n'
-        for k, v in newVolInfo.items():
-            if v != 0.0:
-                result_string = result_string + f"{k}: Share change {v}, Amount change {v * navInfo[k]}\n"
+        for k, share, amount in changed(load_deltas(peter1.id, lastpeter1.id)):
+            result_string = result_string + f"{k}: Share change {share}, Amount change {amount}\n"
         if result_string == f'Fund share changes (custno={custno})\nDate comparison: {peter1.date} vs {lastpeter1.date}\n':
             result_string += "No fund changes today"
-        return result_string
+        return validators.apply(result_string)
 
     # Get fund net asset value changes (processed, JSON format)
     @app.route('/api/funds/nav-changes', methods=['GET', 'POST'])
     @login_required
     def get_fund_nav_changes():
-        from app.models import JsonString
+        from app.conditional import snapshot_validators
+        from app.deltas import changed, load_deltas
+        from app.pointers import snapshot_pair
         # Get custno parameter if provided
         custno = request.args.get("custno")
         
@@ -176,90 +205,47 @@ def create_app(config_name):
         lastday = (datetime.now(tz) + timedelta(days=-1)).strftime('%Y%m%d')
         print("date: " + nowdate + " " + lastday)
 
-        # Query data for specific custno if provided, otherwise get any latest data
+        # Query data for specific custno if provided, otherwise for the
+        # custno with the latest data
         if custno:
             # Convert frontend custno to actual custno
             actual_custno = map_frontend_custno_to_actual([custno])[0]
-            # Find the latest record for this custno
-            peter1 = JsonString.query.filter_by(custno=actual_custno).order_by(JsonString.date.desc(), JsonString.id.desc()).first()
+            # The latest record and the previous record with a different date
+            peter1, lastpeter1 = snapshot_pair(actual_custno)
             if not peter1:
                 return jsonify({"error": f"Customer {custno} has no data"}), 404
-            
-            # Find the previous record with a different date for this custno
-            lastpeter1 = JsonString.query.filter(JsonString.custno==actual_custno, JsonString.date < peter1.date).order_by(JsonString.date.desc(), JsonString.id.desc()).first()
             if not lastpeter1:
                 return jsonify({"error": f"Customer {custno} has no valid comparison data: could not find data before {peter1.date}"}), 404
         else:
-            # Check if there is data
-            max_id = db.session.query(func.max(JsonString.id)).scalar()
-            if not max_id:
-                return jsonify({"error": "No fund data available, please run the data fetching task first"}), 404
-
-            peter1 = JsonString.query.filter_by(id=max_id).first()
+            peter1, lastpeter1 = snapshot_pair()
             if not peter1:
-                return jsonify({"error": "Unable to get latest fund data"}), 404
-
-            # Check if there is previous day's data
-            if max_id <= 1:
-                return jsonify({"error": "Not enough historical data for comparison"}), 404
-
-            lastpeter1 = JsonString.query.filter_by(id=max_id - 1).first()
+                return jsonify({"error": "No fund data available, please run the data fetching task first"}), 404
             if not lastpeter1:
-                return jsonify({"error": "Unable to get historical fund data"}), 404
-
-        try:
-            jsonObject = json.loads(peter1.jsonString)
-            lastJsonObject = json.loads(lastpeter1.jsonString)
-        except json.JSONDecodeError:
-            return jsonify({"error": "Fund data format error"}), 500
-
-        navInfo = {}
-        for item in jsonObject[0]:
-            navInfo[item["fundcode"]] = float(item["nav"])
-
-        volInfo = {}
-        for item in jsonObject[0]:
-            if item["fundcode"] in volInfo:
-                volInfo[item["fundcode"]] = volInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                volInfo[item["fundcode"]] = float(item["fundvol"])
-
-        for k, v in volInfo.items():
-            print(str(k) + " : " + str(v))
-
-        lastVolInfo = {}
-        for item in lastJsonObject[0]:
-            if item["fundcode"] in lastVolInfo:
-                lastVolInfo[item["fundcode"]] = lastVolInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                lastVolInfo[item["fundcode"]] = float(item["fundvol"])
-
-        newVolInfo = {}
-        for k, v in volInfo.items():
-            if k in volInfo and k not in lastVolInfo:
-                newVolInfo[k] = volInfo[k]
-            elif k not in volInfo and k in lastVolInfo:
-                newVolInfo[k] = 0 - lastVolInfo[k]
-            else:
-                newVolInfo[k] = volInfo[k] - lastVolInfo.get(k, 0)
+                return jsonify({"error": "Not enough historical data for comparison"}), 404
+        validators = snapshot_validators(peter1, lastpeter1)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
 
+        # Only include funds with non-zero share changes
         returnVolInfo = {}
-        for k, v in newVolInfo.items():
-            if v != 0.0:  # Only include funds with non-zero share changes
-                returnVolInfo[k] = v * navInfo[k]
+        for k, share, amount in changed(load_deltas(peter1.id, lastpeter1.id)):
+            returnVolInfo[k] = amount
 
         returnVolInfo["description"] = "processed"
         returnVolInfo["date"] = peter1.date
         if custno:
             returnVolInfo["custno"] = actual_custno
 
-        return jsonify(returnVolInfo)
+        return validators.apply(jsonify(returnVolInfo))
 
     # Get fund net asset value changes (unprocessed, JSON format)
     @app.route('/api/funds/volume-changes', methods=['GET', 'POST'])
     @login_required
     def get_fund_volume_changes():
-        from app.models import JsonString
+        from app.conditional import snapshot_validators
+        from app.deltas import changed, load_deltas
+        from app.pointers import snapshot_pair
         # Get custno parameter if provided
         custno = request.args.get("custno")
         
@@ -268,210 +254,335 @@ def create_app(config_name):
         lastday = (datetime.now(tz) + timedelta(days=-1)).strftime('%Y%m%d')
         print("date: " + nowdate + " " + lastday)
 
-        # Initialize max_id
-        max_id = db.session.query(func.max(JsonString.id)).scalar()
-        if not max_id:
-            return jsonify({"error": "No fund data available, please run the data fetching task first"}), 404
-
-        # Query data for specific custno if provided, otherwise get any latest data
+        # Query data for specific custno if provided, otherwise for the
+        # custno with the latest data
         if custno:
             # Convert frontend custno to actual custno
             actual_custno = map_frontend_custno_to_actual([custno])[0]
-            # Find the latest record for this custno
-            peter1 = JsonString.query.filter_by(custno=actual_custno).order_by(JsonString.date.desc(), JsonString.id.desc()).first()
+            # The latest record and the previous record with a different date
+            peter1, lastpeter1 = snapshot_pair(actual_custno)
             if not peter1:
                 return jsonify({"error": f"Customer {custno} has no data"}), 404
-            
-            # Find the previous record with a different date for this custno
-            lastpeter1 = JsonString.query.filter(JsonString.custno==actual_custno, JsonString.date < peter1.date).order_by(JsonString.date.desc(), JsonString.id.desc()).first()
             if not lastpeter1:
                 return jsonify({"error": f"Customer {custno} has no valid comparison data: could not find data before {peter1.date}"}), 404
         else:
-            peter1 = JsonString.query.filter_by(id=max_id).first()
+            peter1, lastpeter1 = snapshot_pair()
             if not peter1:
-                return jsonify({"error": "Unable to get latest fund data"}), 404
-
-            # Check if there is previous day's data
-            if max_id <= 1:
-                return jsonify({"error": "Not enough historical data for comparison"}), 404
-
-            lastpeter1 = JsonString.query.filter_by(id=max_id - 1).first()
+                return jsonify({"error": "No fund data available, please run the data fetching task first"}), 404
             if not lastpeter1:
-                return jsonify({"error": "Unable to get historical fund data"}), 404
-
-        print("max id - 1  : " + str(max_id - 1))
-
-        try:
-            jsonObject = json.loads(peter1.jsonString)
-            lastJsonObject = json.loads(lastpeter1.jsonString)
-        except json.JSONDecodeError:
-            return jsonify({"error": "Fund data format error"}), 500
+                return jsonify({"error": "Not enough historical data for comparison"}), 404
+        validators = snapshot_validators(peter1, lastpeter1)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
 
         print("peter id   : " + str(peter1.id) + " " + str(lastpeter1.id))
 
-        navInfo = {}
-        for item in jsonObject[0]:
-            navInfo[item["fundcode"]] = float(item["nav"])
-
-        volInfo = {}
-        for item in jsonObject[0]:
-            if item["fundcode"] in volInfo:
-                volInfo[item["fundcode"]] = volInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                volInfo[item["fundcode"]] = float(item["fundvol"])
-
-        for k, v in volInfo.items():
-            print(str(k) + " : " + str(v))
-
-        lastVolInfo = {}
-        for item in lastJsonObject[0]:
-            if item["fundcode"] in lastVolInfo:
-                lastVolInfo[item["fundcode"]] = lastVolInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                lastVolInfo[item["fundcode"]] = float(item["fundvol"])
-
-        for k, v in lastVolInfo.items():
-            print(str(k) + " : " + str(v))
-
-        newVolInfo = {}
-        for k, v in volInfo.items():
-            if k in volInfo and k not in lastVolInfo:
-                newVolInfo[k] = volInfo[k]
-            elif k not in volInfo and k in lastVolInfo:
-                newVolInfo[k] = 0 - lastVolInfo[k]
-            else:
-                newVolInfo[k] = volInfo[k] - lastVolInfo.get(k, 0)
-
+        # Only include funds with non-zero share changes
         filtered_vol_info = {}
-        for k, v in newVolInfo.items():
-            if isinstance(v, (int, float)) and v != 0.0:  # Only include funds with non-zero share changes
-                filtered_vol_info[k] = v
+        for k, share, amount in changed(load_deltas(peter1.id, lastpeter1.id)):
+            filtered_vol_info[k] = share
 
         filtered_vol_info["description"] = "no processed"
         filtered_vol_info["date"] = peter1.date
         if custno:
             filtered_vol_info["custno"] = actual_custno
 
-        return jsonify(filtered_vol_info)
+        return validators.apply(jsonify(filtered_vol_info))
+
+    # Share and amount changes of many custnos in one response
+    @app.route('/api/funds/changes', methods=['GET', 'POST'])
+    @login_required
+    def get_fund_changes():
+        from app.conditional import pair_validators
+        from app.deltas import changed, load_deltas_many
+        from app.pointers import snapshot_pairs
+        requested = [c.strip() for c in request.args.get("custno", "").split(",") if c.strip()]
+        if not requested:
+            return jsonify({"error": "custno parameter cannot be empty"}), 400
+        # Frontend custno -> actual custno, in the order asked for
+        actual = {custno: map_frontend_custno_to_actual([custno])[0] for custno in requested}
+
+        pairs = snapshot_pairs(list(dict.fromkeys(actual.values())))
+        validators = pair_validators(pairs)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
+        deltas = load_deltas_many(
+            (peter1.id, lastpeter1.id) for peter1, lastpeter1 in pairs.values() if peter1 and lastpeter1
+        )
+
+        result = {}
+        for custno, actual_custno in actual.items():
+            peter1, lastpeter1 = pairs[actual_custno]
+            if not peter1:
+                result[custno] = {"custno": actual_custno, "error": f"Customer {custno} has no data"}
+                continue
+            if not lastpeter1:
+                result[custno] = {"custno": actual_custno, "error": f"Customer {custno} has no valid comparison data: could not find data before {peter1.date}"}
+                continue
+            # Both views of the same diff: amounts (processed) and shares
+            rows = changed(deltas[(peter1.id, lastpeter1.id)])
+            result[custno] = {
+                "custno": actual_custno,
+                "date": peter1.date,
+                "previous_date": lastpeter1.date,
+                "nav": {k: amount for k, share, amount in rows},
+                "volume": {k: share for k, share, amount in rows},
+            }
+        return validators.apply(jsonify({"custnos": result}))
 
     # Get fund data for a specific date
     @app.route('/api/funds/by-date', methods=['GET', 'POST'])
     @login_required
     def get_funds_by_date():
-        from app.models import JsonString
+        from app.conditional import snapshot_validators
+        from app.dates import parse_day
+        from app.snapshots import fund_aggregates, latest_on_or_before
 
         str_date = request.args.get("date")
         if not str_date:
             return jsonify({"error": "Date parameter cannot be empty"}), 400
+        try:
+            day = parse_day(str_date)
+        except ValueError:
+            return jsonify({"error": f"Invalid date {str_date}, expected YYYYMMDD"}), 400
+        custno = request.args.get("custno")
+        actual_custno = map_frontend_custno_to_actual([custno])[0] if custno else None
 
-        peter1 = JsonString.query.filter_by(date = str_date).first()
+        # The newest snapshot on or before the date, so weekends and
+        # holidays resolve to the last day with data
+        peter1 = latest_on_or_before(day, actual_custno)
         if not peter1:
             return jsonify({"error": f"Data for date {str_date} not found"}), 404
+        validators = snapshot_validators(peter1)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
 
-        jsonObject = json.loads(peter1.jsonString)
-
-        navInfo = {}
-        for item in jsonObject[0]:
-            navInfo[item["fundcode"]] = float(item["nav"])
-
-        volInfo = {}
-        for item in jsonObject[0]:
-            if item["fundcode"] in volInfo:
-                volInfo[item["fundcode"]] = volInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                volInfo[item["fundcode"]] = float(item["fundvol"])
+        volInfo = fund_aggregates(peter1.id).vol_info()
 
         volInfo["description"] = "special date"
         volInfo["date"] = peter1.date
 
-        return jsonify(volInfo)
+        return validators.apply(jsonify(volInfo))
 
     # Get fund data comparison for a date range
     @app.route('/api/funds/compare', methods=['GET', 'POST'])
     @login_required
     def compare_funds_by_date_range():
-        from app.models import JsonString
+        from app.conditional import snapshot_validators
+        from app.dates import parse_day
+        from app.deltas import changed, load_deltas
+        from app.snapshots import latest_on_or_before
 
         str_datef = request.args.get("datef")
         str_datet = request.args.get("datet")
         
         if not str_datef or not str_datet:
             return jsonify({"error": "Start date and end date parameters cannot be empty"}), 400
+        try:
+            datef, datet = parse_day(str_datef), parse_day(str_datet)
+        except ValueError:
+            return jsonify({"error": "Invalid date, expected YYYYMMDD"}), 400
+        custno = request.args.get("custno")
+        actual_custno = map_frontend_custno_to_actual([custno])[0] if custno else None
 
-        peter1 = JsonString.query.filter_by(date = str_datet).first()
-        lastpeter1 = JsonString.query.filter_by(date = str_datef).first()
+        # Each end resolves to the newest snapshot on or before it, both of
+        # the custno datet resolves to when none is given
+        peter1 = latest_on_or_before(datet, actual_custno)
+        lastpeter1 = latest_on_or_before(datef, peter1.custno) if peter1 else None
         
         if not peter1 or not lastpeter1:
             return jsonify({"error": "Data for the specified dates not found"}), 404
+        validators = snapshot_validators(peter1, lastpeter1)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
 
-        jsonObject = json.loads(peter1.jsonString)
-        lastJsonObject = json.loads(lastpeter1.jsonString)
+        # Only include funds with non-zero share changes
+        deltas = changed(load_deltas(peter1.id, lastpeter1.id))
+        amoutInfo = {}
+        for k, share, amount in deltas:
+            amoutInfo[k] = amount
 
-        navInfo = {}
-        for item in jsonObject[0]:
-            navInfo[item["fundcode"]] = float(item["nav"])
+        amoutInfo["description"] = "arbitrarily / no processed amount : vol"
+        amoutInfo["date"] = peter1.date
+        amoutInfo["amountInfo"] = {k: share for k, share, amount in deltas}
 
-        volInfo = {}
-        for item in jsonObject[0]:
-            if item["fundcode"] in volInfo:
-                volInfo[item["fundcode"]] = volInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                volInfo[item["fundcode"]] = float(item["fundvol"])
+        return validators.apply(jsonify(amoutInfo))
 
-        lastVolInfo = {}
-        for item in lastJsonObject[0]:
-            if item["fundcode"] in lastVolInfo:
-                lastVolInfo[item["fundcode"]] = lastVolInfo[item["fundcode"]] + float(item["fundvol"])
-            else:
-                lastVolInfo[item["fundcode"]] = float(item["fundvol"])
-
-        newVolInfo = {}
-        for k, v in volInfo.items():
-            if k in volInfo and k not in lastVolInfo:
-                newVolInfo[k] = volInfo[k]
-            elif k not in volInfo and k in lastVolInfo:
-                newVolInfo[k] = 0 - lastVolInfo[k]
-            else:
-                newVolInfo[k] = volInfo[k] - lastVolInfo[k]
+    # Time series of one fund of a custno
+    @app.route('/api/funds/history', methods=['GET'])
+    @login_required
+    def get_fund_history():
+        from app.conditional import range_validators, rollup_validators
+        from app.dates import parse_day
+        from app.retention import PERIODS
+        from app.snapshots import fund_history, fund_rollup_history
 
-        amoutInfo = {}
-        for k, v in newVolInfo.items():
-            if v != 0.0:  # Only include funds with non-zero share changes
-                amoutInfo[k] = v * navInfo[k]
+        custno = request.args.get("custno")
+        fundcode = request.args.get("fundcode")
+        if not custno or not fundcode:
+            return jsonify({"error": "custno and fundcode parameters cannot be empty"}), 400
+        try:
+            start = parse_day(request.args["from"]) if request.args.get("from") else None
+            end = parse_day(request.args["to"]) if request.args.get("to") else None
+        except ValueError:
+            return jsonify({"error": "Invalid date, expected YYYYMMDD"}), 400
+        period = request.args.get("period")
+        if period and period not in PERIODS:
+            return jsonify({"error": "period must be week or month"}), 400
+        actual_custno = map_frontend_custno_to_actual([custno])[0]
+        if period:
+            validators = rollup_validators(actual_custno, fundcode, period)
+        else:
+            validators = range_validators(actual_custno, start, end)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
+
+        if period:
+            # Summaries of the snapshots moved to the archive
+            history = fund_rollup_history(actual_custno, fundcode, period, start, end)
+            history["period"] = period
+        else:
+            history = fund_history(actual_custno, fundcode, start, end)
+        history["custno"] = actual_custno
+        history["fundcode"] = fundcode
+        return validators.apply(jsonify(history))
 
-        amoutInfo["description"] = "arbitrarily / no processed amount : vol"
-        amoutInfo["date"] = peter1.date
-        amoutInfo["amountInfo"] = {k: v for k, v in newVolInfo.items() if v != 0.0}  # Filter 0 values in amountInfo
+    # Metadata of the stored snapshots, keyset-paginated and streamed
+    @app.route('/api/funds/snapshots', methods=['GET'])
+    @login_required
+    def list_snapshots():
+        from app.dates import format_day, parse_day
+        from app.snapshots import MAX_LISTING_LIMIT, iter_snapshot_listing
+
+        custno = request.args.get("custno")
+        actual_custno = map_frontend_custno_to_actual([custno])[0] if custno else None
+        try:
+            limit = int(request.args.get("limit", 100))
+            after = None
+            if request.args.get("after"):
+                # Cursor of the last snapshot of the previous page, YYYYMMDD:id
+                day, snapshot_id = request.args["after"].split(":")
+                after = (format_day(parse_day(day)), int(snapshot_id))
+        except ValueError:
+            return jsonify({"error": "Invalid limit or after cursor"}), 400
+        if not 1 <= limit <= MAX_LISTING_LIMIT:
+            return jsonify({"error": f"limit must be between 1 and {MAX_LISTING_LIMIT}"}), 400
+
+        def generate():
+            yield '{"snapshots": ['
+            last = None
+            count = 0
+            for item in iter_snapshot_listing(actual_custno, after, limit):
+                yield ("," if count else "") + app.json.dumps(item)
+                last = item
+                count += 1
+            cursor = f"{last['date']}:{last['id']}" if count == limit else None
+            yield '], "next": ' + json.dumps(cursor) + '}'
+
+        # Streamed without an ETag; pages are cheap to recompute by keyset
+        response = Response(stream_with_context(generate()), mimetype='application/json')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    # Total value of a custno per snapshot date, from the column store
+    @app.route('/api/funds/analytics/value', methods=['GET'])
+    @login_required
+    def get_value_series():
+        from app.columnar import column_store
+        from app.conditional import column_validators
 
-        return jsonify(amoutInfo)
+        custno = request.args.get("custno")
+        if not custno:
+            return jsonify({"error": "custno parameter cannot be empty"}), 400
+        if not column_store.enabled:
+            return jsonify({"error": "column store is disabled"}), 503
+        if not column_store.built:
+            return jsonify({"error": "column store is not built, run flask funds rebuild-columns"}), 503
+        actual_custno = map_frontend_custno_to_actual([custno])[0]
+        validators = column_validators(actual_custno)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
+
+        dates, values = column_store.view().daily_value(actual_custno)
+        return validators.apply(jsonify({"custno": actual_custno, "dates": dates, "value": values}))
+
+    # Money flowing in and out of one fund of a custno, from the column store
+    @app.route('/api/funds/analytics/flows', methods=['GET'])
+    @login_required
+    def get_fund_flows():
+        from app.columnar import column_store, fund_flows
+        from app.conditional import column_validators
+
+        custno = request.args.get("custno")
+        fundcode = request.args.get("fundcode")
+        if not custno or not fundcode:
+            return jsonify({"error": "custno and fundcode parameters cannot be empty"}), 400
+        if not column_store.enabled:
+            return jsonify({"error": "column store is disabled"}), 503
+        if not column_store.built:
+            return jsonify({"error": "column store is not built, run flask funds rebuild-columns"}), 503
+        actual_custno = map_frontend_custno_to_actual([custno])[0]
+        validators = column_validators(actual_custno)
+        cached = validators.cached()
+        if cached is not None:
+            return cached
+
+        dates, navs, vols = column_store.view().fund_series(actual_custno, fundcode)
+        return validators.apply(jsonify({
+            "custno": actual_custno,
+            "fundcode": fundcode,
+            "dates": dates,
+            "nav": navs,
+            "fundvol": vols,
+            "flow": fund_flows(navs, vols),
+        }))
 
     # Manually trigger data fetching
     @app.route('/api/funds/refresh', methods=['GET', 'POST'])
     @login_required
     def refresh_fund_data():
-        from app.models import JsonString
-        # Get all custnos in the database
-        custnos_in_db = [row[0] for row in db.session.query(JsonString.custno).distinct().all()]
-        # Get latest date for each custno
-        latest_dates = {}
-        for custno in custnos_in_db:
-            latest = db.session.query(JsonString).filter_by(custno=custno).order_by(JsonString.date.desc()).first()
-            latest_dates[custno] = latest.date if latest else None
+        from app.jobs import refresh_queue
+        from app.snapshots import latest_dates_by_custno
+        # Latest date of every custno in the database, in one grouped query
+        latest_dates = latest_dates_by_custno()
+        custnos_in_db = list(latest_dates)
         # Get requested custno
         custno = request.args.get('custno') or request.form.get('custno')
         if custno:
-            fetch_and_store_fund_data_for_custnos([custno])
-            fetch_result = f"Got latest data for {custno}"
+            custnos = [custno]
+            fetch_result = f"Fetching latest data for {custno}"
         else:
             # Get default custnos from environment variable
             default_custnos = os.environ.get('DEFAULT_CUSTNOS', 'custno1,custno2').split(',')
-            fetch_and_store_fund_data_for_custnos(custnos_in_db if custnos_in_db else default_custnos)
-            fetch_result = "Got latest data for all custno"
+            custnos = custnos_in_db if custnos_in_db else default_custnos
+            fetch_result = "Fetching latest data for all custno"
+        # The fetch runs in the background, callers poll the job for its results
+        job, created = refresh_queue.submit(current_app._get_current_object(), custnos, fetch_and_store_fund_data_for_custnos)
         return jsonify({
+            "job_id": job.id,
+            "status": job.state,
+            "coalesced": not created,
+            "status_url": url_for('get_refresh_job', job_id=job.id),
             "latest_dates": latest_dates,
             "fetch_result": fetch_result,
             "timestamp": datetime.now().isoformat()
-        })
+        }), 202
+
+    # Progress and per-custno results of a refresh job
+    @app.route('/api/funds/refresh/<job_id>', methods=['GET'])
+    @login_required
+    def get_refresh_job(job_id):
+        from app.jobs import refresh_queue
+        job = refresh_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Refresh job {job_id} not found"}), 404
+        return jsonify(job.as_dict())
 
     # Simplified refresh route
     @app.route('/refresh', methods=['GET', 'POST'])
@@ -479,8 +590,21 @@ def create_app(config_name):
     def refresh_fund_data_simple():
         return refresh_fund_data()
 
+    # Cache statistics of parsed snapshot aggregates and rendered responses
+    @app.route('/api/funds/cache-stats', methods=['GET'])
+    @login_required
+    def get_cache_stats():
+        from app.response_cache import response_cache
+        from app.snapshots import snapshot_cache
+        stats = snapshot_cache.stats()
+        stats["responses"] = response_cache.stats()
+        return jsonify(stats)
+
     migrate = Migrate(app,db)
 
+    from app.cli import funds_cli
+    app.cli.add_command(funds_cli)
+
     from app import models
 
     # db.app = app
@@ -533,55 +657,64 @@ def create_app(config_name):
     return app
 
 # @aps.task('cron', id='job1', day='*', hour='14', minute='46', second='00')
+def _log_job1(message):
+    with open("apscheduler_job1.log", "a") as f:
+        f.write(f"[APScheduler job1] {message}\n")
+
+
 def fetch_and_store_fund_data(a, b):                          # Function to run the scheduled task
-    from app.models import JsonString
-    from app.models import Employee
-    import os
-    from os.path import join, dirname
-    from app import create_app
-    from datetime import datetime
-
-    log_msg = f"[APScheduler job1] Executed at {datetime.now()}\n"
+    started = time.perf_counter()
+    log_msg = f"Executed at {datetime.now()}"
     print("==== APScheduler job1 (fetch_and_store_fund_data) START ====")
-    print(log_msg.strip())
-    with open("apscheduler_job1.log", "a") as f:
-        f.write(log_msg)
+    print(f"[APScheduler job1] {log_msg}")
+    _log_job1(log_msg)
 
     if not lock.acquire(False):
         print("------------------skip-job1--------------------")
         return
 
-    config_name = os.getenv('FLASK_CONFIG')
-    app = create_app(config_name)
-
-    with app.app_context():
-        print("send request +++")
+    try:
+        app = scheduled_app
+        if app is None:
+            print("[APScheduler job1] no application to run in, skipped")
+            _log_job1("no application to run in, skipped")
+            return
+        from app.jobs import refresh_queue
+        ready = time.perf_counter()
         # Get custnos from environment variable
         custnos = os.environ.get('DEFAULT_CUSTNOS', 'custno1,custno2').split(',')
-        # Add more custno as needed
-        for custno in custnos:
-            # Get API URL from environment variable
-            api_url = os.environ.get('FUND_API_URL', 'https://example.com/api/getAssetsListNew')
-            url = f"{api_url}?custno={custno}"
-            r = requests.get(url)
-            print(f"send request for custno {custno} ---")
-
-            DOMTree = xml.dom.minidom.parseString(r.text.encode("raw_unicode_escape").decode("raw_unicode_escape").encode("utf8")).documentElement.getElementsByTagName("return")
-
-            tz = pytz.timezone('Asia/Shanghai')
-            nowdate = datetime.now(tz).strftime('%Y%m%d')
-            data2 = json.loads(DOMTree[0].childNodes[0].data)
-            print(f"get date --- and construct jsonstring for custno {custno} +++")
-            jsonString = JsonString(date=nowdate, navdate=data2[0][0]["navdate"], jsonString=DOMTree[0].childNodes[0].data, custno=custno)
-
-            db.session.add(jsonString)
-            db.session.commit()
+        # Through the refresh queue, so custnos a manual refresh is already
+        # fetching are not fetched a second time
+        job, _ = refresh_queue.submit(app, custnos, fetch_and_store_fund_data_for_custnos)
+        job.wait()
+        summary = job.summary
+        if summary is None:
+            # Every custno was fetched by other refresh jobs
+            summary = f"refresh job {job.id} {job.state}: {job.as_dict()['results']}"
+        else:
+            _log_job1(
+                f"startup {(ready - started) * 1000:.2f}ms, fetch {summary.elapsed:.2f}s "
+                f"(store {summary.handler_elapsed:.2f}s), total {time.perf_counter() - started:.2f}s"
+            )
+        print(summary)
+        _log_job1(summary)
+    finally:
+        lock.release()
 
-            print(f"add and commit for custno {custno} ---")
+    print("==== APScheduler job1 (fetch_and_store_fund_data) END ====")
 
-    lock.release()
 
-    print("==== APScheduler job1 (fetch_and_store_fund_data) END ====")
+def retain_snapshots():
+    """
+    Scheduled job2: archive and roll up snapshots older than RETENTION_DAYS
+    """
+    app = scheduled_app
+    if app is None or not app.config.get('RETENTION_DAYS'):
+        return
+    from app.retention import apply_retention, archive_dir
+    with app.app_context():
+        summary = apply_retention(app.config['RETENTION_DAYS'], archive_dir(app))
+    print(f"[APScheduler job2] {summary}")
 
 
 def demo_task_one(var_one, var_two):
@@ -599,41 +732,24 @@ def job3(var_one, var_two):
     """
     print("str(var_one) + " " + str(var_two)")
 
-def fetch_and_store_fund_data_for_custnos(custnos):
-    from app.models import JsonString
-    import os
-    from os.path import join, dirname
-    from app import create_app
-    from datetime import datetime
+def fetch_and_store_fund_data_for_custnos(custnos, progress=None):
+    """
+    Fetch the latest fund data for every custno concurrently and store it.
+    Returns a FetchSummary with the per-custno successes and failures;
+    progress(custno, error) is called as each custno finishes.
+    """
+    from app.fetcher import FundFetcher
+    from app.ingest import store_snapshot
     tz = pytz.timezone('Asia/Shanghai')
     nowdate = datetime.now(tz).strftime('%Y%m%d')
     # Get API URL from environment variable
     api_url = os.environ.get('FUND_API_URL', 'https://example.com/api/getAssetsListNew')
-    for custno in custnos:
-        url = f"{api_url}?custno={custno}"
-        r = requests.get(url)
-        DOMTree = xml.dom.minidom.parseString(r.text.encode("raw_unicode_escape").decode("raw_unicode_escape").encode("utf8")).documentElement.getElementsByTagName("return")
-        
-        # Check if DOMTree has elements before accessing
-        if not DOMTree or len(DOMTree) == 0:
-            print(f"Warning: No data received for custno {custno}")
-            continue
-            
-        # Check if DOMTree[0] has child nodes
-        if not DOMTree[0].hasChildNodes():
-            print(f"Warning: No child nodes in response for custno {custno}")
-            continue
-            
-        try:
-            data2 = json.loads(DOMTree[0].childNodes[0].data)
-            # Check if data2 has the expected structure
-            if not data2 or len(data2) == 0 or len(data2[0]) == 0 or "navdate" not in data2[0][0]:
-                print(f"Warning: Unexpected data structure for custno {custno}")
-                continue
-                
-            jsonString = JsonString(date=nowdate, navdate=data2[0][0]["navdate"], jsonString=DOMTree[0].childNodes[0].data, custno=custno)
-            db.session.add(jsonString)
-            db.session.commit()
-        except (IndexError, KeyError, json.JSONDecodeError) as e:
-            print(f"Error processing data for custno {custno}: {str(e)}")
-            continue
+
+    def store(custno, payload):
+        store_snapshot(custno, nowdate, payload)
+
+    with FundFetcher.from_config(current_app.config, api_url) as fetcher:
+        summary = fetcher.fetch_many(custnos, store, progress)
+    for custno, error in summary.failed.items():
+        print(f"Warning: could not fetch data for custno {custno}: {error}")
+    return summary
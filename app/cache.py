@@ -0,0 +1,126 @@
+#-*-coding:utf-8-*-
+"""
+A small thread-safe LRU cache bounded by entry count and estimated memory.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """
+    Rough deep size in bytes of dicts, lists, tuples and scalars
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k) + estimate_size(v)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class LRUCache:
+    """
+    Least-recently-used cache safe to share between request threads.
+
+    Entries are evicted once either max_entries or max_bytes (as measured by
+    sizeof) is exceeded. Cached values are shared, callers must not mutate them.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, sizeof=estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_entries=None, max_bytes=None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, _ = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() on a miss.
+        The loader runs outside the lock, so concurrent misses may both load.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def pop_if(self, predicate):
+        """
+        Drop the entries whose value satisfies predicate, returns how many
+        """
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                self._bytes -= self._data.pop(key)[1]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._data)
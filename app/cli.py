@@ -0,0 +1,123 @@
+#-*-coding:utf-8-*-
+"""
+Maintenance commands, available as `flask funds <command>`.
+"""
+import time
+
+import click
+from flask.cli import AppGroup
+
+
+funds_cli = AppGroup('funds', help='Fund data maintenance commands.')
+
+
+@funds_cli.command('recompute-deltas')
+@click.option('--custno', 'custnos', multiple=True, help='Only rebuild these custnos (repeatable).')
+def recompute_deltas_command(custnos):
+    """Rebuild snapshot_deltas from the stored holdings."""
+    from app.deltas import recompute_deltas
+    count = recompute_deltas(list(custnos) or None)
+    click.echo(f"Recomputed deltas for {count} snapshots")
+
+
+@funds_cli.command('train-zdict')
+@click.option('--output', required=True, type=click.Path(dir_okay=False), help='File to write the dictionary to.')
+@click.option('--samples', default=200, show_default=True, help='Number of most recent payloads to train on.')
+def train_zdict_command(output, samples):
+    """Train a shared zlib dictionary from stored payloads."""
+    from app import db
+    from app.compression import train_dictionary
+    from app.models import JsonString
+    rows = JsonString.query.options(db.undefer(JsonString.jsonString)).order_by(JsonString.id.desc()).limit(samples).all()
+    zdict = train_dictionary([row.jsonString for row in rows if row.jsonString])
+    with open(output, 'wb') as f:
+        f.write(zdict)
+    click.echo(f"Wrote a {len(zdict)} byte dictionary trained on {len(rows)} payloads to {output}")
+    click.echo("Add it to PAYLOAD_ZDICT, then run `flask funds recompress-payloads`")
+
+
+@funds_cli.command('recompress-payloads')
+@click.option('--batch-size', default=500, show_default=True, help='Rows rewritten per transaction.')
+def recompress_payloads_command(batch_size):
+    """Rewrite stored payloads with the current PAYLOAD_ZDICT."""
+    from app.compression import recompress_payloads
+    count = recompress_payloads(batch_size)
+    click.echo(f"Recompressed {count} payloads")
+
+
+@funds_cli.command('import')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'xml']), help='Dump format, by default taken from the file extension.')
+@click.option('--custno', help='custno of XML dumps whose file name does not carry it.')
+@click.option('--date', help='Snapshot date (YYYYMMDD) of XML dumps, by default from the file name or navdate.')
+@click.option('--chunk-size', default=500, show_default=True, help='Snapshots written per transaction.')
+@click.option('--no-deltas', is_flag=True, help='Do not rebuild snapshot_deltas of the imported custnos.')
+def import_command(paths, fmt, custno, date, chunk_size, no_deltas):
+    """Import historical snapshots from JSONL or XML dump files."""
+    from app.deltas import recompute_deltas
+    from app.importer import import_records, iter_files
+
+    last = [time.perf_counter()]
+
+    def progress(summary):
+        if time.perf_counter() - last[0] >= 5:
+            last[0] = time.perf_counter()
+            click.echo(f"  ... {summary.stored + summary.unchanged} snapshots in {summary.elapsed:.0f}s")
+
+    summary = import_records(iter_files(paths, fmt, custno, date), chunk_size, progress)
+    click.echo(f"Imported {summary}")
+    if summary.custnos and not no_deltas:
+        start = time.perf_counter()
+        count = recompute_deltas(sorted(summary.custnos))
+        click.echo(f"Recomputed deltas for {count} snapshots of {len(summary.custnos)} custnos in {time.perf_counter() - start:.2f}s")
+
+
+@funds_cli.command('archive')
+@click.option('--days', type=int, help='Days of snapshots to keep, by default RETENTION_DAYS.')
+@click.option('--batch-size', default=200, show_default=True, help='Snapshots archived per transaction.')
+def archive_command(days, batch_size):
+    """Archive and roll up snapshots older than the retention window."""
+    from flask import current_app
+
+    from app.retention import apply_retention, archive_dir
+    days = current_app.config.get('RETENTION_DAYS') if days is None else days
+    if not days:
+        raise click.UsageError('Set RETENTION_DAYS or pass --days')
+    summary = apply_retention(days, archive_dir(current_app), batch_size=batch_size)
+    click.echo(f"Archived {summary}")
+
+
+@funds_cli.command('restore')
+@click.option('--from', 'start', required=True, help='First snapshot date (YYYYMMDD) to restore.')
+@click.option('--to', 'end', required=True, help='Last snapshot date (YYYYMMDD) to restore.')
+@click.option('--custno', 'custnos', multiple=True, help='Only restore these custnos (repeatable).')
+@click.option('--chunk-size', default=500, show_default=True, help='Snapshots written per transaction.')
+def restore_command(start, end, custnos, chunk_size):
+    """Load archived snapshots back into the database."""
+    from flask import current_app
+
+    from app.dates import parse_day
+    from app.deltas import recompute_deltas
+    from app.retention import archive_dir, restore_snapshots
+    try:
+        start, end = parse_day(start), parse_day(end)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    summary = restore_snapshots(archive_dir(current_app), start, end, set(custnos), chunk_size)
+    click.echo(f"Restored {summary}")
+    if summary.custnos:
+        count = recompute_deltas(sorted(summary.custnos))
+        click.echo(f"Recomputed deltas for {count} snapshots of {len(summary.custnos)} custnos")
+
+
+@funds_cli.command('rebuild-columns')
+@click.option('--batch-size', default=500, show_default=True, help='Snapshots read per query.')
+def rebuild_columns_command(batch_size):
+    """Regenerate the columnar store from the database."""
+    from flask import current_app
+
+    from app.columnar import ColumnView, column_store_dir, rebuild_columns
+    directory = column_store_dir(current_app)
+    start = time.perf_counter()
+    count = rebuild_columns(directory, batch_size)
+    click.echo(f"Wrote {count} snapshots ({len(ColumnView(directory))} holdings) to {directory} in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,381 @@
+#-*-coding:utf-8-*-
+"""
+Append-only columnar store of fund holdings for analytics.
+
+Every stored snapshot appends its holdings to one flat file per field under
+COLUMN_STORE_DIR (instance/columns by default):
+
+  date.i4      snapshot date, days since 1970-01-01
+  custno.i4    custno id, an index into custnos.txt
+  fundcode.i4  fundcode id, an index into fundcodes.txt
+  nav.f8
+  fundvol.f8
+
+and one record to runs.bin (offset, length, snapshot id, custno id, date)
+describing the rows of the snapshot. The runs file is written last and is
+the commit point: rows past the last run are the remains of an interrupted
+append and are cut off by the next one. Readers map the files read-only
+with numpy.memmap, so every worker process shares the same pages of the OS
+cache instead of holding parsed copies, and derive a per-custno offsets
+index from the runs when the files grow.
+
+The database stays the source of truth; `flask funds rebuild-columns`
+regenerates the store from it. The store only answers once it holds the
+whole database: it is marked built by a rebuild, or when it is created for
+a database without snapshots, and until then ingest does not append to it
+and the analytics endpoints report it as not built. Archived snapshots
+stay in the store, a restored one is appended again and the newest run of
+a (custno, date) wins.
+"""
+import os
+import shutil
+import threading
+from datetime import date
+
+import numpy as np
+
+from app.dates import parse_day
+from app.locking import lock_file, unlock_file
+
+
+EPOCH = date(1970, 1, 1)
+
+# Present once the store holds every snapshot of the database
+BUILT_MARKER = "built"
+
+COLUMNS = (
+    ("date", "<i4"),
+    ("custno", "<i4"),
+    ("fundcode", "<i4"),
+    ("nav", "<f8"),
+    ("fundvol", "<f8"),
+)
+
+RUN_DTYPE = np.dtype([
+    ("offset", "<i8"),
+    ("length", "<i4"),
+    ("snapshot", "<i4"),
+    ("custno", "<i4"),
+    ("date", "<i4"),
+])
+
+
+def day_number(value):
+    """
+    Days since 1970-01-01 of a YYYYMMDD string or date
+    """
+    return (parse_day(value) - EPOCH).days
+
+
+def day_strings(numbers):
+    """
+    YYYYMMDD strings of an array of day numbers
+    """
+    return [str(d).replace("-", "") for d in (np.asarray(numbers, dtype="<i8").astype("M8[D]"))]
+
+
+def _map(path, dtype, count):
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def _read_lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+class ColumnView:
+    """
+    Read-only, memory-mapped view of the store as of one runs file size.
+    Arrays are shared between requests and must not be modified.
+    """
+
+    def __init__(self, directory):
+        runs_path = os.path.join(directory, "runs.bin")
+        size = os.path.getsize(runs_path) if os.path.exists(runs_path) else 0
+        self.runs = _map(runs_path, RUN_DTYPE, size // RUN_DTYPE.itemsize)
+        rows = int(self.runs["offset"][-1] + self.runs["length"][-1]) if len(self.runs) else 0
+        for name, dtype in COLUMNS:
+            setattr(self, name, _map(os.path.join(directory, f"{name}.{dtype[1:]}"), dtype, rows))
+        self.custnos = _read_lines(os.path.join(directory, "custnos.txt"))
+        self.fundcodes = _read_lines(os.path.join(directory, "fundcodes.txt"))
+        self.custno_ids = {custno: i for i, custno in enumerate(self.custnos)}
+        self.fundcode_ids = {fundcode: i for i, fundcode in enumerate(self.fundcodes)}
+        # Offsets index: the runs of custno id c are runs[by_custno[starts[c]:starts[c + 1]]]
+        self.by_custno = np.argsort(self.runs["custno"], kind="stable")
+        self.starts = np.searchsorted(self.runs["custno"][self.by_custno], np.arange(len(self.custnos) + 1))
+
+    def __len__(self):
+        return len(self.nav)
+
+    def custno_runs(self, custno):
+        """
+        Runs of a custno, one per date with the newest winning, oldest first
+        """
+        cid = self.custno_ids.get(custno)
+        if cid is None:
+            return self.runs[:0]
+        runs = self.runs[self.by_custno[self.starts[cid]:self.starts[cid + 1]]]
+        runs = runs[np.argsort(runs["date"], kind="stable")]
+        last_of_date = np.append(runs["date"][1:] != runs["date"][:-1], True)
+        return runs[last_of_date]
+
+    def daily_value(self, custno):
+        """
+        (dates, total value) of a custno, one point per snapshot date
+        """
+        runs = self.custno_runs(custno)
+        values = [
+            float(np.dot(self.nav[start:start + length], self.fundvol[start:start + length]))
+            for start, length in zip(runs["offset"], runs["length"])
+        ]
+        return day_strings(runs["date"]), values
+
+    def fund_series(self, custno, fundcode):
+        """
+        (dates, nav, fundvol) of one fund of a custno for every snapshot date
+        of the custno; fundvol is 0 and nav None on dates it was not held
+        """
+        runs = self.custno_runs(custno)
+        fid = self.fundcode_ids.get(fundcode)
+        navs, vols = [], []
+        for start, length in zip(runs["offset"], runs["length"]):
+            held = self.fundcode[start:start + length] == fid if fid is not None else None
+            if held is not None and held.any():
+                # The last row of a repeated fundcode wins, as in the diff engine
+                navs.append(float(self.nav[start:start + length][held][-1]))
+                vols.append(float(self.fundvol[start:start + length][held].sum()))
+            else:
+                navs.append(None)
+                vols.append(0.0)
+        return day_strings(runs["date"]), navs, vols
+
+
+def fund_flows(navs, vols):
+    """
+    Money moved into (positive) or out of a fund between consecutive points
+    of fund_series: the change in fundvol valued at the newer nav, or at the
+    last known nav once the fund is no longer held
+    """
+    flows = []
+    previous_vol = 0.0
+    last_nav = None
+    for nav, vol in zip(navs, vols):
+        if nav is not None:
+            last_nav = nav
+        flows.append((vol - previous_vol) * last_nav if last_nav is not None else 0.0)
+        previous_vol = vol
+    return flows
+
+
+class ColumnStore:
+    """
+    Writer and view cache of the columnar store; a disabled store (no
+    directory) or one not built yet ignores appends
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._view = None
+        self._view_key = None
+
+    def configure(self, directory):
+        with self._lock:
+            self.directory = directory
+            self._view = None
+            self._view_key = None
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    @property
+    def built(self):
+        return self.enabled and os.path.exists(self._path(BUILT_MARKER))
+
+    def mark_built(self):
+        os.makedirs(self.directory, exist_ok=True)
+        open(self._path(BUILT_MARKER), "a").close()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def append(self, snapshots):
+        """
+        Append (snapshot_id, custno, date, holdings) snapshots, holdings
+        being ingest.holding_rows dicts
+        """
+        if not snapshots or not self.built:
+            return
+        path = self._path("append.lock")
+        with self._lock:
+            while True:
+                with open(path, "w") as lock:
+                    # Other processes append to the same files
+                    lock_file(lock)
+                    try:
+                        # A rebuild may have swapped the directory while we
+                        # waited, the lock then guards the old files
+                        if os.fstat(lock.fileno()).st_ino == os.stat(path).st_ino:
+                            self._append_locked(snapshots)
+                            return
+                    finally:
+                        unlock_file(lock)
+
+    def _append_locked(self, snapshots):
+        runs_path = self._path("runs.bin")
+        size = os.path.getsize(runs_path) if os.path.exists(runs_path) else 0
+        committed = size - size % RUN_DTYPE.itemsize
+        runs = _map(runs_path, RUN_DTYPE, committed // RUN_DTYPE.itemsize)
+        rows = int(runs["offset"][-1] + runs["length"][-1]) if len(runs) else 0
+        del runs
+
+        custnos = _read_lines(self._path("custnos.txt"))
+        fundcodes = _read_lines(self._path("fundcodes.txt"))
+        custno_ids = {c: i for i, c in enumerate(custnos)}
+        fundcode_ids = {f: i for i, f in enumerate(fundcodes)}
+        new_custnos, new_fundcodes = [], []
+
+        def intern(code, ids, new):
+            if code not in ids:
+                ids[code] = len(ids)
+                new.append(code)
+            return ids[code]
+
+        columns = {name: [] for name, _ in COLUMNS}
+        records = []
+        offset = rows
+        for snapshot_id, custno, day, holdings in snapshots:
+            cid = intern(custno, custno_ids, new_custnos)
+            number = day_number(day)
+            for row in holdings:
+                columns["date"].append(number)
+                columns["custno"].append(cid)
+                columns["fundcode"].append(intern(row["fundcode"], fundcode_ids, new_fundcodes))
+                columns["nav"].append(row["nav"])
+                columns["fundvol"].append(row["fundvol"])
+            records.append((offset, len(holdings), snapshot_id, cid, number))
+            offset += len(holdings)
+
+        for name, new in (("custnos.txt", new_custnos), ("fundcodes.txt", new_fundcodes)):
+            if new:
+                with open(self._path(name), "a", encoding="utf-8") as f:
+                    f.write("".join(f"{code}\n" for code in new))
+        for name, dtype in COLUMNS:
+            with open(self._path(f"{name}.{dtype[1:]}"), "ab") as f:
+                # Cut off rows of an interrupted append
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.write(np.asarray(columns[name], dtype=dtype).tobytes())
+        with open(runs_path, "ab") as f:
+            f.truncate(committed)
+            f.write(np.array(records, dtype=RUN_DTYPE).tobytes())
+
+    def version(self):
+        """
+        (inode, size, mtime) of runs.bin, None while the store is empty
+        """
+        try:
+            st = os.stat(self._path("runs.bin"))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime
+
+    def view(self):
+        """
+        ColumnView of the store, mapped again when it has grown
+        """
+        if not self.enabled:
+            raise RuntimeError("the column store is disabled")
+        try:
+            st = os.stat(self._path("runs.bin"))
+            key = (st.st_ino, st.st_size)
+        except FileNotFoundError:
+            key = None
+        with self._lock:
+            if self._view is None or self._view_key != key:
+                self._view = ColumnView(self.directory)
+                self._view_key = key
+            return self._view
+
+
+column_store = ColumnStore()
+
+
+def column_store_dir(app):
+    """
+    Directory of the store, COLUMN_STORE_DIR or instance/columns
+    """
+    return app.config.get("COLUMN_STORE_DIR") or os.path.join(app.instance_path, "columns")
+
+
+def init_column_store(app):
+    """
+    Point column_store at the store of app, marking a new one built when
+    the database has no snapshots yet; needs an app context
+    """
+    from app import db
+    from app.models import JsonString
+
+    if not app.config.get("COLUMN_STORE_ENABLED"):
+        column_store.configure(None)
+        return
+    column_store.configure(column_store_dir(app))
+    if not column_store.built and db.session.query(JsonString.id).first() is None:
+        column_store.mark_built()
+
+
+def rebuild_columns(directory, batch_size=500):
+    """
+    Regenerate the store from the database in snapshot id order and swap it
+    in. Returns the number of snapshots written.
+    """
+    from app import db
+
+    building = directory.rstrip(os.sep) + ".new"
+    shutil.rmtree(building, ignore_errors=True)
+    store = ColumnStore(building)
+    store.mark_built()
+    count, last_id = _copy_snapshots(store, 0, batch_size)
+    # Processes still mapping the old files keep reading them until they
+    # notice the new runs.bin
+    old = directory.rstrip(os.sep) + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, old)
+    os.rename(building, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    # Snapshots committed during the copy went to the old store or were
+    # skipped; ingest appends anything committed from here on to the new one
+    db.session.commit()
+    copied, _ = _copy_snapshots(ColumnStore(directory), last_id, batch_size)
+    return count + copied
+
+
+def _copy_snapshots(store, last_id, batch_size):
+    """
+    Append the snapshots with an id above last_id to store; returns the
+    number appended and the last id
+    """
+    from app import db
+    from app.models import FundHolding, JsonString
+
+    count = 0
+    while True:
+        snapshots = db.session.query(JsonString.id, JsonString.custno, JsonString.date).filter(
+            JsonString.id > last_id
+        ).order_by(JsonString.id).limit(batch_size).all()
+        if not snapshots:
+            return count, last_id
+        holdings = {row.id: [] for row in snapshots}
+        rows = db.session.query(FundHolding.snapshot_id, FundHolding.fundcode, FundHolding.nav, FundHolding.fundvol).filter(
+            FundHolding.snapshot_id.in_(list(holdings))
+        ).order_by(FundHolding.id)
+        for snapshot_id, fundcode, nav, fundvol in rows:
+            holdings[snapshot_id].append({"fundcode": fundcode, "nav": nav, "fundvol": fundvol})
+        store.append([(row.id, row.custno, row.date, holdings[row.id]) for row in snapshots])
+        count += len(snapshots)
+        last_id = snapshots[-1].id
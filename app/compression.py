@@ -0,0 +1,160 @@
+#-*-coding:utf-8-*-
+"""
+Compressed storage of snapshot payloads.
+
+JsonString.jsonString is a CompressedText column: payloads are written as
+zlib streams and decompressed transparently when the row is loaded. The
+payloads repeat the same keys and fund codes every day, so a shared preset
+dictionary trained from stored payloads (`flask funds train-zdict`) shrinks
+them further. zlib records the dictionary's adler32 in the stream header,
+so every dictionary ever used for writing must stay in PAYLOAD_ZDICT for
+the rows written with it to be readable.
+
+Rows stored before compression still hold plain text and are returned as is.
+"""
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+
+# zlib only looks back 32 KiB, a longer dictionary is never used
+MAX_ZDICT_SIZE = 32 * 1024
+
+# "key":"value" / "key":value fragments of the upstream JSON
+_FRAGMENT = re.compile(r'"[^"\\]*":(?:"[^"\\]*"|[^,}\]]*)[,}]?')
+
+
+def is_compressed(data):
+    """
+    Whether data starts with a zlib header; JSON text never does
+    """
+    return len(data) >= 2 and data[0] & 0x0F == 8 and (data[0] * 256 + data[1]) % 31 == 0
+
+
+class PayloadCodec:
+    """
+    zlib codec with optional preset dictionaries, looked up by adler32
+    """
+
+    def __init__(self, level=6):
+        self.level = level
+        self.dictionaries = {}
+        self.write_dict = None
+        self._lock = threading.Lock()
+
+    def configure(self, dictionaries=(), level=None):
+        """
+        Use the given dictionaries for reading; the first one is also used
+        for writing. An empty list writes plain zlib streams.
+        """
+        with self._lock:
+            if level is not None:
+                self.level = level
+            self.dictionaries = {zlib.adler32(d): d for d in dictionaries}
+            self.write_dict = dictionaries[0] if dictionaries else None
+
+    def compress(self, text):
+        data = text.encode("utf-8")
+        if self.write_dict is None:
+            return zlib.compress(data, self.level)
+        c = zlib.compressobj(self.level, zdict=self.write_dict)
+        return c.compress(data) + c.flush()
+
+    def decompress(self, data):
+        if not is_compressed(data):
+            # Plain text stored before the column was compressed
+            return data.decode("utf-8")
+        # FDICT flag of the zlib header: a dictionary id follows it
+        if len(data) >= 6 and data[1] & 0x20:
+            dict_id = int.from_bytes(data[2:6], "big")
+            zdict = self.dictionaries.get(dict_id)
+            if zdict is None:
+                raise ValueError(f"payload needs zlib dictionary {dict_id:08x}, add it to PAYLOAD_ZDICT")
+            d = zlib.decompressobj(zdict=zdict)
+            text = d.decompress(data) + d.flush()
+        else:
+            text = zlib.decompress(data)
+        return text.decode("utf-8")
+
+
+codec = PayloadCodec()
+
+
+def load_dictionaries(paths):
+    """
+    Read the dictionary files listed in PAYLOAD_ZDICT (os.pathsep-separated)
+    """
+    dictionaries = []
+    for path in filter(None, (paths or "").split(os.pathsep)):
+        with open(path, "rb") as f:
+            dictionaries.append(f.read())
+    return dictionaries
+
+
+def train_dictionary(payloads, size=MAX_ZDICT_SIZE):
+    """
+    Build a preset dictionary from sample payloads: the JSON fragments that
+    recur across samples, the most valuable ones last where zlib reaches
+    them with the shortest distances
+    """
+    counts = Counter()
+    for payload in payloads:
+        counts.update(set(_FRAGMENT.findall(payload)))
+    ranked = sorted((f for f, n in counts.items() if n > 1), key=lambda f: counts[f] * len(f), reverse=True)
+    chosen = []
+    total = 0
+    for fragment in ranked:
+        encoded = fragment.encode("utf-8")
+        if total + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(chosen))
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text stored as a zlib-compressed blob, see the module docstring
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return codec.compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return codec.decompress(bytes(value))
+
+
+def recompress_payloads(batch_size=500):
+    """
+    Rewrite every stored payload with the current codec settings, e.g. after
+    training a dictionary. Returns the number of rows rewritten.
+    """
+    from sqlalchemy import select, update
+
+    from app import db
+    from app.models import JsonString
+
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(JsonString.id, JsonString.jsonString).where(JsonString.id > last_id).order_by(JsonString.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(update(JsonString), [{"id": row.id, "jsonString": row.jsonString} for row in rows if row.jsonString is not None])
+        db.session.commit()
+        count += len(rows)
+        last_id = rows[-1].id
+    return count
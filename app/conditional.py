@@ -0,0 +1,155 @@
+#-*-coding:utf-8-*-
+"""
+Conditional GET for the /api/funds endpoints.
+
+Every response is a function of the endpoint, its query parameters and the
+versions of the data it is built from: the (latest, previous) snapshot ids
+of the change endpoints, the resolved snapshot ids of by-date and compare,
+a summary of the rows of history, the size of the column store. Snapshots
+are never updated after insert, so the strong ETag hashes those three
+things, plus the response cache generation that a delta recompute bumps,
+and is known after the id lookups, before any holdings or payload is
+read. A matching If-None-Match (or, without one, an If-Modified-Since
+not older than the newest stored_at) is answered with a bodiless 304, and
+a response another client already got is served from app.response_cache
+under the same key.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from flask import current_app, request
+
+from app import db
+from app.columnar import column_store
+from app.encoding import CONTENT_ENCODINGS
+from app.models import FundRollup, JsonString
+from app.response_cache import response_cache
+
+
+class Validators:
+    """
+    ETag and Last-Modified of the current request, given the versions of
+    the data its response is built from and the custnos that data belongs to
+    """
+
+    def __init__(self, versions, last_modified=None, custnos=()):
+        self.versions = versions
+        self.last_modified = last_modified
+        self.custnos = sorted(set(custnos))
+        key = [request.endpoint, self.custnos, sorted(request.args.items(multi=True)), versions, response_cache.generation()]
+        self.etag = hashlib.sha256(json.dumps(key, default=str).encode("utf-8")).hexdigest()[:32]
+
+    def _fresh(self):
+        # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+        if request.if_none_match:
+            # Or the ETag of a compressed representation of the response
+            tags = [self.etag] + [f"{self.etag}-{encoding}" for encoding in CONTENT_ENCODINGS]
+            return any(request.if_none_match.contains_weak(tag) for tag in tags)
+        since = request.if_modified_since
+        if since is None or self.last_modified is None:
+            return False
+        # HTTP dates have second precision
+        modified = self.last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return modified <= since
+
+    def not_modified(self):
+        """
+        A 304 response when the client's copy is current, otherwise None
+        """
+        if request.method not in ("GET", "HEAD") or not self._fresh():
+            return None
+        return self.apply(current_app.response_class(status=304))
+
+    def cached(self):
+        """
+        A 304 when the client's copy is current, the cached response when
+        it was built before, otherwise None
+        """
+        response = self.not_modified()
+        if response is not None or not self.custnos:
+            return response
+        hit = response_cache.get(self.etag)
+        if hit is None:
+            return None
+        body, mimetype = hit
+        return self.apply(current_app.response_class(body, mimetype=mimetype), store=False)
+
+    def apply(self, response, store=True):
+        """
+        Set the validators and Cache-Control on a response, or on the body
+        of one (anything app.make_response accepts), and keep a successful
+        one in the response cache
+        """
+        response = current_app.make_response(response)
+        if store and self.custnos and response.status_code == 200 and not response.is_streamed:
+            response_cache.put(self.etag, self.custnos, response.get_data(), response.mimetype)
+        response.set_etag(self.etag)
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified.replace(tzinfo=timezone.utc)
+        response.headers["Cache-Control"] = current_app.config.get("API_CACHE_CONTROL", "private, no-cache")
+        # The body depends on the logged-in session
+        response.vary.add("Cookie")
+        return response
+
+
+def snapshot_validators(*snapshots):
+    """
+    Validators of a response built from the given snapshots
+    """
+    stored = [s.stored_at for s in snapshots if s.stored_at is not None]
+    return Validators([s.id for s in snapshots], max(stored) if stored else None, [s.custno for s in snapshots])
+
+
+def pair_validators(pairs):
+    """
+    Validators of a response built from {custno: (latest, previous)}
+    snapshot pairs, either of which may be None
+    """
+    versions = []
+    stored = []
+    for custno in sorted(pairs):
+        snapshots = [s for s in pairs[custno] if s is not None]
+        versions.append([custno] + [s.id for s in snapshots])
+        stored.extend(s.stored_at for s in snapshots if s.stored_at is not None)
+    return Validators(versions, max(stored) if stored else None, pairs)
+
+
+def range_validators(custno, start=None, end=None):
+    """
+    Validators of a response built from the snapshots of a custno dated
+    from start to end: a backfill, a new snapshot or an archived one
+    changes the count or the newest id
+    """
+    query = db.session.query(
+        db.func.count(JsonString.id), db.func.max(JsonString.id), db.func.max(JsonString.stored_at),
+    ).filter(JsonString.custno == custno)
+    if start is not None:
+        query = query.filter(JsonString.date >= start)
+    if end is not None:
+        query = query.filter(JsonString.date <= end)
+    count, max_id, stored_at = query.one()
+    return Validators([count, max_id], stored_at, [custno])
+
+
+def rollup_validators(custno, fundcode, period):
+    """
+    Validators of the rollups of one fund; rollups are merged in place by
+    retention, which adds to their snapshot counts
+    """
+    count, snapshots, last = db.session.query(
+        db.func.count(FundRollup.id), db.func.sum(FundRollup.snapshots), db.func.max(FundRollup.last_date),
+    ).filter(FundRollup.custno == custno, FundRollup.fundcode == fundcode, FundRollup.period == period).one()
+    return Validators([count, snapshots, last], custnos=[custno])
+
+
+def column_validators(custno):
+    """
+    Validators of a response built from the column store rows of a custno;
+    the store only grows or is swapped for a rebuilt one
+    """
+    version = column_store.version()
+    if version is None:
+        return Validators(None, custnos=[custno])
+    inode, size, mtime = version
+    return Validators([inode, size], datetime.fromtimestamp(mtime, timezone.utc).replace(tzinfo=None), [custno])
@@ -0,0 +1,57 @@
+#-*-coding:utf-8-*-
+"""
+Snapshot dates.
+
+Snapshot and nav dates are stored in typed DATE columns so the database can
+range-scan and compare them, while the application and the API keep using
+the upstream YYYYMMDD strings. DayDate converts between the two.
+"""
+from datetime import date, datetime
+
+from sqlalchemy.types import Date, TypeDecorator
+
+
+DAY_FORMAT = "%Y%m%d"
+
+
+def parse_day(value):
+    """
+    datetime.date of a YYYYMMDD (or YYYY-MM-DD) string, ValueError otherwise
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    if "-" in text:
+        return datetime.strptime(text, "%Y-%m-%d").date()
+    # strptime alone would also accept e.g. 2024015
+    if len(text) != 8 or not text.isdigit():
+        raise ValueError(f"not a YYYYMMDD date: {text!r}")
+    return datetime.strptime(text, DAY_FORMAT).date()
+
+
+def format_day(value):
+    """
+    YYYYMMDD string of a date
+    """
+    return value.strftime(DAY_FORMAT)
+
+
+class DayDate(TypeDecorator):
+    """
+    DATE column read and written as YYYYMMDD strings
+    """
+
+    impl = Date
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return parse_day(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return format_day(value)
@@ -0,0 +1,128 @@
+#-*-coding:utf-8-*-
+"""
+Share and amount changes between two snapshots.
+
+Ingest computes the change of every new snapshot against the custno's
+previous-date snapshot once and stores it in snapshot_deltas, so the
+change endpoints only read it back.
+"""
+from sqlalchemy import insert
+
+from app import db, diff_engine
+from app.models import JsonString, SnapshotDelta
+from app.response_cache import response_cache
+from app.snapshots import fund_aggregates, previous_snapshot, snapshot_cache
+
+
+def compute_deltas(snapshot_id, previous_id):
+    """
+    Compare two snapshots fund by fund.
+    Returns [(fundcode, share_delta, amount_delta)] for every fund of the
+    newer snapshot, amount_delta being valued at the newer snapshot's nav.
+    """
+    return diff_engine.diff(fund_aggregates(snapshot_id), fund_aggregates(previous_id)).rows()
+
+
+def changed(deltas):
+    """
+    Keep only the funds whose share count changed
+    """
+    return [d for d in deltas if d[1] != 0.0]
+
+
+def store_deltas(snapshot, previous):
+    """
+    Compute and add the deltas of snapshot against previous to the session
+    """
+    rows = [
+        {
+            "snapshot_id": snapshot.id,
+            "previous_id": previous.id,
+            "custno": snapshot.custno,
+            "fundcode": fundcode,
+            "share_delta": share,
+            "amount_delta": amount,
+        }
+        for fundcode, share, amount in compute_deltas(snapshot.id, previous.id)
+    ]
+    if rows:
+        db.session.execute(insert(SnapshotDelta), rows)
+    return len(rows)
+
+
+def load_deltas(snapshot_id, previous_id):
+    """
+    Read the stored deltas of a snapshot pair, computing them when the pair
+    was never stored (e.g. arbitrary pairs, or rows older than the table)
+    """
+    rows = db.session.query(
+        SnapshotDelta.fundcode,
+        SnapshotDelta.share_delta,
+        SnapshotDelta.amount_delta,
+    ).filter(SnapshotDelta.snapshot_id == snapshot_id, SnapshotDelta.previous_id == previous_id).order_by(SnapshotDelta.id).all()
+    if rows:
+        return [tuple(row) for row in rows]
+    return compute_deltas(snapshot_id, previous_id)
+
+
+def load_deltas_many(pairs):
+    """
+    {(snapshot_id, previous_id): deltas} like load_deltas for many pairs,
+    reading the stored ones in one query
+    """
+    pairs = set(pairs)
+    found = {}
+    if pairs:
+        rows = db.session.query(
+            SnapshotDelta.snapshot_id,
+            SnapshotDelta.previous_id,
+            SnapshotDelta.fundcode,
+            SnapshotDelta.share_delta,
+            SnapshotDelta.amount_delta,
+        ).filter(SnapshotDelta.snapshot_id.in_({snapshot_id for snapshot_id, _ in pairs})).order_by(SnapshotDelta.id)
+        for snapshot_id, previous_id, fundcode, share, amount in rows:
+            if (snapshot_id, previous_id) in pairs:
+                found.setdefault((snapshot_id, previous_id), []).append((fundcode, share, amount))
+    return {pair: found[pair] if pair in found else compute_deltas(*pair) for pair in pairs}
+
+
+def recompute_deltas(custnos=None):
+    """
+    Rebuild snapshot_deltas from the holdings, for all or some custnos.
+    Returns the number of snapshots that got deltas.
+    """
+    # Start from the holdings as they are in the database now
+    snapshot_cache.clear()
+    if not custnos:
+        custnos = [row[0] for row in db.session.query(JsonString.custno).distinct()]
+    count = 0
+    for custno in custnos:
+        SnapshotDelta.query.filter_by(custno=custno).delete(synchronize_session=False)
+        rows = db.session.query(JsonString.id, JsonString.custno, JsonString.date).filter_by(custno=custno).order_by(JsonString.date, JsonString.id).all()
+        # Walk the snapshots in date order, remembering the newest snapshot
+        # of the last distinct date seen before the current one
+        previous = None
+        last = None
+        for row in rows:
+            if last is not None and last.date != row.date:
+                previous = last
+            if previous is not None:
+                store_deltas(row, previous)
+                count += 1
+            last = row
+        db.session.commit()
+        response_cache.invalidate([custno])
+    # The ids are unchanged, other processes would keep their entries
+    response_cache.bump()
+    return count
+
+
+def record_deltas(snapshot):
+    """
+    Store the deltas of a freshly added snapshot against the custno's
+    previous-date snapshot, if there is one
+    """
+    previous = previous_snapshot(snapshot.custno, snapshot.date)
+    if previous is None:
+        return 0
+    return store_deltas(snapshot, previous)
@@ -0,0 +1,102 @@
+#-*-coding:utf-8-*-
+"""
+Vectorized per-fund aggregation and diffing of snapshots.
+
+A snapshot is turned into a SnapshotFrame: parallel NumPy arrays of
+fundcodes, navs and summed fund volumes, in the order the funds first
+appear in the upstream payload. Share and amount changes between two
+frames are computed with array operations instead of per-fund dict loops.
+"""
+import numpy as np
+
+
+class SnapshotFrame:
+    """
+    Fund-level arrays of one snapshot, one position per distinct fundcode
+    """
+
+    __slots__ = ("fundcodes", "nav", "fundvol")
+
+    def __init__(self, fundcodes, nav, fundvol):
+        self.fundcodes = fundcodes
+        self.nav = nav
+        self.fundvol = fundvol
+
+    def __len__(self):
+        return len(self.fundcodes)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self.fundcodes.nbytes + self.nav.nbytes + self.fundvol.nbytes
+
+    def nav_info(self):
+        """{fundcode: nav}"""
+        return dict(zip(self.fundcodes.tolist(), self.nav.tolist()))
+
+    def vol_info(self):
+        """{fundcode: total fundvol}"""
+        return dict(zip(self.fundcodes.tolist(), self.fundvol.tolist()))
+
+
+class SnapshotDiff:
+    """
+    Share and amount change of every fund of the newer snapshot
+    """
+
+    __slots__ = ("fundcodes", "share", "amount")
+
+    def __init__(self, fundcodes, share, amount):
+        self.fundcodes = fundcodes
+        self.share = share
+        self.amount = amount
+
+    def changed(self):
+        """The funds whose share count changed"""
+        mask = self.share != 0.0
+        return SnapshotDiff(self.fundcodes[mask], self.share[mask], self.amount[mask])
+
+    def rows(self):
+        """[(fundcode, share_delta, amount_delta)]"""
+        return list(zip(self.fundcodes.tolist(), self.share.tolist(), self.amount.tolist()))
+
+
+EMPTY = SnapshotFrame(np.array([], dtype=str), np.array([], dtype=np.float64), np.array([], dtype=np.float64))
+
+
+def frame_from_rows(fundcodes, navs, vols):
+    """
+    Build a frame from raw holdings, where a fundcode may repeat: fund
+    volumes are summed and the last nav seen for a fundcode wins
+    """
+    if not len(fundcodes):
+        return EMPTY
+    # Position of each fundcode in first-appearance order
+    index = {}
+    inverse = np.fromiter((index.setdefault(code, len(index)) for code in fundcodes), dtype=np.intp, count=len(fundcodes))
+    summed = np.bincount(inverse, weights=np.asarray(vols, dtype=np.float64), minlength=len(index))
+    # The last nav seen for a fundcode wins, as in the old dict loops
+    last = np.zeros(len(index), dtype=np.intp)
+    np.maximum.at(last, inverse, np.arange(len(inverse)))
+    return SnapshotFrame(np.array(list(index), dtype=str), np.asarray(navs, dtype=np.float64)[last], summed)
+
+
+def align(frame, fundcodes):
+    """
+    Fund volumes of frame for the given fundcodes, 0 where frame lacks one
+    """
+    if not len(frame):
+        return np.zeros(len(fundcodes), dtype=np.float64)
+    order = np.argsort(frame.fundcodes, kind="stable")
+    ordered = frame.fundcodes[order]
+    pos = np.searchsorted(ordered, fundcodes)
+    pos[pos == len(ordered)] = 0
+    found = ordered[pos] == fundcodes
+    return np.where(found, frame.fundvol[order[pos]], 0.0)
+
+
+def diff(current, previous):
+    """
+    Share change of every fund of current against previous, and its amount
+    valued at current's nav. Funds only present in previous are ignored.
+    """
+    share = current.fundvol - align(previous, current.fundcodes)
+    return SnapshotDiff(current.fundcodes, share, share * current.nav)
@@ -0,0 +1,121 @@
+#-*-coding:utf-8-*-
+"""
+Encoding of /api/funds responses: the JSON serializer and the
+Content-Encoding negotiated from Accept-Encoding.
+
+jsonify goes through app.json, so installing a provider here switches the
+serializer of every route. orjson is used when it is installed (and
+JSON_SERIALIZER allows it), the stdlib provider of Flask otherwise; both
+sort keys the same way. Bodies of at least COMPRESS_MIN_SIZE bytes are
+gzip- or deflate-compressed when the client accepts it. A compressed body
+is a different representation, so its ETag gets the encoding appended and
+app.conditional accepts either form in If-None-Match.
+"""
+import gzip
+import zlib
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Preferred first
+CONTENT_ENCODINGS = ("gzip", "deflate")
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/html", "text/plain")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    DefaultJSONProvider serializing with orjson. Output differs only in
+    whitespace and float spelling (and NaN becomes null); parsing and calls
+    with stdlib keyword arguments stay on the stdlib.
+    """
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def json_provider(app):
+    """
+    Provider named by JSON_SERIALIZER: auto (orjson when installed), orjson
+    or stdlib
+    """
+    name = app.config.get("JSON_SERIALIZER") or "auto"
+    if name not in ("auto", "orjson", "stdlib"):
+        raise ValueError(f"unknown JSON_SERIALIZER {name!r}, expected auto, orjson or stdlib")
+    if name == "orjson" and orjson is None:
+        raise RuntimeError("JSON_SERIALIZER is orjson but orjson is not installed")
+    if name == "stdlib" or orjson is None:
+        return DefaultJSONProvider(app)
+    return OrjsonProvider(app)
+
+
+def negotiate_encoding():
+    """
+    The content coding of CONTENT_ENCODINGS the client accepts with the
+    highest quality, None for identity
+    """
+    accepted = request.accept_encodings
+    best = None
+    for encoding in CONTENT_ENCODINGS:
+        quality = accepted[encoding]
+        if quality and (best is None or quality > accepted[best]):
+            best = encoding
+    return best
+
+
+def encode(data, encoding, level=6):
+    if encoding == "gzip":
+        # mtime=0 keeps the bytes of a body identical across requests
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zlib.compress(data, level)
+
+
+def compress_response(response, min_size=1024, level=1):
+    """
+    after_request hook of the API routes: compress the body with the
+    negotiated coding when it is worth it
+    """
+    response.vary.add("Accept-Encoding")
+    if "Content-Encoding" in response.headers or response.direct_passthrough:
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    etag, weak = response.get_etag()
+    if response.status_code == 304:
+        # Echo the validator of the representation the client holds
+        if etag and request.if_none_match.contains_weak(f"{etag}-{encoding}"):
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+    if response.status_code != 200 or response.is_streamed or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.set_data(encode(data, encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
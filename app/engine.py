@@ -0,0 +1,26 @@
+#-*-coding:utf-8-*-
+"""
+Database engine tuning applied by create_app.
+"""
+from sqlalchemy import event
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    Run PRAGMA name=value for every entry of pragmas on each new connection
+    of a SQLite engine; other engines are left alone
+    """
+    if not pragmas or engine.dialect.name != "sqlite":
+        return False
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return True
@@ -0,0 +1,133 @@
+#-*-coding:utf-8-*-
+"""
+Streaming extraction of the JSON text carried in the <return> element of
+upstream responses.
+
+The response body is fed chunk by chunk to an incremental XML parser whose
+target keeps only the text of <return> elements, so the document is never
+copied or built into a tree. Literal \\uXXXX escapes are expanded piece by
+piece as the text arrives, matching the old raw_unicode_escape round-trip.
+"""
+from xml.etree.ElementTree import XMLParser
+
+
+# Size of the body chunks read from a streamed upstream response
+CHUNK_SIZE = 64 * 1024
+
+# Longest escape raw_unicode_escape understands: \UXXXXXXXX
+_MAX_ESCAPE = 10
+
+
+def _is_return(tag):
+    # ElementTree reports namespaced tags as "{uri}return"
+    return tag == "return" or tag.endswith("}return")
+
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    return text.encode("raw_unicode_escape").decode("raw_unicode_escape")
+
+
+def _safe_cut(text):
+    """
+    Index up to which text can be unescaped on its own: never inside a
+    backslash run that is close enough to the end to start an escape
+    """
+    cut = text.rfind("\\", max(0, len(text) - _MAX_ESCAPE))
+    if cut == -1:
+        return len(text)
+    while cut > 0 and text[cut - 1] == "\\":
+        cut -= 1
+    return cut
+
+
+class _ReturnTarget:
+    """
+    XMLParser target that keeps the text directly inside <return> elements
+    """
+
+    def __init__(self):
+        self.texts = []
+        self._depth = 0
+        self._collecting = False
+        self._pending = []
+        self._pending_len = 0
+        self._parts = None
+
+    def start(self, tag, attrib):
+        if self._depth:
+            # Like Element.text, stop at the first child element
+            self._depth += 1
+            self._collecting = False
+        elif _is_return(tag):
+            self._depth = 1
+            self._collecting = True
+            self._parts = None
+
+    def data(self, data):
+        if self._collecting:
+            self._pending.append(data)
+            self._pending_len += len(data)
+            if self._pending_len >= CHUNK_SIZE:
+                self._flush(final=False)
+
+    def end(self, tag):
+        if not self._depth:
+            return
+        self._depth -= 1
+        self._collecting = False
+        if self._depth == 0:
+            self._flush(final=True)
+            self.texts.append(None if self._parts is None else "".join(self._parts))
+            self._parts = None
+
+    def close(self):
+        return None
+
+    def _flush(self, final):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        cut = len(text) if final else _safe_cut(text)
+        if cut < len(text):
+            self._pending.append(text[cut:])
+        self._pending_len = len(text) - cut
+        if self._parts is None:
+            self._parts = []
+        self._parts.append(_unescape(text[:cut]))
+
+    def drain(self):
+        texts, self.texts = self.texts, []
+        return texts
+
+
+def iter_return_texts(chunks):
+    """
+    Yield the text of every <return> element found in an iterable of
+    bytes (or str) chunks, in a single pass. Empty elements yield None.
+    """
+    target = _ReturnTarget()
+    parser = XMLParser(target=target)
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+            yield from target.drain()
+    parser.close()
+    yield from target.drain()
+
+
+def extract_return_text(chunks):
+    """
+    Return the text of the first <return> element, or None if there is none.
+    The whole body is consumed so malformed documents still raise ParseError
+    and streamed connections can go back to the pool.
+    """
+    found = None
+    first = True
+    for text in iter_return_texts(chunks):
+        if first:
+            found = text
+            first = False
+    return found
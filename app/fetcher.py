@@ -0,0 +1,179 @@
+#-*-coding:utf-8-*-
+"""
+Concurrent fetching of fund data from the upstream FUND_API_URL service.
+
+Each custno is requested on a bounded worker pool that shares one pooled
+keep-alive session. Requests have a timeout and are retried with exponential
+backoff; the outcome of every custno is collected in a FetchSummary.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from xml.etree.ElementTree import ParseError
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.extractor import CHUNK_SIZE, extract_return_text
+
+
+# HTTP statuses that are worth retrying, anything else fails straight away
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class FetchError(Exception):
+    """
+    Raised when the upstream response for a custno cannot be used
+    """
+
+
+class FetchSummary:
+    """
+    Per-custno outcome of a fetch run
+    """
+
+    def __init__(self):
+        self.succeeded = []
+        self.failed = {}
+        self.attempts = {}
+        self.elapsed = 0.0
+        # Time spent in the handler, part of elapsed
+        self.handler_elapsed = 0.0
+
+    def add_success(self, custno):
+        self.succeeded.append(custno)
+
+    def add_failure(self, custno, error):
+        self.failed[custno] = str(error)
+
+    @property
+    def total(self):
+        return len(self.succeeded) + len(self.failed)
+
+    def as_dict(self):
+        return {
+            "succeeded": list(self.succeeded),
+            "failed": dict(self.failed),
+            "attempts": dict(self.attempts),
+            "elapsed": round(self.elapsed, 3),
+            "handler_elapsed": round(self.handler_elapsed, 3),
+        }
+
+    def __str__(self):
+        text = f"{len(self.succeeded)}/{self.total} custno fetched in {self.elapsed:.2f}s"
+        for custno, error in self.failed.items():
+            text += f"\n  {custno}: {error}"
+        return text
+
+
+def create_session(pool_size):
+    """
+    Build a keep-alive session whose connection pool matches the worker pool
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def read_return_text(response):
+    """
+    Stream the body of an upstream response and pull out the <return> JSON text
+    """
+    try:
+        text = extract_return_text(response.iter_content(CHUNK_SIZE))
+    except ParseError as e:
+        raise FetchError(f"malformed response: {e}") from e
+    if text is None:
+        raise FetchError("no <return> element in response")
+    return text
+
+
+class FundFetcher:
+    """
+    Fetch the upstream payload of many custnos on a bounded worker pool
+    """
+
+    def __init__(self, api_url, max_workers=8, timeout=10, retries=2, backoff=0.5, session=None):
+        self.api_url = api_url
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.session = session or create_session(self.max_workers)
+
+    @classmethod
+    def from_config(cls, config, api_url):
+        return cls(
+            api_url,
+            max_workers=config.get("FETCH_MAX_WORKERS", 8),
+            timeout=config.get("FETCH_TIMEOUT", 10),
+            retries=config.get("FETCH_RETRIES", 2),
+            backoff=config.get("FETCH_BACKOFF", 0.5),
+        )
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fetch_one(self, custno):
+        """
+        Fetch one custno, retrying transient failures.
+        Returns (payload, attempts) where payload is the <return> JSON text.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                r = self.session.get(self.api_url, params={"custno": custno}, timeout=self.timeout, stream=True)
+                with r:
+                    if r.status_code >= 400:
+                        raise requests.HTTPError(f"HTTP {r.status_code}", response=r)
+                    return read_return_text(r), attempt
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError, requests.exceptions.ChunkedEncodingError) as e:
+                response = getattr(e, "response", None)
+                retryable = response is None or response.status_code in RETRY_STATUSES
+                if not retryable or attempt > self.retries:
+                    raise FetchError(f"{e} after {attempt} attempt(s)") from e
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+    def fetch_many(self, custnos, handler=None, progress=None):
+        """
+        Fetch all custnos concurrently.
+
+        handler(custno, payload) is called in the calling thread as each
+        response arrives, so database work never leaves the caller's app
+        context. An exception raised by the handler marks that custno failed.
+        progress(custno, error) is called once each custno is finished, with
+        error None when it succeeded.
+        """
+        summary = FetchSummary()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(custnos)))) as executor:
+            futures = {executor.submit(self.fetch_one, custno): custno for custno in custnos}
+            for future in as_completed(futures):
+                custno = futures[future]
+                try:
+                    payload, attempts = future.result()
+                    summary.attempts[custno] = attempts
+                    if handler is not None:
+                        handled = time.perf_counter()
+                        try:
+                            handler(custno, payload)
+                        finally:
+                            summary.handler_elapsed += time.perf_counter() - handled
+                except Exception as e:
+                    summary.add_failure(custno, e)
+                    if progress is not None:
+                        progress(custno, e)
+                    continue
+                summary.add_success(custno)
+                if progress is not None:
+                    progress(custno, None)
+        summary.elapsed = time.perf_counter() - start
+        return summary
@@ -0,0 +1,180 @@
+#-*-coding:utf-8-*-
+"""
+Bulk import of historical snapshots from dump files.
+
+Two formats are read, both streamed so memory stays flat whatever the size:
+
+  JSONL  one object per line: {"custno": ..., "date": "YYYYMMDD",
+         "payload": <the <return> JSON text, or the parsed array>}
+         (a jsonString key is accepted instead of payload)
+  XML    raw upstream responses; every <return> element is one snapshot.
+         custno and date come from the command options or from a
+         <custno>_<YYYYMMDD>.xml file name, the date falling back to the
+         payload's navdate.
+
+Every record is validated like a live fetch before it is stored, and the
+records are written in chunks by ingest.store_snapshot_batch.
+"""
+import gzip
+import json
+import os
+import re
+import time
+from xml.etree.ElementTree import ParseError
+
+from app.dates import format_day, parse_day
+from app.extractor import CHUNK_SIZE, iter_return_texts
+from app.ingest import PayloadError, holding_rows, parse_payload, store_snapshot_batch
+
+
+_XML_NAME = re.compile(r"^(?P<custno>[^_]+)_(?P<date>\d{8})\.xml(\.gz)?$")
+
+# Rejected records kept in the summary, the rest are only counted
+MAX_REJECTS_KEPT = 20
+
+
+class ImportSummary:
+    """
+    Counters of an import run
+    """
+
+    def __init__(self):
+        self.stored = 0
+        self.unchanged = 0
+        self.holdings = 0
+        self.rejected = 0
+        self.rejects = []
+        self.custnos = set()
+        self.elapsed = 0.0
+
+    def reject(self, where, error):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REJECTS_KEPT:
+            self.rejects.append(f"{where}: {error}")
+
+    def __str__(self):
+        rate = (self.stored + self.unchanged) / self.elapsed if self.elapsed else 0.0
+        rows = (self.stored + self.unchanged + self.holdings) / self.elapsed if self.elapsed else 0.0
+        text = (
+            f"{self.stored} snapshots ({self.holdings} holdings) stored, {self.unchanged} unchanged, "
+            f"{self.rejected} rejected in {self.elapsed:.2f}s: {rate:.0f} snapshots/s, {rows:.0f} rows/s"
+        )
+        for line in self.rejects:
+            text += f"\n  {line}"
+        if self.rejected > len(self.rejects):
+            text += f"\n  ... {self.rejected - len(self.rejects)} more"
+        return text
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def iter_jsonl(path):
+    """
+    Yield (where, custno, date, payload) for each line of a JSONL dump
+    """
+    with _open(path, "rt") as f:
+        for number, line in enumerate(f, 1):
+            where = f"{path}:{number}"
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                payload = record["payload"] if "payload" in record else record["jsonString"]
+                if not isinstance(payload, str):
+                    payload = json.dumps(payload, ensure_ascii=False)
+                yield where, str(record["custno"]), str(record["date"]), payload
+            except (KeyError, TypeError, ValueError) as e:
+                yield where, None, None, e
+
+
+def iter_xml(path, custno=None, date=None):
+    """
+    Yield (where, custno, date, payload) for each <return> of an XML dump;
+    date is None when neither the options nor the file name carry it
+    """
+    match = _XML_NAME.match(os.path.basename(path))
+    if match:
+        custno = custno or match.group("custno")
+        date = date or match.group("date")
+    with _open(path, "rb") as f:
+        chunks = iter(lambda: f.read(CHUNK_SIZE), b"")
+        try:
+            for number, payload in enumerate(iter_return_texts(chunks), 1):
+                yield f"{path}#{number}", custno, date, payload
+        except ParseError as e:
+            # The rest of a malformed document cannot be read
+            yield path, None, None, e
+
+
+def validate(custno, date, payload):
+    """
+    Check a record with the live ingest rules.
+    Returns (custno, date, payload, data, holdings).
+    """
+    if not custno or len(custno) > 16:
+        raise PayloadError(f"invalid custno {custno!r}")
+    if payload is None:
+        raise PayloadError("empty <return> element")
+    data = parse_payload(payload)
+    if date is None:
+        date = data[0][0]["navdate"]
+    try:
+        date = format_day(parse_day(date))
+    except ValueError as e:
+        raise PayloadError(str(e)) from e
+    return custno, date, payload, data, holding_rows(None, custno, data)
+
+
+def import_records(records, chunk_size=500, progress=None):
+    """
+    Validate and store (where, custno, date, payload) records in chunks.
+    A payload that is an exception marks an unreadable record.
+    progress(summary) is called after every chunk.
+    """
+    summary = ImportSummary()
+    start = time.perf_counter()
+    chunk = []
+
+    def flush():
+        stored, unchanged, holdings = store_snapshot_batch(chunk)
+        summary.stored += stored
+        summary.unchanged += unchanged
+        summary.holdings += holdings
+        summary.custnos.update(custno for custno, _, _, _, _ in chunk)
+        chunk.clear()
+        summary.elapsed = time.perf_counter() - start
+        if progress is not None:
+            progress(summary)
+
+    for where, custno, date, payload in records:
+        if isinstance(payload, Exception):
+            summary.reject(where, payload)
+            continue
+        try:
+            chunk.append(validate(custno, date, payload))
+        except PayloadError as e:
+            summary.reject(where, e)
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def iter_files(paths, fmt=None, custno=None, date=None):
+    """
+    Records of all dump files, the format taken from fmt or the extension
+    """
+    for path in paths:
+        kind = fmt or ("xml" if ".xml" in os.path.basename(path) else "jsonl")
+        if kind == "xml":
+            yield from iter_xml(path, custno, date)
+        else:
+            yield from iter_jsonl(path)
@@ -0,0 +1,208 @@
+#-*-coding:utf-8-*-
+"""
+Storing upstream snapshots.
+
+A snapshot is kept as the raw JsonString row plus one FundHolding row per
+fund, written in bulk in the same transaction so the API can aggregate
+holdings in SQL instead of parsing the blob on every request. The change
+against the previous-date snapshot goes to snapshot_deltas, and the
+custno's latest / previous-date pointer is moved, at the same time.
+
+Payloads are hashed and stored once per custno: refetching an unchanged
+payload (weekends, holidays, a second fetch on the same day) only adds an
+UnchangedSnapshot marker pointing at the stored copy.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.columnar import column_store
+from app.dates import parse_day
+from app.deltas import record_deltas
+from app.models import JsonString, FundHolding, UnchangedSnapshot
+from app.pointers import advance_pointer, refresh_pointer
+from app.response_cache import response_cache
+from app.snapshots import snapshot_cache
+
+
+class PayloadError(ValueError):
+    """
+    Raised when an upstream payload does not have the expected structure
+    """
+
+
+def parse_payload(payload):
+    """
+    Decode and validate the JSON text of a <return> element
+    """
+    try:
+        data = json.loads(payload)
+        # Check if data has the expected structure
+        if not data or len(data) == 0 or len(data[0]) == 0 or "navdate" not in data[0][0]:
+            raise PayloadError("unexpected data structure")
+        parse_day(data[0][0]["navdate"])
+    except PayloadError:
+        raise
+    except (IndexError, KeyError, TypeError, ValueError) as e:
+        raise PayloadError(f"error processing data: {e}") from e
+    return data
+
+
+def holding_rows(snapshot_id, custno, data):
+    """
+    Build the FundHolding rows of a parsed payload
+    """
+    try:
+        return [
+            {
+                "snapshot_id": snapshot_id,
+                "custno": custno,
+                "fundcode": item["fundcode"],
+                "nav": float(item["nav"]),
+                "fundvol": float(item["fundvol"]),
+            }
+            for item in data[0]
+        ]
+    except (KeyError, TypeError, ValueError) as e:
+        raise PayloadError(f"invalid holding: {e}") from e
+
+
+def payload_hash(payload):
+    """
+    Content hash of a payload as stored in JsonString.content_hash
+    """
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def find_duplicate(custno, content_hash):
+    """
+    The stored snapshot of custno with this payload hash, if any
+    """
+    return JsonString.query.filter_by(custno=custno, content_hash=content_hash).first()
+
+
+def mark_unchanged(custno, date, snapshot):
+    """
+    Record that custno's payload fetched on date was the same as snapshot
+    """
+    db.session.add(UnchangedSnapshot(custno=custno, date=date, snapshot_id=snapshot.id))
+    db.session.commit()
+    return snapshot
+
+
+def append_columns(snapshots):
+    """
+    Append committed (snapshot_id, custno, date, holdings) snapshots to the
+    column store. The database stays the source of truth, so a failure is
+    only reported.
+    """
+    try:
+        column_store.append(snapshots)
+    except (OSError, ValueError) as e:
+        print(f"Warning: column store append failed, run `flask funds rebuild-columns`: {e}")
+
+
+def store_snapshot(custno, date, payload, data=None):
+    """
+    Store one snapshot and its holdings in a single transaction.
+    A payload already stored for the custno is only marked unchanged; the
+    JsonString holding the payload is returned either way.
+    """
+    content_hash = payload_hash(payload)
+    existing = find_duplicate(custno, content_hash)
+    if existing is not None:
+        return mark_unchanged(custno, date, existing)
+    if data is None:
+        data = parse_payload(payload)
+    snapshot = JsonString(date=date, navdate=data[0][0]["navdate"], jsonString=payload, custno=custno, content_hash=content_hash)
+    try:
+        db.session.add(snapshot)
+        db.session.flush()
+        rows = holding_rows(snapshot.id, custno, data)
+        db.session.execute(insert(FundHolding), rows)
+        record_deltas(snapshot)
+        advance_pointer(snapshot)
+        columns = [(snapshot.id, custno, date, rows)]
+        db.session.commit()
+    except Exception as e:
+        # The id may be handed out again, drop anything cached under it
+        if snapshot.id is not None:
+            snapshot_cache.pop(snapshot.id)
+        db.session.rollback()
+        if isinstance(e, IntegrityError):
+            # A concurrent ingest stored the same payload first
+            existing = find_duplicate(custno, content_hash)
+            if existing is not None:
+                return mark_unchanged(custno, date, existing)
+        raise
+    response_cache.invalidate([custno])
+    append_columns(columns)
+    return snapshot
+
+
+def store_snapshot_batch(snapshots):
+    """
+    Store many validated snapshots in one transaction, for bulk imports.
+    snapshots is a list of (custno, date, payload, data, holdings) where
+    holdings are the holding_rows of the payload. Payloads already stored,
+    or repeated within the batch, get UnchangedSnapshot markers. Deltas are
+    not computed here, run recompute_deltas for the custnos afterwards.
+    Returns the number of snapshots stored, marked unchanged and of
+    holdings written.
+    """
+    hashes = [payload_hash(payload) for _, _, payload, _, _ in snapshots]
+    wanted = defaultdict(set)
+    for (custno, _, _, _, _), content_hash in zip(snapshots, hashes):
+        wanted[custno].add(content_hash)
+    # One (custno, content_hash) index lookup per custno of the batch
+    known = {}
+    for custno, content_hashes in wanted.items():
+        rows = db.session.query(JsonString.id, JsonString.content_hash).filter(
+            JsonString.custno == custno, JsonString.content_hash.in_(content_hashes)
+        )
+        known.update(((custno, content_hash), snapshot_id) for snapshot_id, content_hash in rows)
+
+    added = {}
+    new = []
+    markers = []
+    for (custno, date, payload, data, holdings), content_hash in zip(snapshots, hashes):
+        key = (custno, content_hash)
+        if key in known or key in added:
+            markers.append((custno, date, key))
+            continue
+        snapshot = JsonString(date=date, navdate=data[0][0]["navdate"], jsonString=payload, custno=custno, content_hash=content_hash)
+        added[key] = snapshot
+        new.append((snapshot, holdings))
+    rows = []
+    columns = []
+    try:
+        db.session.add_all(added.values())
+        db.session.flush()
+        for snapshot, holdings in new:
+            for row in holdings:
+                row["snapshot_id"] = snapshot.id
+            rows.extend(holdings)
+            columns.append((snapshot.id, snapshot.custno, snapshot.date, holdings))
+        if rows:
+            db.session.execute(insert(FundHolding), rows)
+        if markers:
+            db.session.execute(insert(UnchangedSnapshot), [
+                {"custno": custno, "date": date, "snapshot_id": known[key] if key in known else added[key].id}
+                for custno, date, key in markers
+            ])
+        for custno in {snapshot.custno for snapshot, _ in new}:
+            refresh_pointer(custno)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        # Keep memory flat across batches
+        db.session.expunge_all()
+    response_cache.invalidate({custno for _, custno, _, _ in columns})
+    append_columns(columns)
+    return len(new), len(markers), len(rows)
@@ -0,0 +1,201 @@
+#-*-coding:utf-8-*-
+"""
+Background refresh jobs.
+
+/api/funds/refresh hands the upstream fetch to an in-process executor and
+returns a job id straight away; the job's progress and per-custno results
+are polled from /api/funds/refresh/<job_id>. The scheduled job1 goes through
+the same queue, which fetches a custno in one job at a time: a refresh
+asking for custnos another job is already fetching only fetches the rest
+and takes the results of the others from that job, and one asking only for
+custnos of a single running job simply joins it.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RefreshJob:
+    """
+    One refresh of a set of custnos and the outcome of each of them
+    """
+
+    def __init__(self, custnos, lock=None):
+        self.id = uuid.uuid4().hex
+        self.custnos = custnos
+        self.state = QUEUED
+        self.results = {custno: {"status": "pending"} for custno in custnos}
+        self.summary = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._lock = lock or threading.Lock()
+        # Jobs waiting for the result of one of our custnos, and jobs that
+        # cannot finish before we do
+        self._followers = defaultdict(list)
+        self._dependents = []
+        self._parts = 0
+        self._done = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    def record(self, custno, error=None):
+        """Progress callback, called once per custno as it completes"""
+        with self._lock:
+            self._record(custno, error)
+
+    def _record(self, custno, error):
+        if error is None:
+            result = {"status": "ok"}
+        else:
+            result = {"status": "failed", "error": str(error)}
+        self.results[custno] = result
+        for follower in self._followers.pop(custno, ()):
+            follower.results[custno] = dict(result)
+
+    def wait(self, timeout=None):
+        """Block until the job is done or failed, False on timeout"""
+        return self._done.wait(timeout)
+
+    def as_dict(self):
+        with self._lock:
+            results = {custno: dict(result) for custno, result in self.results.items()}
+        return {
+            "job_id": self.id,
+            "status": self.state,
+            "custnos": list(self.custnos),
+            "done": sum(1 for r in results.values() if r["status"] != "pending"),
+            "total": len(self.custnos),
+            "results": results,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class RefreshQueue:
+    """
+    Runs refresh jobs on a small thread pool and remembers the latest ones
+    """
+
+    def __init__(self, max_workers=2, history=100):
+        self.max_workers = max_workers
+        self.history = history
+        self._executor = None
+        self._jobs = OrderedDict()
+        # custno -> the job fetching it
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def configure(self, max_workers=None, history=None):
+        with self._lock:
+            if max_workers is not None and max_workers != self.max_workers:
+                self.max_workers = max_workers
+                # Jobs already submitted keep running on the old pool
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+            if history is not None:
+                self.history = history
+                self._trim()
+
+    def submit(self, app, custnos, run):
+        """
+        Queue run(custnos, progress) inside an app context of app for the
+        custnos no other job is fetching, and follow the others in the jobs
+        fetching them. Returns (job, created); created is False when every
+        custno is already being fetched by one job, which is returned.
+        """
+        custnos = sorted(set(custnos))
+        with self._lock:
+            leaders = {custno: self._inflight[custno] for custno in custnos if custno in self._inflight}
+            jobs = set(leaders.values())
+            if len(leaders) == len(custnos) and len(jobs) == 1:
+                return jobs.pop(), False
+            job = RefreshJob(custnos, self._lock)
+            fresh = [custno for custno in custnos if custno not in leaders]
+            for custno, leader in leaders.items():
+                if leader.results[custno]["status"] == "pending":
+                    leader._followers[custno].append(job)
+                else:
+                    job.results[custno] = dict(leader.results[custno])
+            for leader in jobs:
+                leader._dependents.append(job)
+            job._parts = len(jobs) + (1 if fresh else 0)
+            for custno in fresh:
+                self._inflight[custno] = job
+            self._jobs[job.id] = job
+            self._trim()
+            if fresh:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="refresh")
+                self._executor.submit(self._run, app, job, fresh, run)
+            else:
+                job.state = RUNNING
+                job.started = time.time()
+                if not jobs:
+                    self._finish(job)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, app, job, custnos, run):
+        job.state = RUNNING
+        job.started = time.time()
+        error = None
+        try:
+            with app.app_context():
+                job.summary = run(custnos, job.record)
+        except Exception as e:
+            error = e
+            print(f"Warning: refresh job {job.id} failed: {e}")
+        finally:
+            with self._lock:
+                for custno in custnos:
+                    # Followers must not wait for a result that never comes
+                    if job.results[custno]["status"] == "pending":
+                        job._record(custno, error or "no result reported")
+                    if self._inflight.get(custno) is job:
+                        del self._inflight[custno]
+                self._finish(job, error)
+                for dependent in job._dependents:
+                    self._finish(dependent)
+
+    def _finish(self, job, error=None):
+        # One part of job (its own fetch, or a job it follows) is over
+        if error is not None:
+            job.error = str(error)
+        job._parts -= 1
+        if job._parts > 0:
+            return
+        job.state = FAILED if job.error else DONE
+        job.finished = time.time()
+        job._done.set()
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond history, never active ones
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.history:
+                break
+            if not self._jobs[job_id].active:
+                del self._jobs[job_id]
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+refresh_queue = RefreshQueue()
@@ -0,0 +1,183 @@
+#-*-coding:utf-8-*-
+"""
+Single scheduler leader across worker processes.
+
+Under a multi-worker server every worker builds the app and its
+APScheduler, so every worker would run job1. Each process therefore starts
+its scheduler paused and a LeaderElector resumes it only while the process
+holds a lease: an exclusive lock on a file (flock, or msvcrt.locking on
+Windows; one host, released by the OS when the process dies) or a row of scheduler_leases with an expiry that the
+holder keeps renewing (several hosts sharing the database). The other
+processes keep trying, so one of them takes over when the leader goes away.
+"""
+import atexit
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.schedulers import SchedulerNotRunningError
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app import db
+from app.locking import file_locks_available, lock_file, unlock_file
+from app.models import SchedulerLease
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class FileLease:
+    """
+    Leadership held through an exclusive lock on path
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """
+        Take or keep the lease without blocking, True while it is held
+        """
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        f = open(self.path, "a+")
+        if not lock_file(f, blocking=False):
+            f.close()
+            return False
+        f.truncate(0)
+        f.write(f"{socket.gethostname()} {os.getpid()}\n")
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            unlock_file(self._file)
+            self._file.close()
+            self._file = None
+
+
+class DatabaseLease:
+    """
+    Leadership held through the scheduler_leases row of name until
+    expires_at; acquire() by the holder renews it for ttl seconds. Hosts
+    need reasonably synchronised clocks.
+    """
+
+    def __init__(self, app, name="scheduler", ttl=60):
+        self.app = app
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self):
+        """
+        Take, renew or fail to get the lease, True while it is held
+        """
+        table = SchedulerLease.__table__
+        now = _utcnow()
+        values = {"holder": self.holder, "expires_at": now + timedelta(seconds=self.ttl)}
+        try:
+            with self.app.app_context(), db.engine.begin() as conn:
+                taken = conn.execute(table.update().where(
+                    table.c.name == self.name,
+                    or_(table.c.holder == self.holder, table.c.expires_at < now),
+                ).values(**values)).rowcount
+                if taken:
+                    return True
+                if conn.execute(select(table.c.name).where(table.c.name == self.name)).first() is not None:
+                    return False
+                conn.execute(table.insert().values(name=self.name, **values))
+                return True
+        except IntegrityError:
+            # Another process inserted the row first
+            return False
+        except SQLAlchemyError as e:
+            print(f"Warning: could not acquire the scheduler lease: {e}")
+            return False
+
+    def release(self):
+        table = SchedulerLease.__table__
+        try:
+            with self.app.app_context(), db.engine.begin() as conn:
+                conn.execute(table.update().where(
+                    table.c.name == self.name, table.c.holder == self.holder,
+                ).values(expires_at=_utcnow()))
+        except SQLAlchemyError as e:
+            print(f"Warning: could not release the scheduler lease: {e}")
+
+
+class LeaderElector:
+    """
+    Resumes the (paused) scheduler while lease is held and pauses it when
+    it is lost, checking every interval seconds in a daemon thread
+    """
+
+    def __init__(self, lease, scheduler, interval=20):
+        self.lease = lease
+        self.scheduler = scheduler
+        self.interval = interval
+        self.leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """
+        Try to take or renew the lease and follow the outcome, returns
+        whether this process is the leader
+        """
+        held = self.lease.acquire()
+        try:
+            if held and not self.leader:
+                self.scheduler.resume()
+                print(f"Scheduler leader: process {os.getpid()} runs the scheduled jobs")
+            elif not held and self.leader:
+                self.scheduler.pause()
+                print(f"Scheduler leader: process {os.getpid()} lost the lease, jobs paused")
+        except SchedulerNotRunningError:
+            # Not started (e.g. the debug reloader parent) or shut down
+            pass
+        self.leader = held
+        return held
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.leader:
+            self.leader = False
+            self.lease.release()
+
+
+def make_lease(app):
+    """
+    Lease named by SCHEDULER_LEADER: file, db, or none when every process
+    runs the jobs
+    """
+    kind = app.config.get("SCHEDULER_LEADER") or "none"
+    if kind == "file" and not file_locks_available():
+        print("Warning: no file locks on this platform, electing the scheduler leader through the database")
+        kind = "db"
+    if kind == "file":
+        path = app.config.get("SCHEDULER_LEASE_PATH") or os.path.join(app.instance_path, "scheduler.lock")
+        return FileLease(path)
+    if kind == "db":
+        return DatabaseLease(app, ttl=app.config.get("SCHEDULER_LEASE_TTL", 60))
+    if kind == "none":
+        return None
+    raise ValueError(f"unknown SCHEDULER_LEADER {kind!r}, expected file, db or none")
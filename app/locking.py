@@ -0,0 +1,70 @@
+#-*-coding:utf-8-*-
+"""
+Exclusive locks on open files, shared between processes.
+
+flock on POSIX, msvcrt.locking of the first byte of the file on Windows.
+The platform modules are imported on use, so importing the app does not
+depend on either being available.
+"""
+import time
+
+
+def file_locks_available():
+    """
+    Whether lock_file works on this platform
+    """
+    for name in ("fcntl", "msvcrt"):
+        try:
+            __import__(name)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+def lock_file(f, blocking=True):
+    """
+    Take an exclusive lock on the open file f. Without blocking, returns
+    False when another process holds it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return _lock_msvcrt(f, blocking)
+    flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+    try:
+        fcntl.flock(f, flags)
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+
+def unlock_file(f):
+    """
+    Release the lock lock_file took on f
+    """
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _lock_msvcrt(f, blocking):
+    import msvcrt
+    # msvcrt locks bytes from the current position; LK_LOCK would give up
+    # after ten seconds, so retry LK_NBLCK instead
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(0.05)
@@ -1,7 +1,11 @@
 # from flask_login import UserMixin
 # from app import db, login_manager
 
+from datetime import datetime, timezone
+
 from app import db
+from app.compression import CompressedText
+from app.dates import DayDate
 from flask_login import UserMixin
 
 
@@ -35,11 +39,155 @@ class JsonString(db.Model):
     """
 
     __tablename__ = 'jsonstring'
+    __table_args__ = (
+        # Serves the latest / previous-date snapshot lookups per custno
+        db.Index('ix_jsonstring_custno_date_id', 'custno', 'date', 'id'),
+        db.Index('ix_jsonstring_date', 'date'),
+        # A payload is stored once per custno, refetches only get a marker
+        db.Index('ux_jsonstring_custno_hash', 'custno', 'content_hash', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    # DATE columns, read and written as YYYYMMDD strings
+    date = db.Column(DayDate)
+    navdate = db.Column(DayDate)
+    # Stored zlib-compressed, read back as text. Deferred: the endpoints
+    # work from fund_holdings, so loading a snapshot does not fetch and
+    # decompress its payload unless the attribute is read (or undefer()ed)
+    jsonString = db.deferred(db.Column(CompressedText(16 * 1024 * 1024)))
+    custno = db.Column(db.String(16), nullable=False)
+    # sha256 of the payload, NULL on duplicates stored before deduplication
+    content_hash = db.Column(db.String(64))
+    # When the row was stored (naive UTC), the Last-Modified of responses
+    # built from it; NULL on rows stored before it was added
+    stored_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+
+class FundHolding(db.Model):
+    """
+    Create a FundHolding table, one row per fund per JsonString snapshot
+    """
+
+    __tablename__ = 'fund_holdings'
+    __table_args__ = (
+        # Covers the per-fund history: one range of index entries per
+        # (custno, fundcode), nav and fundvol read from the index itself
+        db.Index('ix_fund_holdings_custno_fundcode', 'custno', 'fundcode', 'snapshot_id', 'nav', 'fundvol'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.String(64))
-    navdate = db.Column(db.String(64))
-    jsonString = db.Column(db.Text)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('jsonstring.id'), nullable=False, index=True)
     custno = db.Column(db.String(16), nullable=False)
+    fundcode = db.Column(db.String(16), nullable=False)
+    nav = db.Column(db.Float, nullable=False)
+    fundvol = db.Column(db.Float, nullable=False)
+
+
+class SnapshotDelta(db.Model):
+    """
+    Create a SnapshotDelta table, the per-fund change of a snapshot
+    against the custno's previous-date snapshot
+    """
+
+    __tablename__ = 'snapshot_deltas'
+    __table_args__ = (
+        db.Index('ix_snapshot_deltas_pair', 'snapshot_id', 'previous_id'),
+        db.Index('ix_snapshot_deltas_custno', 'custno'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('jsonstring.id'), nullable=False)
+    previous_id = db.Column(db.Integer, db.ForeignKey('jsonstring.id'), nullable=False)
+    custno = db.Column(db.String(16), nullable=False)
+    fundcode = db.Column(db.String(16), nullable=False)
+    share_delta = db.Column(db.Float, nullable=False)
+    amount_delta = db.Column(db.Float, nullable=False)
+
+
+class UnchangedSnapshot(db.Model):
+    """
+    Create an UnchangedSnapshot table, recording a fetch whose payload was
+    identical to an already stored JsonString snapshot of the custno
+    """
+
+    __tablename__ = 'unchanged_snapshots'
+    __table_args__ = (
+        db.Index('ix_unchanged_snapshots_custno_date', 'custno', 'date'),
+        db.Index('ix_unchanged_snapshots_date', 'date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    custno = db.Column(db.String(16), nullable=False)
+    date = db.Column(DayDate)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('jsonstring.id'), nullable=False)
+
+
+class SnapshotPointer(db.Model):
+    """
+    Create a SnapshotPointer table, the latest snapshot of a custno and its
+    previous-date snapshot, maintained by ingest
+    """
+
+    __tablename__ = 'custno_snapshot_pointer'
+    custno = db.Column(db.String(16), primary_key=True)
+    latest_id = db.Column(db.Integer, db.ForeignKey('jsonstring.id'), nullable=False)
+    latest_date = db.Column(DayDate, nullable=False)
+    # NULL while the custno has snapshots of a single date only
+    previous_id = db.Column(db.Integer, db.ForeignKey('jsonstring.id'))
+
+class FundRollup(db.Model):
+    """
+    Create a FundRollup table, the weekly or monthly summary of one fund of
+    a custno over snapshots moved to the archive
+    """
+
+    __tablename__ = 'fund_rollups'
+    __table_args__ = (
+        db.Index('ux_fund_rollups_key', 'custno', 'fundcode', 'period', 'period_start', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    custno = db.Column(db.String(16), nullable=False)
+    fundcode = db.Column(db.String(16), nullable=False)
+    # 'week' (starting on Monday) or 'month'
+    period = db.Column(db.String(8), nullable=False)
+    period_start = db.Column(DayDate, nullable=False)
+    # Date of the newest snapshot summarised, the *_last values are its own
+    last_date = db.Column(DayDate, nullable=False)
+    snapshots = db.Column(db.Integer, nullable=False)
+    nav_last = db.Column(db.Float, nullable=False)
+    nav_min = db.Column(db.Float, nullable=False)
+    nav_max = db.Column(db.Float, nullable=False)
+    fundvol_last = db.Column(db.Float, nullable=False)
+    fundvol_sum = db.Column(db.Float, nullable=False)
+
+
+class ArchivedSnapshot(db.Model):
+    """
+    Create an ArchivedSnapshot table, the manifest of JsonString snapshots
+    moved out of the database into archive files
+    """
+
+    __tablename__ = 'archived_snapshots'
+    __table_args__ = (
+        db.Index('ux_archived_snapshots_custno_hash', 'custno', 'content_hash', unique=True),
+        db.Index('ix_archived_snapshots_date', 'date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    custno = db.Column(db.String(16), nullable=False)
+    date = db.Column(DayDate, nullable=False)
+    navdate = db.Column(DayDate)
+    content_hash = db.Column(db.String(64), nullable=False)
+    # Archive file, relative to ARCHIVE_DIR
+    path = db.Column(db.String(255), nullable=False)
+    holdings = db.Column(db.Integer, nullable=False)
+
+
+class SchedulerLease(db.Model):
+    """
+    Create a SchedulerLease table, the process allowed to run the scheduled
+    jobs until expires_at (naive UTC), see app.leader
+    """
+
+    __tablename__ = 'scheduler_leases'
+    name = db.Column(db.String(32), primary_key=True)
+    holder = db.Column(db.String(128), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
 
 
 class User(UserMixin, db.Model):
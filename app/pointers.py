@@ -0,0 +1,89 @@
+#-*-coding:utf-8-*-
+"""
+Latest / previous-date snapshot pointers.
+
+The change endpoints compare the latest snapshot of a custno with its
+previous-date snapshot. custno_snapshot_pointer holds both ids per custno
+and is updated by ingest in the transaction that stores the snapshot, so
+the endpoints read rows by primary key instead of running the ordered
+lookups of app.snapshots. Without a custno they use the custno whose
+latest snapshot is the newest.
+"""
+from app import db
+from app.dates import parse_day
+from app.models import JsonString, SnapshotPointer
+from app.snapshots import latest_snapshot, latest_snapshot_query, previous_snapshot, previous_snapshot_query
+
+
+def refresh_pointer(custno):
+    """
+    Recompute the pointer of custno from jsonstring, in the caller's
+    transaction. Returns the pointer, None when custno has no snapshots.
+    """
+    latest = latest_snapshot_query(custno).with_entities(JsonString.id, JsonString.date).first()
+    pointer = db.session.get(SnapshotPointer, custno)
+    if latest is None:
+        if pointer is not None:
+            db.session.delete(pointer)
+        return None
+    previous = previous_snapshot_query(custno, latest.date).with_entities(JsonString.id).first()
+    if pointer is None:
+        pointer = SnapshotPointer(custno=custno)
+        db.session.add(pointer)
+    pointer.latest_id = latest.id
+    pointer.latest_date = latest.date
+    pointer.previous_id = previous.id if previous is not None else None
+    return pointer
+
+
+def advance_pointer(snapshot):
+    """
+    Point the custno at a snapshot just flushed to the session, in the
+    caller's transaction
+    """
+    pointer = db.session.get(SnapshotPointer, snapshot.custno, with_for_update=True)
+    day = parse_day(snapshot.date)
+    if pointer is None or day < parse_day(pointer.latest_date):
+        # First snapshot of the custno, or a backfill of an older date
+        return refresh_pointer(snapshot.custno)
+    if day > parse_day(pointer.latest_date):
+        pointer.previous_id = pointer.latest_id
+    pointer.latest_id = snapshot.id
+    pointer.latest_date = snapshot.date
+    return pointer
+
+
+def snapshot_pair(custno=None):
+    """
+    (latest, previous) snapshots of custno, or of the custno with the newest
+    snapshot; latest is None without data, previous None without an older date
+    """
+    if custno is None:
+        pointer = SnapshotPointer.query.order_by(SnapshotPointer.latest_date.desc(), SnapshotPointer.latest_id.desc()).first()
+    else:
+        pointer = db.session.get(SnapshotPointer, custno)
+    if pointer is None:
+        # Rows stored before the table existed
+        latest = latest_snapshot(custno) if custno is not None else JsonString.query.order_by(JsonString.date.desc(), JsonString.id.desc()).first()
+        if latest is None:
+            return None, None
+        return latest, previous_snapshot(latest.custno, latest.date)
+    latest = db.session.get(JsonString, pointer.latest_id)
+    previous = db.session.get(JsonString, pointer.previous_id) if pointer.previous_id is not None else None
+    return latest, previous
+
+
+def snapshot_pairs(custnos):
+    """
+    {custno: (latest, previous)} like snapshot_pair for many custnos, with
+    one query for their pointers and one for the snapshots they point at
+    """
+    pointers = SnapshotPointer.query.filter(SnapshotPointer.custno.in_(custnos)).all()
+    ids = {p.latest_id for p in pointers} | {p.previous_id for p in pointers if p.previous_id is not None}
+    snapshots = {s.id: s for s in JsonString.query.filter(JsonString.id.in_(ids))} if ids else {}
+    pairs = {p.custno: (snapshots[p.latest_id], snapshots.get(p.previous_id)) for p in pointers}
+    for custno in custnos:
+        if custno not in pairs:
+            # No data, or rows stored before the table existed
+            pairs[custno] = snapshot_pair(custno)
+    return pairs
@@ -0,0 +1,268 @@
+#-*-coding:utf-8-*-
+"""
+Cache of rendered /api/funds responses.
+
+Entries are keyed by the ETag of app.conditional.Validators, which already
+hashes the endpoint, the query parameters and the snapshot ids (or row
+summaries) the response was built from, and are tagged with the custnos
+behind them. Ingest, retention and delta rebuilds invalidate the tags of
+the custnos they commit, so an entry lives until its data changes or it is
+evicted; there is no TTL.
+
+The memory backend is private to the process. The SQLite backend is one
+file that all workers on a host share, so an invalidation by the process
+that stored a snapshot reaches every worker. Either way a worker that
+missed an invalidation cannot serve a stale entry, since new data changes
+the key. Recomputing deltas changes no ids, so it bumps the generation
+file next to the cache path instead, which is part of every key.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from app.cache import LRUCache
+
+
+class MemoryBackend:
+    """
+    In-process LRU of (body, mimetype, custnos) by key
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024):
+        self._cache = LRUCache(max_entries, max_bytes, sizeof=lambda entry: len(entry[0]) + 256)
+
+    def get(self, key):
+        entry = self._cache.get(key)
+        return entry[:2] if entry is not None else None
+
+    def put(self, key, custnos, body, mimetype):
+        self._cache.put(key, (body, mimetype, frozenset(custnos)))
+
+    def invalidate(self, custnos):
+        custnos = set(custnos)
+        return self._cache.pop_if(lambda entry: not custnos.isdisjoint(entry[2]))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class SQLiteBackend:
+    """
+    Entries in a SQLite file shared by the processes of one host, evicted
+    least recently used beyond max_entries. Errors of the cache file are
+    reported and treated as misses, requests never fail because of it.
+    """
+
+    def __init__(self, path, max_entries=4096):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _connection(self):
+        # One connection per thread, opened again in forked workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, body BLOB NOT NULL, mimetype TEXT NOT NULL, used REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS ix_responses_used ON responses (used);"
+                "CREATE TABLE IF NOT EXISTS response_custnos ("
+                " custno TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (custno, key));"
+                "CREATE INDEX IF NOT EXISTS ix_response_custnos_key ON response_custnos (key);"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _run(self, work, default=None):
+        try:
+            return work(self._connection())
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            print(f"Warning: response cache {self.path}: {e}")
+            return default
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        def work(conn):
+            row = conn.execute("SELECT body, mimetype FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE responses SET used = ? WHERE key = ?", (time.time(), key))
+            return row
+
+        row = self._run(work)
+        self._count(row is not None)
+        return (bytes(row[0]), row[1]) if row is not None else None
+
+    def put(self, key, custnos, body, mimetype):
+        def work(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, body, mimetype, used) VALUES (?, ?, ?, ?)",
+                    (key, body, mimetype, time.time()),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO response_custnos (custno, key) VALUES (?, ?)",
+                    [(custno, key) for custno in custnos],
+                )
+                stale = [row[0] for row in conn.execute(
+                    "SELECT key FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?", (self.max_entries,)
+                )]
+                self._delete(conn, stale)
+
+        self._run(work)
+
+    @staticmethod
+    def _delete(conn, keys):
+        conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+        conn.executemany("DELETE FROM response_custnos WHERE key = ?", [(key,) for key in keys])
+
+    def invalidate(self, custnos):
+        custnos = list(custnos)
+
+        def work(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                keys = set()
+                for custno in custnos:
+                    keys.update(row[0] for row in conn.execute(
+                        "SELECT key FROM response_custnos WHERE custno = ?", (custno,)
+                    ))
+                self._delete(conn, keys)
+                return len(keys)
+
+        return self._run(work, 0)
+
+    def clear(self):
+        def work(conn):
+            with conn:
+                conn.execute("DELETE FROM responses")
+                conn.execute("DELETE FROM response_custnos")
+
+        self._run(work)
+
+    def stats(self):
+        entries, size = self._run(
+            lambda conn: conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone(),
+            (None, None),
+        )
+        with self._lock:
+            return {
+                "entries": entries,
+                "bytes": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+            }
+
+
+class ResponseCache:
+    """
+    Front of the configured backend; a cache without one stores nothing
+    """
+
+    def __init__(self, backend=None, generation_path=None):
+        self.backend = backend
+        self.generation_path = generation_path
+
+    def configure(self, backend, generation_path=None):
+        self.backend = backend
+        self.generation_path = generation_path
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def get(self, key):
+        return self.backend.get(key) if self.backend is not None else None
+
+    def put(self, key, custnos, body, mimetype):
+        if self.backend is not None:
+            self.backend.put(key, custnos, body, mimetype)
+
+    def invalidate(self, custnos):
+        """
+        Drop the entries built from any of custnos, returns how many
+        """
+        if self.backend is None or not custnos:
+            return 0
+        return self.backend.invalidate(custnos)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def generation(self):
+        """
+        (inode, mtime) of the generation file, None before the first bump
+        """
+        if not self.generation_path:
+            return None
+        try:
+            st = os.stat(self.generation_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def bump(self):
+        """
+        Change the generation, so no process serves what it cached before
+        """
+        if not self.generation_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.generation_path)), exist_ok=True)
+        # A new file, so the inode changes even within the mtime resolution
+        building = f"{self.generation_path}.{os.getpid()}"
+        with open(building, "w") as f:
+            f.write(f"{time.time()}\n")
+        os.replace(building, self.generation_path)
+
+    def stats(self):
+        return self.backend.stats() if self.backend is not None else None
+
+
+def cache_path(app):
+    """
+    File of the SQLite backend, RESPONSE_CACHE_PATH or
+    instance/response_cache.db; the generation file is named after it
+    """
+    return app.config.get("RESPONSE_CACHE_PATH") or os.path.join(app.instance_path, "response_cache.db")
+
+
+def make_backend(app):
+    """
+    Backend named by RESPONSE_CACHE_BACKEND: memory, sqlite or none
+    """
+    name = app.config.get("RESPONSE_CACHE_BACKEND") or "none"
+    max_entries = app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 4096)
+    if name == "memory":
+        return MemoryBackend(max_entries, app.config.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    if name == "sqlite":
+        return SQLiteBackend(cache_path(app), max_entries)
+    if name == "none":
+        return None
+    raise ValueError(f"unknown RESPONSE_CACHE_BACKEND {name!r}, expected memory, sqlite or none")
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,317 @@
+#-*-coding:utf-8-*-
+"""
+Retention of raw snapshots.
+
+Snapshots dated more than RETENTION_DAYS ago are moved out of the hot tables:
+
+  * their holdings are rolled up into weekly and monthly per-fund summaries
+    (fund_rollups, served by /api/funds/history?period=week|month);
+  * their payloads are appended to gzip JSONL files partitioned by date,
+    ARCHIVE_DIR/YYYY/MM/YYYYMMDD.jsonl.gz, in the dump format read by
+    app.importer, and listed in archived_snapshots;
+  * their jsonstring, fund_holdings, snapshot_deltas and unchanged_snapshots
+    rows are deleted.
+
+The newest snapshot of every custno and its previous-date snapshot stay
+whatever their age, as do snapshots that markers inside the window still
+point at, so the change endpoints keep working for custnos whose payload
+has not changed for a long time.
+
+`flask funds restore` loads archive files back through the importer. A
+restored snapshot still older than the window is deleted again by the next
+run, without being archived or rolled up a second time.
+"""
+import glob
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import and_, insert, or_
+
+from app import db
+from app.dates import format_day, parse_day
+from app.ingest import payload_hash
+from app.models import ArchivedSnapshot, FundHolding, FundRollup, JsonString, SnapshotDelta, UnchangedSnapshot
+from app.response_cache import response_cache
+from app.snapshots import fold_holdings, latest_snapshot_query, previous_snapshot_query, snapshot_cache
+
+
+PERIODS = ("week", "month")
+
+
+class RetentionSummary:
+    """
+    Counters of a retention run
+    """
+
+    def __init__(self, cutoff):
+        self.cutoff = cutoff
+        self.archived = 0
+        self.dropped = 0
+        self.rollups = 0
+        self.files = set()
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return (
+            f"{self.archived} snapshots dated before {format_day(self.cutoff)} archived to {len(self.files)} files, "
+            f"{self.dropped} copies of archived payloads dropped, {self.rollups} rollups updated in {self.elapsed:.2f}s"
+        )
+
+
+def archive_dir(app):
+    """
+    Directory of the archive files, ARCHIVE_DIR or instance/archive
+    """
+    return app.config.get("ARCHIVE_DIR") or os.path.join(app.instance_path, "archive")
+
+
+def archive_path(day):
+    """
+    Archive file of the snapshots dated day, relative to the archive directory
+    """
+    return os.path.join(f"{day:%Y}", f"{day:%m}", f"{format_day(day)}.jsonl.gz")
+
+
+def period_start(day, period):
+    """
+    First day of the week (Monday) or month containing day
+    """
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def protected_ids(cutoff):
+    """
+    Ids of the snapshots kept whatever their age
+    """
+    ids = set()
+    for custno, in db.session.query(JsonString.custno).distinct():
+        latest = latest_snapshot_query(custno).with_entities(JsonString.id, JsonString.date).first()
+        ids.add(latest.id)
+        previous = previous_snapshot_query(custno, latest.date).with_entities(JsonString.id).first()
+        if previous is not None:
+            ids.add(previous.id)
+    ids.update(row[0] for row in db.session.query(UnchangedSnapshot.snapshot_id).filter(UnchangedSnapshot.date >= cutoff).distinct())
+    return ids
+
+
+def _add_point(summary, day, nav, fundvol):
+    summary["snapshots"] += 1
+    summary["fundvol_sum"] += fundvol
+    summary["nav_min"] = min(summary["nav_min"], nav)
+    summary["nav_max"] = max(summary["nav_max"], nav)
+    if summary["last_date"] is None or day >= summary["last_date"]:
+        summary["last_date"] = day
+        summary["nav_last"] = nav
+        summary["fundvol_last"] = fundvol
+
+
+def _merge(row, summary):
+    # Fold a batch summary into a stored rollup
+    row.snapshots += summary["snapshots"]
+    row.fundvol_sum += summary["fundvol_sum"]
+    row.nav_min = min(row.nav_min, summary["nav_min"])
+    row.nav_max = max(row.nav_max, summary["nav_max"])
+    if summary["last_date"] >= parse_day(row.last_date):
+        row.last_date = summary["last_date"]
+        row.nav_last = summary["nav_last"]
+        row.fundvol_last = summary["fundvol_last"]
+
+
+def merge_rollups(points):
+    """
+    Add (custno, fundcode, day, nav, fundvol) points, one per fund per
+    snapshot, to the weekly and monthly rollups. Returns the number of
+    rollup rows added or updated.
+    """
+    batch = {}
+    for custno, fundcode, day, nav, fundvol in points:
+        for period in PERIODS:
+            key = (custno, fundcode, period, period_start(day, period))
+            summary = batch.get(key)
+            if summary is None:
+                summary = batch[key] = {
+                    "snapshots": 0, "fundvol_sum": 0.0, "nav_min": nav, "nav_max": nav,
+                    "last_date": None, "nav_last": nav, "fundvol_last": fundvol,
+                }
+            _add_point(summary, day, nav, fundvol)
+    if not batch:
+        return 0
+
+    starts = [key[3] for key in batch]
+    stored = {
+        (row.custno, row.fundcode, row.period, parse_day(row.period_start)): row
+        for row in FundRollup.query.filter(
+            FundRollup.custno.in_({key[0] for key in batch}),
+            FundRollup.period_start.between(min(starts), max(starts)),
+        )
+    }
+    for key, summary in batch.items():
+        row = stored.get(key)
+        if row is None:
+            custno, fundcode, period, start = key
+            db.session.add(FundRollup(custno=custno, fundcode=fundcode, period=period, period_start=start, **summary))
+        else:
+            _merge(row, summary)
+    return len(batch)
+
+
+def _write_archive(directory, lines_by_path):
+    for path, lines in lines_by_path.items():
+        full = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        # Appending adds a gzip member, gzip readers see one stream
+        with open(full, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as f:
+                f.write("".join(lines).encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def _archive_batch(rows, directory, summary):
+    ids = [row.id for row in rows]
+    payloads = dict(db.session.query(JsonString.id, JsonString.jsonString).filter(JsonString.id.in_(ids)))
+    # Duplicates stored before deduplication have no hash yet
+    hashes = {row.id: row.content_hash or payload_hash(payloads[row.id]) for row in rows}
+    seen = {
+        (custno, content_hash)
+        for custno, content_hash in db.session.query(ArchivedSnapshot.custno, ArchivedSnapshot.content_hash).filter(
+            ArchivedSnapshot.custno.in_({row.custno for row in rows}),
+            ArchivedSnapshot.content_hash.in_(set(hashes.values())),
+        )
+    }
+    fresh = []
+    for row in rows:
+        key = (row.custno, hashes[row.id])
+        if key in seen:
+            summary.dropped += 1
+            continue
+        seen.add(key)
+        fresh.append(row)
+
+    points = []
+    holdings = defaultdict(int)
+    if fresh:
+        days = {row.id: parse_day(row.date) for row in fresh}
+        rows = db.session.query(
+            FundHolding.snapshot_id,
+            FundHolding.custno,
+            FundHolding.fundcode,
+            FundHolding.nav,
+            FundHolding.fundvol,
+        ).filter(FundHolding.snapshot_id.in_(list(days))).order_by(FundHolding.id)
+        keyed = []
+        for snapshot_id, custno, fundcode, nav, fundvol in rows:
+            keyed.append(((snapshot_id, custno, fundcode), nav, fundvol))
+            holdings[snapshot_id] += 1
+        for (snapshot_id, custno, fundcode), (nav, fundvol) in fold_holdings(keyed).items():
+            points.append((custno, fundcode, days[snapshot_id], nav, fundvol))
+        # Oldest first so the newest snapshot of a period wins
+        points.sort(key=lambda p: p[2])
+
+    lines_by_path = defaultdict(list)
+    manifest = []
+    for row in fresh:
+        path = archive_path(parse_day(row.date))
+        record = {
+            "custno": row.custno,
+            "date": row.date,
+            "navdate": row.navdate,
+            "content_hash": hashes[row.id],
+            "payload": payloads[row.id],
+        }
+        lines_by_path[path].append(json.dumps(record, ensure_ascii=False) + "\n")
+        manifest.append({
+            "custno": row.custno,
+            "date": row.date,
+            "navdate": row.navdate,
+            "content_hash": hashes[row.id],
+            "path": path,
+            "holdings": holdings[row.id],
+        })
+
+    try:
+        summary.rollups += merge_rollups(points)
+        # Files are synced before the rows go; if the commit fails they are
+        # written again by the next run, the importer skips the repeats
+        _write_archive(directory, lines_by_path)
+        if manifest:
+            db.session.execute(insert(ArchivedSnapshot), manifest)
+        SnapshotDelta.query.filter(or_(SnapshotDelta.snapshot_id.in_(ids), SnapshotDelta.previous_id.in_(ids))).delete(synchronize_session=False)
+        UnchangedSnapshot.query.filter(UnchangedSnapshot.snapshot_id.in_(ids)).delete(synchronize_session=False)
+        FundHolding.query.filter(FundHolding.snapshot_id.in_(ids)).delete(synchronize_session=False)
+        JsonString.query.filter(JsonString.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.expunge_all()
+    for snapshot_id in ids:
+        snapshot_cache.pop(snapshot_id)
+    response_cache.invalidate({row.custno for row in rows})
+    summary.archived += len(fresh)
+    summary.files.update(lines_by_path)
+
+
+def apply_retention(days, directory, today=None, batch_size=200):
+    """
+    Archive and roll up the snapshots dated more than days before today.
+    Returns a RetentionSummary.
+    """
+    cutoff = (today or date.today()) - timedelta(days=days)
+    summary = RetentionSummary(cutoff)
+    start = time.perf_counter()
+    keep = protected_ids(cutoff)
+    last = None
+    while True:
+        query = db.session.query(
+            JsonString.id, JsonString.custno, JsonString.date, JsonString.navdate, JsonString.content_hash,
+        ).filter(JsonString.date < cutoff)
+        if last is not None:
+            # Keyset paging: protected rows stay behind in the table
+            query = query.filter(or_(JsonString.date > last.date, and_(JsonString.date == last.date, JsonString.id > last.id)))
+        rows = query.order_by(JsonString.date, JsonString.id).limit(batch_size).all()
+        if not rows:
+            break
+        last = rows[-1]
+        batch = [row for row in rows if row.id not in keep]
+        if batch:
+            _archive_batch(batch, directory, summary)
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def iter_archive(directory, start, end, custnos=None):
+    """
+    Importer records (where, custno, date, payload) of the archived
+    snapshots dated from start to end inclusive, of all or some custnos
+    """
+    from app.importer import iter_jsonl
+
+    for path in sorted(glob.glob(os.path.join(directory, "*", "*", "*.jsonl.gz"))):
+        day = os.path.basename(path).split(".")[0]
+        try:
+            if not start <= parse_day(day) <= end:
+                continue
+        except ValueError:
+            continue
+        for where, custno, snapshot_date, payload in iter_jsonl(path):
+            if custnos and custno not in custnos and not isinstance(payload, Exception):
+                continue
+            yield where, custno, snapshot_date, payload
+
+
+def restore_snapshots(directory, start, end, custnos=None, chunk_size=500):
+    """
+    Load archived snapshots back into the database. Returns the importer's
+    ImportSummary; deltas of the restored custnos are left to the caller.
+    """
+    from app.importer import import_records
+
+    return import_records(iter_archive(directory, start, end, custnos), chunk_size)
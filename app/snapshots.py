@@ -0,0 +1,275 @@
+#-*-coding:utf-8-*-
+"""
+Read helpers for stored snapshots used by the /api/funds endpoints.
+"""
+from sqlalchemy import func, literal, tuple_
+
+from app import db
+from app.cache import LRUCache
+from app.diff_engine import EMPTY, frame_from_rows
+from app.models import FundHolding, FundRollup, JsonString, UnchangedSnapshot
+
+
+# Per-fund aggregate frames by snapshot id. Snapshots are never updated after
+# insert, so entries only leave the cache by eviction or deletion.
+snapshot_cache = LRUCache()
+
+
+# Every lookup below is served by an index on jsonstring; see
+# tests/test_query_plans.py before adding a new one.
+
+def latest_snapshot_query(custno):
+    """
+    Snapshots of a custno, newest first
+    """
+    return JsonString.query.filter_by(custno=custno).order_by(JsonString.date.desc(), JsonString.id.desc())
+
+
+def previous_snapshot_query(custno, date):
+    """
+    Snapshots of a custno dated strictly before date, newest first
+    """
+    return JsonString.query.filter(JsonString.custno == custno, JsonString.date < date).order_by(JsonString.date.desc(), JsonString.id.desc())
+
+
+def latest_on_or_before_query(day, custno=None):
+    """
+    Snapshots dated day or earlier, of one custno or of all, newest first
+    """
+    query = JsonString.query.filter(JsonString.date <= day)
+    if custno is not None:
+        query = query.filter(JsonString.custno == custno)
+    return query.order_by(JsonString.date.desc(), JsonString.id.desc())
+
+
+def snapshots_between_query(start, end, custno=None):
+    """
+    Snapshots dated from start to end inclusive, of one custno or of all,
+    oldest first
+    """
+    query = JsonString.query.filter(JsonString.date.between(start, end))
+    if custno is not None:
+        query = query.filter(JsonString.custno == custno)
+    return query.order_by(JsonString.date, JsonString.id)
+
+
+def latest_marker_on_or_before_query(day, custno):
+    """
+    Unchanged-payload markers of a custno dated day or earlier, newest first
+    """
+    return UnchangedSnapshot.query.filter(
+        UnchangedSnapshot.custno == custno, UnchangedSnapshot.date <= day,
+    ).order_by(UnchangedSnapshot.date.desc(), UnchangedSnapshot.id.desc())
+
+
+def latest_snapshot(custno):
+    return latest_snapshot_query(custno).first()
+
+
+def previous_snapshot(custno, date):
+    return previous_snapshot_query(custno, date).first()
+
+
+def latest_dates_by_custno():
+    """
+    {custno: date of its newest snapshot}, read from the (custno, date, id)
+    index in a single grouped query
+    """
+    return dict(db.session.query(JsonString.custno, func.max(JsonString.date)).group_by(JsonString.custno).all())
+
+
+def latest_custno_on_or_before(day):
+    """
+    The custno with the newest snapshot or unchanged-payload marker dated
+    day or earlier, the lowest one when several share that date; None
+    without any
+    """
+    dates = [
+        row.date for row in (
+            latest_on_or_before_query(day).with_entities(JsonString.date).first(),
+            UnchangedSnapshot.query.filter(UnchangedSnapshot.date <= day).order_by(UnchangedSnapshot.date.desc()).with_entities(UnchangedSnapshot.date).first(),
+        ) if row is not None
+    ]
+    if not dates:
+        return None
+    newest = max(dates)
+    custnos = {row.custno for row in db.session.query(JsonString.custno).filter(JsonString.date == newest)}
+    custnos.update(row.custno for row in db.session.query(UnchangedSnapshot.custno).filter(UnchangedSnapshot.date == newest))
+    return min(custnos)
+
+
+def latest_on_or_before(day, custno=None):
+    """
+    The snapshot a custno held on day: its newest snapshot dated day or
+    earlier, unless a later unchanged-payload marker points back at an
+    older one. Without a custno, that of latest_custno_on_or_before(day).
+    """
+    if custno is None:
+        custno = latest_custno_on_or_before(day)
+        if custno is None:
+            return None
+    snapshot = latest_on_or_before_query(day, custno).first()
+    marker = latest_marker_on_or_before_query(day, custno).first()
+    if marker is not None and (snapshot is None or marker.date > snapshot.date):
+        return db.session.get(JsonString, marker.snapshot_id)
+    return snapshot
+
+
+def snapshots_between(start, end, custno=None):
+    return snapshots_between_query(start, end, custno).all()
+
+
+def snapshot_listing_query(custno=None, after=None):
+    """
+    Metadata of snapshots (id, date, navdate, custno, stored payload bytes)
+    ordered by (date, id), of one custno or of all, starting after the
+    (date, id) cursor; the payload itself is not read
+    """
+    query = db.session.query(
+        JsonString.id,
+        JsonString.date,
+        JsonString.navdate,
+        JsonString.custno,
+        func.length(JsonString.jsonString).label("payload_bytes"),
+    )
+    if custno is not None:
+        query = query.filter(JsonString.custno == custno)
+    if after is not None:
+        date, snapshot_id = after
+        query = query.filter(tuple_(JsonString.date, JsonString.id) > tuple_(literal(date, JsonString.date.type), literal(snapshot_id, JsonString.id.type)))
+    return query.order_by(JsonString.date, JsonString.id)
+
+
+def fund_counts(snapshot_ids):
+    """
+    Number of funds held in each of the given snapshots
+    """
+    rows = db.session.query(FundHolding.snapshot_id, func.count(func.distinct(FundHolding.fundcode))).filter(
+        FundHolding.snapshot_id.in_(snapshot_ids)
+    ).group_by(FundHolding.snapshot_id)
+    return dict(rows.all())
+
+
+# Largest page of /api/funds/snapshots
+MAX_LISTING_LIMIT = 10000
+
+
+def iter_snapshot_listing(custno=None, after=None, limit=100, chunk_size=500):
+    """
+    Yield up to limit snapshot metadata dicts after the (date, id) cursor,
+    reading them chunk_size rows per query so memory and the time to the
+    next row stay flat however long the listing is
+    """
+    while limit > 0:
+        rows = snapshot_listing_query(custno, after).limit(min(limit, chunk_size)).all()
+        if not rows:
+            return
+        counts = fund_counts([row.id for row in rows])
+        for row in rows:
+            yield {
+                "id": row.id,
+                "date": row.date,
+                "navdate": row.navdate,
+                "custno": row.custno,
+                "payload_bytes": row.payload_bytes,
+                "funds": counts.get(row.id, 0),
+            }
+        limit -= len(rows)
+        after = (rows[-1].date, rows[-1].id)
+
+
+def fund_history_query(custno, fundcode, start=None, end=None):
+    """
+    (date, snapshot_id, nav, fundvol) of every holding row of one fund of a
+    custno in the snapshots dated from start to end inclusive (either may be
+    None), oldest first and in payload order within a snapshot
+    """
+    query = db.session.query(
+        JsonString.date,
+        FundHolding.snapshot_id,
+        FundHolding.nav,
+        FundHolding.fundvol,
+    ).join(JsonString, JsonString.id == FundHolding.snapshot_id).filter(
+        FundHolding.custno == custno,
+        FundHolding.fundcode == fundcode,
+    )
+    if start is not None:
+        query = query.filter(JsonString.date >= start)
+    if end is not None:
+        query = query.filter(JsonString.date <= end)
+    return query.order_by(JsonString.date, FundHolding.snapshot_id, FundHolding.id)
+
+
+def fold_holdings(rows):
+    """
+    Fold (key, nav, fundvol) holding rows in payload order into {key: (nav,
+    fundvol)}: volumes are summed and the last nav wins, the rule
+    diff_engine.frame_from_rows applies to a fundcode repeated in a payload
+    """
+    folded = {}
+    for key, nav, fundvol in rows:
+        previous = folded.get(key)
+        folded[key] = (nav, fundvol + previous[1] if previous is not None else fundvol)
+    return folded
+
+
+def fund_history(custno, fundcode, start=None, end=None):
+    """
+    Parallel date, nav, fundvol and value lists of one fund, one point per
+    date; when a date has several snapshots the newest one wins
+    """
+    rows = fund_history_query(custno, fundcode, start, end)
+    folded = fold_holdings(((date, snapshot_id), nav, fundvol) for date, snapshot_id, nav, fundvol in rows)
+    points = {}
+    for (date, _), point in folded.items():
+        points[date] = point
+    dates = list(points)
+    navs = [points[d][0] for d in dates]
+    vols = [points[d][1] for d in dates]
+    return {
+        "dates": dates,
+        "nav": navs,
+        "fundvol": vols,
+        "value": [nav * vol for nav, vol in zip(navs, vols)],
+    }
+
+
+def fund_rollup_history(custno, fundcode, period, start=None, end=None):
+    """
+    Parallel date, nav, fundvol and value lists of the weekly or monthly
+    rollups of one fund, dated by period start; nav and fundvol are those of
+    the newest snapshot of each period
+    """
+    query = FundRollup.query.filter_by(custno=custno, fundcode=fundcode, period=period)
+    if start is not None:
+        query = query.filter(FundRollup.period_start >= start)
+    if end is not None:
+        query = query.filter(FundRollup.period_start <= end)
+    rows = query.order_by(FundRollup.period_start).all()
+    return {
+        "dates": [row.period_start for row in rows],
+        "nav": [row.nav_last for row in rows],
+        "fundvol": [row.fundvol_last for row in rows],
+        "value": [row.nav_last * row.fundvol_last for row in rows],
+        "snapshots": [row.snapshots for row in rows],
+    }
+
+
+def fund_aggregates(snapshot_id):
+    """
+    Per-fund aggregates of a snapshot as a diff_engine.SnapshotFrame,
+    served from snapshot_cache. Frames are shared between requests and
+    must not be modified.
+    """
+    return snapshot_cache.get_or_load(snapshot_id, lambda: _query_fund_aggregates(snapshot_id))
+
+
+def _query_fund_aggregates(snapshot_id):
+    # The holdings of a snapshot in payload order, folded per fundcode by
+    # the diff engine itself so every path agrees on repeated fundcodes
+    rows = db.session.query(
+        FundHolding.fundcode,
+        FundHolding.nav,
+        FundHolding.fundvol,
+    ).filter(FundHolding.snapshot_id == snapshot_id).order_by(FundHolding.id).all()
+    return frame_from_rows(*zip(*rows)) if rows else EMPTY
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compare a full-history scan of the JSON payloads with the columnar store.
+
+Builds a throwaway SQLite database and column store with --years of daily
+snapshots for --custnos customers holding --funds funds each, then times
+the total value per day of every custno computed by json.loads-ing every
+JsonString row and by app.columnar.ColumnView. Finally --workers forked
+processes compute the same series from their own mapping of the store and
+report how much of the mapped column data is private to them and how much
+is shared through the OS page cache. Run from the repository root:
+
+    python benchmarks/bench_columnar.py --years 3 --custnos 20 --funds 50 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask
+
+from app import db
+from app.columnar import ColumnStore, ColumnView
+from app.compression import codec
+from app.models import JsonString
+from tests.base import make_payload
+
+
+def build(path, directory, years, custnos, funds):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    rng = random.Random(1)
+    days = [date(2020, 1, 1) + timedelta(days=d) for d in range(int(years * 365.25))]
+    store = ColumnStore(directory)
+    # Filled alongside the database, so it holds all of it
+    store.mark_built()
+    conn = sqlite3.connect(path)
+    snapshot_id = 0
+    for c in range(custnos):
+        custno = f"c{c:03d}"
+        rows = []
+        columns = []
+        for day in days:
+            snapshot_id += 1
+            holdings = [(f"{f:06d}", round(rng.uniform(0.5, 5), 4), rng.randrange(100000)) for f in range(funds)]
+            payload = make_payload(holdings, navdate=day.strftime("%Y%m%d"))
+            rows.append((snapshot_id, day.isoformat(), day.isoformat(), codec.compress(payload), custno))
+            columns.append((snapshot_id, custno, day, [{"fundcode": f, "nav": n, "fundvol": float(v)} for f, n, v in holdings]))
+        conn.executemany('INSERT INTO jsonstring (id, date, navdate, "jsonString", custno) VALUES (?, ?, ?, ?, ?)', rows)
+        store.append(columns)
+    conn.commit()
+    conn.close()
+    return app, len(days)
+
+
+def scan_payloads(custnos):
+    # What an analysis had to do before: parse every stored payload
+    series = {}
+    for custno in custnos:
+        points = {}
+        query = JsonString.query.options(db.undefer(JsonString.jsonString)).filter_by(custno=custno)
+        for row in query.order_by(JsonString.date, JsonString.id):
+            data = json.loads(row.jsonString)
+            points[row.date] = sum(float(item["nav"]) * float(item["fundvol"]) for item in data[0])
+        series[custno] = points
+    return series
+
+
+def scan_columns(view, custnos):
+    return {custno: dict(zip(*view.daily_value(custno))) for custno in custnos}
+
+
+def mapped_memory(directory):
+    """
+    (private, shared) KiB of this process's resident pages of the store files
+    """
+    private = shared = 0
+    inside = False
+    with open("/proc/self/smaps") as f:
+        for line in f:
+            fields = line.split()
+            if "-" in fields[0] and len(fields) >= 5:
+                inside = len(fields) >= 6 and fields[5].startswith(directory)
+            elif inside and fields[0] in ("Private_Clean:", "Private_Dirty:"):
+                private += int(fields[1])
+            elif inside and fields[0] in ("Shared_Clean:", "Shared_Dirty:"):
+                shared += int(fields[1])
+    return private, shared
+
+
+def worker(directory, custnos, barrier, results):
+    view = ColumnView(directory)
+    scan_columns(view, custnos)
+    # Measure while every worker still maps the store
+    barrier.wait()
+    results.put(mapped_memory(directory))
+    barrier.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=float, default=3, help="years of daily snapshots")
+    parser.add_argument("--custnos", type=int, default=20, help="number of customers")
+    parser.add_argument("--funds", type=int, default=50, help="funds per snapshot")
+    parser.add_argument("--workers", type=int, default=4, help="reader processes sharing the store")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "columns")
+        app, days = build(os.path.join(tmp, "columnar.db"), directory, args.years, args.custnos, args.funds)
+        custnos = [f"c{c:03d}" for c in range(args.custnos)]
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"{days} days x {args.custnos} custnos x {args.funds} funds, column store {size / 1024 / 1024:.1f} MiB")
+
+        with app.app_context():
+            start = time.perf_counter()
+            expected = scan_payloads(custnos)
+            payloads = time.perf_counter() - start
+        start = time.perf_counter()
+        view = ColumnView(directory)
+        got = scan_columns(view, custnos)
+        columns = time.perf_counter() - start
+        for custno in custnos:
+            assert list(got[custno]) == list(expected[custno])
+            assert all(abs(got[custno][d] - expected[custno][d]) <= 1e-6 * abs(expected[custno][d]) for d in got[custno])
+        print(f"daily value of every custno: {payloads:.2f}s parsing payloads, {columns:.3f}s from the column store")
+        del view
+
+        ctx = multiprocessing.get_context("fork")
+        barrier = ctx.Barrier(args.workers)
+        results = ctx.Queue()
+        processes = [ctx.Process(target=worker, args=(directory, custnos, barrier, results)) for _ in range(args.workers)]
+        for p in processes:
+            p.start()
+        memory = [results.get(timeout=120) for _ in processes]
+        for p in processes:
+            p.join()
+        print(f"{'worker':>6} {'private KiB':>12} {'shared KiB':>11}")
+        for i, (private, shared) in enumerate(memory):
+            print(f"{i:>6} {private:>12} {shared:>11}")
+
+
+if __name__ == "__main__":
+    main()
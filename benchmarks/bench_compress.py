@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure the size and decode cost of compressed snapshot payloads.
+
+Reads the payloads of an existing database (instance/fundweb.db by default)
+and, for plain text, zlib and zlib with a dictionary trained on the other
+half of the payloads, reports the stored bytes per snapshot, the decode time
+per snapshot and the size of a SQLite file holding --copies of each payload.
+Run from the repository root:
+
+    python benchmarks/bench_compress.py --database instance/fundweb.db
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.compression import PayloadCodec, train_dictionary
+
+
+def load_payloads(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute('SELECT "jsonString" FROM jsonstring WHERE "jsonString" IS NOT NULL ORDER BY id').fetchall()
+    conn.close()
+    codec = PayloadCodec()
+    return [value if isinstance(value, str) else codec.decompress(value) for value, in rows]
+
+
+def file_size(values, copies):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payloads.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE jsonstring (id INTEGER PRIMARY KEY, payload BLOB)")
+        conn.executemany("INSERT INTO jsonstring (payload) VALUES (?)", ((v,) for _ in range(copies) for v in values))
+        conn.commit()
+        conn.close()
+        return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database", default=os.path.join("instance", "fundweb.db"), help="SQLite database to read payloads from")
+    parser.add_argument("--copies", type=int, default=30, help="copies of each payload in the on-disk comparison")
+    parser.add_argument("--level", type=int, default=6, help="zlib level")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.database)
+    if len(payloads) < 2:
+        sys.exit("need at least two payloads")
+    train, test = payloads[::2], payloads[1::2]
+    print(f"{len(payloads)} payloads, {sum(len(p.encode('utf-8')) for p in test) / len(test):.0f} bytes on average (test half)")
+
+    plain = PayloadCodec(args.level)
+    trained = PayloadCodec(args.level)
+    trained.configure([train_dictionary(train)])
+    raw_size = file_size([p.encode("utf-8") for p in test], args.copies)
+
+    print(f"{'format':>12} {'bytes/snap':>11} {'ratio':>7} {'encode (ms)':>12} {'decode (ms)':>12} {'file (KiB)':>11}")
+    print(f"{'text':>12} {sum(len(p.encode('utf-8')) for p in test) / len(test):>11.0f} {1:>7.2f} {'':>12} {'':>12} {raw_size / 1024:>11.0f}")
+    for name, codec in (("zlib", plain), ("zlib+zdict", trained)):
+        blobs = [codec.compress(p) for p in test]
+        size = sum(len(b) for b in blobs) / len(blobs)
+        ratio = sum(len(p.encode("utf-8")) for p in test) / len(test) / size
+        encode = min(timeit.repeat(lambda: [codec.compress(p) for p in test], number=5, repeat=3)) / 5 / len(test)
+        decode = min(timeit.repeat(lambda: [codec.decompress(b) for b in blobs], number=5, repeat=3)) / 5 / len(test)
+        print(f"{name:>12} {size:>11.0f} {ratio:>7.2f} {encode * 1000:>12.3f} {decode * 1000:>12.3f} {file_size(blobs, args.copies) / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark the vectorized diff engine against the old per-fund loops.
+
+For 10, 1k and 50k holdings per snapshot it times:
+  loops     - the dict loops the endpoints used to run on parsed payloads
+  engine    - diff_engine.frame_from_rows on both payloads, then diff
+  cached    - diff on two prebuilt frames (what a snapshot_cache hit costs)
+
+Run from the repository root:
+
+    python benchmarks/bench_diff.py --holdings 10,1000,50000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app import diff_engine
+
+
+def random_items(rng, count):
+    # About two holdings per fund, like customers holding a fund through several channels
+    return [{"fundcode": f"{rng.randrange(max(1, count // 2)):06d}", "nav": f"{rng.uniform(0.5, 5):.4f}", "fundvol": f"{rng.uniform(0, 1e5):.2f}"} for _ in range(count)]
+
+
+def loops(items, last_items):
+    navInfo = {}
+    for item in items:
+        navInfo[item["fundcode"]] = float(item["nav"])
+    volInfo = {}
+    for item in items:
+        if item["fundcode"] in volInfo:
+            volInfo[item["fundcode"]] = volInfo[item["fundcode"]] + float(item["fundvol"])
+        else:
+            volInfo[item["fundcode"]] = float(item["fundvol"])
+    lastVolInfo = {}
+    for item in last_items:
+        if item["fundcode"] in lastVolInfo:
+            lastVolInfo[item["fundcode"]] = lastVolInfo[item["fundcode"]] + float(item["fundvol"])
+        else:
+            lastVolInfo[item["fundcode"]] = float(item["fundvol"])
+    newVolInfo = {}
+    for k, v in volInfo.items():
+        newVolInfo[k] = volInfo[k] - lastVolInfo.get(k, 0)
+    returnVolInfo = {}
+    for k, v in newVolInfo.items():
+        if v != 0.0:
+            returnVolInfo[k] = v * navInfo[k]
+    return returnVolInfo
+
+
+def frame_from_items(items):
+    return diff_engine.frame_from_rows(
+        [item["fundcode"] for item in items],
+        [float(item["nav"]) for item in items],
+        [float(item["fundvol"]) for item in items],
+    )
+
+
+def engine(items, last_items):
+    return diff_engine.diff(frame_from_items(items), frame_from_items(last_items)).changed()
+
+
+def best(func, *args):
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--holdings", default="10,1000,50000", help="comma-separated holdings per snapshot")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'holdings':>9} {'loops (us)':>12} {'engine (us)':>12} {'cached (us)':>12}")
+    for count in [int(n) for n in args.holdings.split(",")]:
+        items, last_items = random_items(rng, count), random_items(rng, count)
+        current, previous = frame_from_items(items), frame_from_items(last_items)
+        print(f"{count:>9} {best(loops, items, last_items) * 1e6:>12.1f} {best(engine, items, last_items) * 1e6:>12.1f} "
+              f"{best(diff_engine.diff, current, previous) * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark <return> extraction: the old minidom round-trip versus the
+streaming pull parser, on large synthetic upstream responses.
+
+Reports parse time and peak Python memory (tracemalloc) for each payload
+size. Run from the repository root:
+
+    python benchmarks/bench_extract.py --funds 1000,10000,50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import xml.dom.minidom
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.extractor import CHUNK_SIZE, extract_return_text
+
+
+def build_body(funds):
+    holdings = [{"fundcode": f"{i % 5000:06d}", "fundname": "华夏成长混合", "nav": "1.2345", "fundvol": f"{i}.00", "navdate": "20240115"} for i in range(funds)]
+    payload = json.dumps([holdings])
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            f'<ns2:getAssetsListNewResponse xmlns:ns2="http://example.com/"><return>{payload}</return>'
+            '</ns2:getAssetsListNewResponse></soap:Body></soap:Envelope>').encode("utf8")
+
+
+def legacy(body):
+    text = body.decode("utf8")  # what requests does for r.text
+    DOMTree = xml.dom.minidom.parseString(text.encode("raw_unicode_escape").decode("raw_unicode_escape").encode("utf8")).documentElement.getElementsByTagName("return")
+    return DOMTree[0].childNodes[0].data
+
+
+def streaming(body):
+    return extract_return_text(body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+
+
+def measure(func, body, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(body)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    result = func(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--funds", default="1000,10000,50000", help="comma-separated holdings per response")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'funds':>7} {'body MB':>8} {'path':>10} {'time (ms)':>10} {'peak MB':>8}")
+    for funds in [int(n) for n in args.funds.split(",")]:
+        body = build_body(funds)
+        old, old_time, old_peak = measure(legacy, body, args.repeat)
+        new, new_time, new_peak = measure(streaming, body, args.repeat)
+        assert old == new, "streaming extractor output differs from minidom path"
+        mb = len(body) / 1e6
+        print(f"{funds:>7} {mb:>8.2f} {'minidom':>10} {old_time * 1000:>10.1f} {old_peak / 1e6:>8.1f}")
+        print(f"{funds:>7} {mb:>8.2f} {'streaming':>10} {new_time * 1000:>10.1f} {new_peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the concurrent upstream fetcher against a local stub server.
+
+The stub answers every custno with a small SOAP-style response after a fixed
+delay, so wall time is dominated by upstream latency just like the real
+18:25 job. Run from the repository root:
+
+    python benchmarks/bench_fetch.py --custnos 200 --delay 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.fetcher import FundFetcher
+
+
+def build_response(custno):
+    payload = json.dumps([[{"fundcode": f"{i:06d}", "nav": "1.2345", "fundvol": "1000.0", "navdate": "20240115", "custno": custno} for i in range(20)]])
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            f'<ns2:getAssetsListNewResponse xmlns:ns2="http://example.com/"><return>{payload}</return>'
+            '</ns2:getAssetsListNewResponse></soap:Body></soap:Envelope>').encode("utf8")
+
+
+def start_stub_server(delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(delay)
+            body = build_response(self.path.rsplit("=", 1)[-1])
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        # The default backlog of 5 drops connections once the pool grows
+        request_queue_size = 128
+
+    server = Server(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--custnos", type=int, default=200, help="number of custnos to fetch")
+    parser.add_argument("--delay", type=float, default=0.05, help="stub latency per request in seconds")
+    parser.add_argument("--pools", default="1,2,4,8,16,32", help="comma-separated worker pool sizes")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.delay)
+    api_url = f"http://127.0.0.1:{server.server_address[1]}/getAssetsListNew"
+    custnos = [f"c{i:05d}" for i in range(args.custnos)]
+
+    print(f"{args.custnos} custnos, {args.delay * 1000:.0f} ms upstream latency")
+    print(f"{'workers':>8} {'wall (s)':>10} {'custno/s':>10} {'speedup':>8}")
+    baseline = None
+    for pool in [int(p) for p in args.pools.split(",")]:
+        with FundFetcher(api_url, max_workers=pool, timeout=5, retries=0) as fetcher:
+            summary = fetcher.fetch_many(custnos)
+        if summary.failed:
+            print(f"{pool:>8} {len(summary.failed)} failures: {next(iter(summary.failed.values()))}")
+            continue
+        baseline = baseline or summary.elapsed
+        print(f"{pool:>8} {summary.elapsed:>10.2f} {args.custnos / summary.elapsed:>10.1f} {baseline / summary.elapsed:>7.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time the per-fund history query behind /api/funds/history.
+
+Builds a throwaway SQLite database with --years of daily snapshots for
+--custnos customers holding --funds funds each, then times
+app.snapshots.fund_history for the full range of one fund, with and
+without the covering (custno, fundcode, ...) index. Run from the
+repository root:
+
+    python benchmarks/bench_history.py --years 5 --custnos 20 --funds 50
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask
+
+from app import db, snapshots
+
+
+def build_database(path, years, custnos, funds):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    rng = random.Random(1)
+    days = [(date(2020, 1, 1) + timedelta(days=d)).isoformat() for d in range(int(years * 365.25))]
+    conn = sqlite3.connect(path)
+    snapshot_id = 0
+    for c in range(custnos):
+        custno = f"c{c:03d}"
+        snapshot_rows = []
+        holding_rows = []
+        for day in days:
+            snapshot_id += 1
+            snapshot_rows.append((snapshot_id, day, day, "[]", custno))
+            holding_rows.extend((snapshot_id, custno, f"{f:06d}", rng.uniform(0.5, 5), rng.uniform(0, 1e5)) for f in range(funds))
+        conn.executemany('INSERT INTO jsonstring (id, date, navdate, "jsonString", custno) VALUES (?, ?, ?, ?, ?)', snapshot_rows)
+        conn.executemany("INSERT INTO fund_holdings (snapshot_id, custno, fundcode, nav, fundvol) VALUES (?, ?, ?, ?, ?)", holding_rows)
+    conn.commit()
+    conn.close()
+    return app, len(days)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=float, default=5, help="years of daily snapshots")
+    parser.add_argument("--custnos", type=int, default=20, help="number of customers")
+    parser.add_argument("--funds", type=int, default=50, help="funds per snapshot")
+    parser.add_argument("--repeat", type=int, default=20, help="queries timed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        app, days = build_database(path, args.years, args.custnos, args.funds)
+        print(f"{days} days x {args.custnos} custnos x {args.funds} funds = {days * args.custnos * args.funds} holdings")
+        with app.app_context():
+            history = snapshots.fund_history("c007", "000013")
+            assert len(history["dates"]) == days
+            indexed = min(timeit.repeat(lambda: snapshots.fund_history("c007", "000013"), number=1, repeat=args.repeat))
+            db.session.execute(db.text("DROP INDEX ix_fund_holdings_custno_fundcode"))
+            db.session.commit()
+            plain = min(timeit.repeat(lambda: snapshots.fund_history("c007", "000013"), number=1, repeat=3))
+        print(f"{days}-point series: {indexed * 1000:.1f} ms with the covering index, {plain * 1000:.1f} ms without")
+
+
+if __name__ == "__main__":
+    main()
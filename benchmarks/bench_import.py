@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure the bulk import rate of `flask funds import` on SQLite.
+
+Writes a JSONL dump of --snapshots snapshots with --funds holdings each,
+spread over --custnos customers, then imports it into a throwaway SQLite
+database with app.importer and reports snapshots/s, rows/s and the peak
+RSS growth while importing. Run from the repository root:
+
+    python benchmarks/bench_import.py --snapshots 20000 --funds 20
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def write_dump(path, snapshots, custnos, funds):
+    rng = random.Random(1)
+    start = date(2015, 1, 1)
+    days = max(1, snapshots // custnos)
+    with open(path, "w") as f:
+        for i in range(snapshots):
+            day = (start + timedelta(days=i % days)).strftime("%Y%m%d")
+            payload = [[{"fundcode": f"{k:06d}", "nav": f"{rng.uniform(0.5, 5):.4f}", "fundvol": f"{rng.uniform(0, 1e5):.2f}", "navdate": day} for k in range(funds)]]
+            f.write(json.dumps({"custno": f"c{i // days:04d}", "date": day, "payload": json.dumps(payload)}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--snapshots", type=int, default=20000, help="snapshots in the dump")
+    parser.add_argument("--custnos", type=int, default=20, help="number of customers")
+    parser.add_argument("--funds", type=int, default=20, help="holdings per snapshot")
+    parser.add_argument("--chunk-size", type=int, default=500, help="snapshots per transaction")
+    parser.add_argument("--profile", default="production", help="FLASK_CONFIG profile")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, "dump.jsonl")
+        write_dump(dump, args.snapshots, args.custnos, args.funds)
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'fundweb.db')}"
+        import config
+        from app import create_app
+        from app.importer import import_records, iter_files
+        config.ProductionConfig.JOBS = []
+        config.Config.JOBS = []
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            app = create_app(args.profile)
+        app.apscheduler.shutdown(wait=False)
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with app.app_context():
+            summary = import_records(iter_files([dump]), args.chunk_size)
+        growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+        print(f"dump {os.path.getsize(dump) / 1e6:.1f} MB, {args.snapshots} snapshots x {args.funds} funds")
+        print(summary)
+        print(f"{summary.stored / summary.elapsed * 3600 / 1e6:.2f}M snapshots/hour, peak RSS growth {growth / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time pages of /api/funds/snapshots across a large snapshot table.
+
+Builds a throwaway SQLite database with --snapshots snapshots of --funds
+funds each (payloads of --payload-kib KiB), then walks the whole listing
+page by page through the test client with --limit rows per page and
+reports the latency of the first, middle and last pages and the peak
+Python memory of streaming one page. Run from the repository root:
+
+    python benchmarks/bench_listing.py --snapshots 100000 --limit 1000
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def fill(path, snapshots, funds, payload_kib):
+    conn = sqlite3.connect(path)
+    blob = os.urandom(payload_kib * 1024)
+    custnos = 20
+    snapshot_rows = []
+    holding_rows = []
+    for i in range(1, snapshots + 1):
+        day = (date(2000, 1, 1) + timedelta(days=(i - 1) // custnos)).isoformat()
+        custno = f"c{i % custnos:03d}"
+        snapshot_rows.append((i, day, day, blob, custno))
+        holding_rows.extend((i, custno, f"{f:06d}", 1.0, 1.0) for f in range(funds))
+    conn.executemany('INSERT INTO jsonstring (id, date, navdate, "jsonString", custno) VALUES (?, ?, ?, ?, ?)', snapshot_rows)
+    conn.executemany("INSERT INTO fund_holdings (snapshot_id, custno, fundcode, nav, fundvol) VALUES (?, ?, ?, ?, ?)", holding_rows)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--snapshots", type=int, default=100000, help="snapshots in the table")
+    parser.add_argument("--funds", type=int, default=5, help="funds per snapshot")
+    parser.add_argument("--payload-kib", type=int, default=4, help="stored payload size")
+    parser.add_argument("--limit", type=int, default=1000, help="snapshots per page")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'listing.db')}"
+        import config
+        from app import create_app
+        config.ProductionConfig.JOBS = []
+        config.ProductionConfig.COLUMN_STORE_ENABLED = False
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            app = create_app("production")
+            app.apscheduler.shutdown(wait=False)
+        app.config["LOGIN_DISABLED"] = True
+        fill(os.path.join(tmp, "listing.db"), args.snapshots, args.funds, args.payload_kib)
+        client = app.test_client()
+
+        timings = []
+        query = f"limit={args.limit}"
+        total = 0
+        while True:
+            start = time.perf_counter()
+            data = client.get(f"/api/funds/snapshots?{query}").get_json()
+            if data["snapshots"]:
+                timings.append(time.perf_counter() - start)
+            total += len(data["snapshots"])
+            if data["next"] is None:
+                break
+            query = f"limit={args.limit}&after={data['next']}"
+        assert total == args.snapshots
+
+        tracemalloc.start()
+        response = client.get(f"/api/funds/snapshots?limit={args.limit}", buffered=False)
+        size = sum(len(chunk) for chunk in response.response)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(f"{total} snapshots in {len(timings)} pages of {args.limit}")
+        print(f"page latency (ms): first {timings[0] * 1000:.1f}, middle {timings[len(timings) // 2] * 1000:.1f}, last {timings[-1] * 1000:.1f}")
+        print(f"streaming a {size / 1024:.0f} KiB page peaks at {peak / 1024:.0f} KiB of Python memory")
+
+
+if __name__ == "__main__":
+    main()
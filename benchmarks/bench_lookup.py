@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the latest / previous-date snapshot lookups as jsonstring grows.
+
+Builds throwaway SQLite databases with the given number of snapshots spread
+over --custnos customers and times app.snapshots.latest_snapshot and
+previous_snapshot, with and without the jsonstring indexes. Run from
+the repository root:
+
+    python benchmarks/bench_lookup.py --snapshots 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask
+
+from app import db, snapshots
+
+
+def build_database(path, total, custnos):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    days = max(1, total // custnos)
+    start = date(2020, 1, 1)
+    conn = sqlite3.connect(path)
+    rows = ((i + 1, (start + timedelta(days=i % days)).isoformat(), "2020-01-01", "[]", f"c{i // days:05d}") for i in range(total))
+    conn.executemany('INSERT INTO jsonstring (id, date, navdate, "jsonString", custno) VALUES (?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    return app, days
+
+
+def time_lookups(app, custnos, repeat):
+    names = [f"c{random.randrange(custnos):05d}" for _ in range(repeat)]
+    with app.app_context():
+        start = time.perf_counter()
+        for custno in names:
+            latest = snapshots.latest_snapshot(custno)
+            snapshots.previous_snapshot(custno, latest.date)
+            db.session.expunge_all()
+        return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--snapshots", default="10000,100000,1000000", help="comma-separated table sizes")
+    parser.add_argument("--custnos", type=int, default=1000, help="number of customers")
+    parser.add_argument("--repeat", type=int, default=200, help="lookups timed per size")
+    parser.add_argument("--no-index-limit", type=int, default=100000, help="largest size also timed without the index")
+    args = parser.parse_args()
+
+    print(f"{'snapshots':>10} {'indexed (ms)':>13} {'no index (ms)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for total in [int(n) for n in args.snapshots.split(",")]:
+            path = os.path.join(tmp, f"lookup_{total}.db")
+            app, _ = build_database(path, total, args.custnos)
+            indexed = time_lookups(app, args.custnos, args.repeat)
+            unindexed = ""
+            if total <= args.no_index_limit:
+                conn = sqlite3.connect(path)
+                conn.execute("DROP INDEX ix_jsonstring_custno_date_id")
+                conn.execute("DROP INDEX ix_jsonstring_date")
+                conn.close()
+                with app.app_context():
+                    db.engine.dispose()
+                unindexed = f"{time_lookups(app, args.custnos, max(1, args.repeat // 10)) * 1000:>14.2f}"
+            print(f"{total:>10} {indexed * 1000:>13.3f} {unindexed}")
+
+
+if __name__ == "__main__":
+    main()
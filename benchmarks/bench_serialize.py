@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time JSON serialization and measure bytes on the wire of large API bodies.
+
+Builds the documents of /api/funds/volume-changes, /api/funds/compare and
+/api/funds/history for a portfolio of --funds funds (the history series
+gets one point per fund), then times the stdlib and orjson providers of
+app.encoding over --repeat runs and reports the body size sent as is,
+gzip- and deflate-compressed at --level, with the time compression takes.
+Run from the repository root:
+
+    python benchmarks/bench_serialize.py --funds 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app import encoding
+from app.encoding import OrjsonProvider
+
+
+def documents(funds):
+    rng = random.Random(1)
+    codes = [f"{f:06d}" for f in range(funds)]
+    changes = {code: round(rng.uniform(-1e5, 1e5), 2) for code in codes}
+    changes.update({"description": "no processed", "date": "20240102", "custno": "c001"})
+    compare = {code: rng.uniform(-1e6, 1e6) for code in codes}
+    compare.update({"description": "arbitrarily / no processed amount : vol", "date": "20240102"})
+    compare["amountInfo"] = {code: rng.uniform(-1e5, 1e5) for code in codes}
+    navs = [rng.uniform(0.5, 5) for _ in codes]
+    vols = [float(rng.randrange(1000000)) for _ in codes]
+    history = {
+        "custno": "c001",
+        "fundcode": "000001",
+        "dates": [f"{2000 + i // 365:04d}{i // 28 % 12 + 1:02d}{i % 28 + 1:02d}" for i in range(funds)],
+        "nav": navs,
+        "fundvol": vols,
+        "value": [nav * vol for nav, vol in zip(navs, vols)],
+    }
+    return {"volume-changes": changes, "compare": compare, "history": history}
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--funds", type=int, default=10000, help="funds per document")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per measurement, the best one is reported")
+    parser.add_argument("--level", type=int, default=6, help="compression level")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = [("stdlib", DefaultJSONProvider(app))]
+    if encoding.orjson is not None:
+        providers.append(("orjson", OrjsonProvider(app)))
+    else:
+        print("orjson is not installed, timing the stdlib provider only")
+
+    print(f"{'document':<15} {'serializer':<10} {'ms':>8} {'bytes':>10} {'gzip':>9} {'ms':>7} {'deflate':>9} {'ms':>7}")
+    with app.app_context():
+        for name, doc in documents(args.funds).items():
+            for label, provider in providers:
+                elapsed, body = best_of(args.repeat, lambda: provider.response(doc).get_data())
+                row = f"{name:<15} {label:<10} {elapsed * 1000:>8.2f} {len(body):>10}"
+                for coding in encoding.CONTENT_ENCODINGS:
+                    packed, data = best_of(args.repeat, lambda: encoding.encode(body, coding, args.level))
+                    row += f" {len(data):>9} {packed * 1000:>7.2f}"
+                print(row)
+
+
+if __name__ == "__main__":
+    main()
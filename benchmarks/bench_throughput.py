@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure API request throughput of the default and production profiles.
+
+Fills a throwaway SQLite database with --custnos customers and --days
+snapshots each, then for every profile serves the app on a threaded
+werkzeug server in a child process and hits the change, by-date and health endpoints from
+--clients concurrent keep-alive clients for --seconds. SQL echo output of
+the default profile goes to /dev/null but is still paid for. Run from the
+repository root:
+
+    python benchmarks/bench_throughput.py --clients 8 --seconds 5
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def fill(app, custnos, days, funds):
+    from app.ingest import store_snapshot
+    from tests.base import make_payload
+    rng = random.Random(1)
+    start = date(2024, 1, 1)
+    with app.app_context():
+        for c in range(custnos):
+            for d in range(days):
+                day = (start + timedelta(days=d)).strftime("%Y%m%d")
+                holdings = [(f"{f:06d}", round(rng.uniform(0.5, 5), 4), rng.randrange(1000)) for f in range(funds)]
+                store_snapshot(f"c{c:03d}", day, make_payload(holdings, navdate=day))
+    return [(start + timedelta(days=d)).strftime("%Y%m%d") for d in range(days)]
+
+
+def hammer(url, custnos, dates, clients, seconds):
+    stop = time.perf_counter() + seconds
+    counts = []
+
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        done = 0
+        while time.perf_counter() < stop:
+            custno = f"c{rng.randrange(custnos):03d}"
+            path = rng.choice([
+                f"/api/funds/volume-changes?custno={custno}",
+                f"/api/funds/nav-changes?custno={custno}",
+                f"/api/funds/by-date?date={rng.choice(dates)}&custno={custno}",
+                "/health",
+            ])
+            session.get(url + path).raise_for_status()
+            done += 1
+        counts.append(done)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds
+
+
+def serve(profile, ready):
+    from app import create_app
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        app = create_app(profile)
+        app.config["LOGIN_DISABLED"] = True
+        server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+        ready.put(server.server_port)
+        server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--custnos", type=int, default=20, help="number of customers")
+    parser.add_argument("--days", type=int, default=10, help="snapshots per customer")
+    parser.add_argument("--funds", type=int, default=50, help="funds per snapshot")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--seconds", type=float, default=5, help="duration per profile")
+    parser.add_argument("--profiles", default="default,production", help="comma-separated FLASK_CONFIG profiles")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'fundweb.db')}"
+        import config
+        from app import create_app, db
+        for name in ("Config", "ProductionConfig"):
+            getattr(config, name).JOBS = []
+
+        # Fill the database with the production profile, then leave it
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            app = create_app("production")
+            dates = fill(app, args.custnos, args.days, args.funds)
+            app.apscheduler.shutdown(wait=False)
+            with app.app_context():
+                db.engine.dispose()
+
+        # The server runs in its own process so the clients do not compete
+        # with it for the GIL
+        ctx = multiprocessing.get_context("fork")
+        print(f"{'profile':>12} {'req/s':>9}")
+        for profile in args.profiles.split(","):
+            ready = ctx.Queue()
+            process = ctx.Process(target=serve, args=(profile, ready), daemon=True)
+            process.start()
+            port = ready.get(timeout=60)
+            rate = hammer(f"http://127.0.0.1:{port}", args.custnos, dates, args.clients, args.seconds)
+            process.terminate()
+            process.join()
+            print(f"{profile:>12} {rate:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
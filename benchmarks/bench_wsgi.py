@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load-test the production WSGI servers against the development server.
+
+Fills a throwaway SQLite database like bench_throughput.py, then serves
+wsgi:app with the production profile from the Flask development server
+(what run.py starts), gunicorn with --workers workers of --threads threads
+and waitress with --threads threads, each in its own process group, and
+hits the change, by-date and health endpoints from --clients concurrent
+keep-alive clients for --seconds. It also counts how many gunicorn
+workers took the scheduler lease. A server that is not installed is
+reported as not started. Run from the repository root:
+
+    python benchmarks/bench_wsgi.py --workers 4 --clients 16 --seconds 10
+"""
+import argparse
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import requests
+
+from bench_throughput import fill, hammer
+
+
+# wsgi:app without the login, imported by every server
+APP_MODULE = """
+from wsgi import app
+app.config["LOGIN_DISABLED"] = True
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def servers(workers, threads):
+    """
+    (name, command of a server listening on port) of every server
+    """
+    python = sys.executable
+    yield "dev server", lambda port: [
+        python, "-c", f"from bench_app import app; app.run(host='127.0.0.1', port={port}, use_reloader=False)",
+    ]
+    yield f"gunicorn {workers}x{threads}", lambda port: [
+        python, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+        "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--threads", str(threads), "bench_app:app",
+    ]
+    yield f"waitress 1x{threads}", lambda port: [
+        python, "-m", "waitress", f"--listen=127.0.0.1:{port}", f"--threads={threads}", "bench_app:app",
+    ]
+
+
+def wait_ready(url, process, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            return False
+        with contextlib.suppress(requests.RequestException):
+            if requests.get(url + "/health", timeout=1).ok:
+                return True
+        time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--custnos", type=int, default=20, help="number of customers")
+    parser.add_argument("--days", type=int, default=10, help="snapshots per customer")
+    parser.add_argument("--funds", type=int, default=50, help="funds per snapshot")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--seconds", type=float, default=10, help="duration per server")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'fundweb.db')}",
+            FLASK_CONFIG="production",
+            SCHEDULER_LEADER="file",
+            SCHEDULER_LEASE_PATH=os.path.join(tmp, "scheduler.lock"),
+            RESPONSE_CACHE_BACKEND="none",
+            COLUMN_STORE_ENABLED="0",
+            PYTHONPATH=os.pathsep.join([tmp, ROOT]),
+            PYTHONUNBUFFERED="1",
+        )
+        os.environ.update({k: env[k] for k in ("DATABASE_URL", "COLUMN_STORE_ENABLED")})
+        with open(os.path.join(tmp, "bench_app.py"), "w") as f:
+            f.write(APP_MODULE)
+
+        import config
+        from app import create_app, db
+        config.ProductionConfig.JOBS = []
+        config.ProductionConfig.SCHEDULER_LEADER = "none"
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            app = create_app("production")
+            dates = fill(app, args.custnos, args.days, args.funds)
+            app.apscheduler.shutdown(wait=False)
+            with app.app_context():
+                db.engine.dispose()
+
+        print(f"{'server':>16} {'req/s':>9}")
+        for name, command in servers(args.workers, args.threads):
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            log = open(os.path.join(tmp, "server.log"), "w+")
+            try:
+                process = subprocess.Popen(command(port), cwd=tmp, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+            except OSError:
+                print(f"{name:>16} {'not installed':>9}")
+                continue
+            try:
+                if not wait_ready(url, process):
+                    log.seek(0)
+                    print(f"{name:>16} {'did not start':>9}: {log.read().strip().splitlines()[-1:]}")
+                    continue
+                rate = hammer(url, args.custnos, dates, args.clients, args.seconds)
+                print(f"{name:>16} {rate:>9.0f}")
+            finally:
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(process.pid, 15)
+                process.wait()
+            if name.startswith("gunicorn"):
+                log.seek(0)
+                leaders = sum("runs the scheduled jobs" in line for line in log)
+                print(f"{'':>16} scheduler leaders among {args.workers} workers: {leaders}")
+            log.close()
+
+
+if __name__ == "__main__":
+    main()
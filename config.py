@@ -1,24 +1,125 @@
 import os
 
+
+def mysql_engine_options():
+    """
+    Connection pool settings for server databases; SQLite keeps the defaults
+    """
+    if os.environ.get('DATABASE_URL', 'sqlite:').startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        # MySQL drops idle connections after wait_timeout (8h by default,
+        # often much less behind proxies)
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),
+        'pool_pre_ping': True,
+    }
+
+
 class Config:
     JOBS = [
         {
             'id': 'job1',
-            'func': 'app.__init__:fetch_and_store_fund_data',
+            'func': 'app:fetch_and_store_fund_data',
             'args': (1, 2),
             'trigger': 'cron',
             'day_of_week': 'mon-sun',
             'hour': 18,
             'minute': 25
+        },
+        {
+            'id': 'job2',
+            'func': 'app:retain_snapshots',
+            'trigger': 'cron',
+            'day_of_week': 'mon-sun',
+            'hour': 3,
+            'minute': 30
         }
     ]
     SCHEDULER_API_ENABLED = True
     SCHEDULER_TIMEZONE = 'Asia/Shanghai'
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///fundweb.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///fundweb.db')
     SQLALCHEMY_ECHO = True
+    # PRAGMAs run on every new SQLite connection, see ProductionConfig
+    SQLITE_PRAGMAS = {}
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+    # Upstream fetching: worker pool size, per-request timeout (seconds),
+    # retries per custno and the base backoff (seconds) between retries
+    FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', 8))
+    FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT', 10))
+    FETCH_RETRIES = int(os.environ.get('FETCH_RETRIES', 2))
+    FETCH_BACKOFF = float(os.environ.get('FETCH_BACKOFF', 0.5))
+    # In-process LRU cache of per-snapshot fund aggregates
+    SNAPSHOT_CACHE_MAX_ENTRIES = int(os.environ.get('SNAPSHOT_CACHE_MAX_ENTRIES', 1024))
+    SNAPSHOT_CACHE_MAX_BYTES = int(os.environ.get('SNAPSHOT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # Background refresh jobs: executor size and how many finished jobs
+    # stay available for polling
+    REFRESH_MAX_WORKERS = int(os.environ.get('REFRESH_MAX_WORKERS', 2))
+    REFRESH_JOB_HISTORY = int(os.environ.get('REFRESH_JOB_HISTORY', 100))
+    # Snapshot payload compression: zlib level and preset dictionary files
+    # (os.pathsep-separated, the first one is used for new rows)
+    PAYLOAD_COMPRESS_LEVEL = int(os.environ.get('PAYLOAD_COMPRESS_LEVEL', 6))
+    PAYLOAD_ZDICT = os.environ.get('PAYLOAD_ZDICT', '')
+    # Retention: days of raw snapshots kept in the database (0 keeps them
+    # all) and where older payloads are archived, instance/archive by default
+    RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 0))
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', '')
+    # Memory-mapped columnar copy of the holdings for analytics, kept up to
+    # date by ingest, in instance/columns by default
+    COLUMN_STORE_ENABLED = os.environ.get('COLUMN_STORE_ENABLED', '1') != '0'
+    COLUMN_STORE_DIR = os.environ.get('COLUMN_STORE_DIR', '')
+    # Cache-Control of /api/funds responses carrying an ETag. no-cache lets
+    # browsers (and proxies, with public) keep them but revalidate each use
+    API_CACHE_CONTROL = os.environ.get('API_CACHE_CONTROL', 'private, no-cache')
+    # Rendered /api/funds responses: memory (per process), sqlite (one file
+    # shared by the workers of a host, instance/response_cache.db by
+    # default) or none; entries go when ingest stores a snapshot of their custno
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', '')
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 4096))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # JSON serializer of jsonify: auto (orjson when installed), orjson or
+    # stdlib; /api/funds bodies of COMPRESS_MIN_SIZE bytes or more are
+    # gzip/deflate-compressed at COMPRESS_LEVEL (0 turns it off)
+    JSON_SERIALIZER = os.environ.get('JSON_SERIALIZER', 'auto')
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 1))
+    # Which process runs the scheduled jobs under a multi-worker server:
+    # file (flock on SCHEDULER_LEASE_PATH, instance/scheduler.lock by
+    # default; one host), db (a lease row renewed every TTL/3 seconds;
+    # several hosts) or none (every process runs them)
+    SCHEDULER_LEADER = os.environ.get('SCHEDULER_LEADER', 'file')
+    SCHEDULER_LEASE_PATH = os.environ.get('SCHEDULER_LEASE_PATH', '')
+    SCHEDULER_LEASE_TTL = int(os.environ.get('SCHEDULER_LEASE_TTL', 60))
+
+class ProductionConfig(Config):
+    DEBUG = False
+    SQLALCHEMY_ECHO = False
+    SQLALCHEMY_ENGINE_OPTIONS = mysql_engine_options()
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Negative values are KiB rather than pages
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    }
+
+class TestingConfig(Config):
+    JOBS = []
+    TESTING = True
+    DEBUG = False
+    LOGIN_DISABLED = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ECHO = False
+    COLUMN_STORE_ENABLED = False
+    SCHEDULER_LEADER = 'none'
 
 app_config = {
-    'default': Config
+    'default': Config,
+    'development': Config,
+    'production': ProductionConfig,
+    'testing': TestingConfig
 }
\ No newline at end of file
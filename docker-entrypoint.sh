@@ -13,4 +13,4 @@ flask db migrate
 flask db upgrade
 
 cd /Photos-Docker-Flask
-python run.py
\ No newline at end of file
+gunicorn -c gunicorn.conf.py wsgi:app
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+gunicorn settings for wsgi:app, overridable from the environment.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+# Each worker must build its own app: with preload the master would take
+# the scheduler lease and run the jobs itself, and the workers would
+# inherit its database connections
+preload_app = False
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
@@ -18,8 +18,12 @@ logger = logging.getLogger('alembic.env')
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from flask import current_app
+# The URL of the app's engine: Flask-SQLAlchemy resolves a relative sqlite
+# path against the instance folder, Alembic would resolve it against the cwd.
+# '%' is escaped for the ini-style interpolation of set_main_option.
 config.set_main_option('sqlalchemy.url',
-                       current_app.config.get('SQLALCHEMY_DATABASE_URI'))
+                       current_app.extensions['migrate'].db.engine.url.render_as_string(
+                           hide_password=False).replace('%', '%%'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -0,0 +1,95 @@
+"""fund_holdings table, backfilled from jsonstring
+
+Revision ID: 56a292bdacf6
+Revises: 363b3e881f8a
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '56a292bdacf6'
+down_revision = '363b3e881f8a'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+jsonstring = sa.table(
+    'jsonstring',
+    sa.column('id', sa.Integer),
+    sa.column('custno', sa.String),
+    sa.column('jsonString', sa.Text),
+)
+
+fund_holdings = sa.table(
+    'fund_holdings',
+    sa.column('snapshot_id', sa.Integer),
+    sa.column('custno', sa.String),
+    sa.column('fundcode', sa.String),
+    sa.column('nav', sa.Float),
+    sa.column('fundvol', sa.Float),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # db.create_all() in create_app may already have created an empty table
+    if 'fund_holdings' not in inspector.get_table_names():
+        op.create_table('fund_holdings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('snapshot_id', sa.Integer(), nullable=False),
+        sa.Column('custno', sa.String(length=16), nullable=False),
+        sa.Column('fundcode', sa.String(length=16), nullable=False),
+        sa.Column('nav', sa.Float(), nullable=False),
+        sa.Column('fundvol', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['snapshot_id'], ['jsonstring.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_fund_holdings_snapshot_id'), 'fund_holdings', ['snapshot_id'], unique=False)
+
+    # Only databases created by db.create_all() carry custno on jsonstring
+    if 'custno' not in [c['name'] for c in inspector.get_columns('jsonstring')]:
+        return
+
+    # Backfill every snapshot that has no holdings yet, in id order and batches
+    done = sa.select(fund_holdings.c.snapshot_id).where(fund_holdings.c.snapshot_id == jsonstring.c.id).exists()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(jsonstring.c.id, jsonstring.c.custno, jsonstring.c.jsonString)
+            .where(jsonstring.c.id > last_id)
+            .where(~done)
+            .order_by(jsonstring.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        holdings = []
+        for snapshot_id, custno, payload in rows:
+            try:
+                holdings.extend([
+                    {
+                        'snapshot_id': snapshot_id,
+                        'custno': custno,
+                        'fundcode': item['fundcode'],
+                        'nav': float(item['nav']),
+                        'fundvol': float(item['fundvol']),
+                    }
+                    for item in json.loads(payload)[0]
+                ])
+            except (IndexError, KeyError, TypeError, ValueError) as e:
+                print(f"Skipping jsonstring {snapshot_id}: {e}")
+        if holdings:
+            bind.execute(fund_holdings.insert(), holdings)
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    op.drop_index(op.f('ix_fund_holdings_snapshot_id'), table_name='fund_holdings')
+    op.drop_table('fund_holdings')
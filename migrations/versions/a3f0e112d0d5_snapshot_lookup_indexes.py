@@ -0,0 +1,48 @@
+"""bring jsonstring up to date with the models and index snapshot lookups
+
+Revision ID: a3f0e112d0d5
+Revises: 56a292bdacf6
+Create Date: 2026-10-18 10:03:27.540116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f0e112d0d5'
+down_revision = '56a292bdacf6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    # The first revisions predate navdate, custno and users; databases that
+    # were created with db.create_all() already have them
+    columns = [c['name'] for c in inspector.get_columns('jsonstring')]
+    if 'navdate' not in columns:
+        op.add_column('jsonstring', sa.Column('navdate', sa.String(length=64), nullable=True))
+    if 'custno' not in columns:
+        op.add_column('jsonstring', sa.Column('custno', sa.String(length=16), nullable=False, server_default=''))
+    if 'users' not in tables:
+        op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username')
+        )
+
+    indexes = [i['name'] for i in inspector.get_indexes('jsonstring')]
+    if 'ix_jsonstring_custno_date_id' not in indexes:
+        op.create_index('ix_jsonstring_custno_date_id', 'jsonstring', ['custno', 'date', 'id'], unique=False)
+    if 'ix_jsonstring_date' not in indexes:
+        op.create_index('ix_jsonstring_date', 'jsonstring', ['date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_jsonstring_date', table_name='jsonstring')
+    op.drop_index('ix_jsonstring_custno_date_id', table_name='jsonstring')
@@ -0,0 +1,61 @@
+"""fund_rollups and archived_snapshots tables for snapshot retention
+
+Revision ID: a7d3e5c91f42
+Revises: f6b1d8a3c205
+Create Date: 2026-10-18 18:05:41.502317
+
+Nothing is archived until RETENTION_DAYS is set, see app/retention.py.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e5c91f42'
+down_revision = 'f6b1d8a3c205'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() in create_app may already have created the tables
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'fund_rollups' not in tables:
+        op.create_table('fund_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('custno', sa.String(length=16), nullable=False),
+        sa.Column('fundcode', sa.String(length=16), nullable=False),
+        sa.Column('period', sa.String(length=8), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('last_date', sa.Date(), nullable=False),
+        sa.Column('snapshots', sa.Integer(), nullable=False),
+        sa.Column('nav_last', sa.Float(), nullable=False),
+        sa.Column('nav_min', sa.Float(), nullable=False),
+        sa.Column('nav_max', sa.Float(), nullable=False),
+        sa.Column('fundvol_last', sa.Float(), nullable=False),
+        sa.Column('fundvol_sum', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ux_fund_rollups_key', 'fund_rollups', ['custno', 'fundcode', 'period', 'period_start'], unique=True)
+    if 'archived_snapshots' not in tables:
+        op.create_table('archived_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('custno', sa.String(length=16), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('navdate', sa.Date(), nullable=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.String(length=255), nullable=False),
+        sa.Column('holdings', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ux_archived_snapshots_custno_hash', 'archived_snapshots', ['custno', 'content_hash'], unique=True)
+        op.create_index('ix_archived_snapshots_date', 'archived_snapshots', ['date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_archived_snapshots_date', table_name='archived_snapshots')
+    op.drop_index('ux_archived_snapshots_custno_hash', table_name='archived_snapshots')
+    op.drop_table('archived_snapshots')
+    op.drop_index('ux_fund_rollups_key', table_name='fund_rollups')
+    op.drop_table('fund_rollups')
@@ -0,0 +1,53 @@
+"""custno_snapshot_pointer table
+
+Revision ID: b58e2f7a6c90
+Revises: a7d3e5c91f42
+Create Date: 2026-10-18 19:12:08.337415
+
+Fills the pointer of every custno that does not have one yet, also when
+db.create_all() already created the empty table.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b58e2f7a6c90'
+down_revision = 'a7d3e5c91f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'custno_snapshot_pointer' not in sa.inspect(bind).get_table_names():
+        op.create_table('custno_snapshot_pointer',
+        sa.Column('custno', sa.String(length=16), nullable=False),
+        sa.Column('latest_id', sa.Integer(), nullable=False),
+        sa.Column('latest_date', sa.Date(), nullable=False),
+        sa.Column('previous_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['latest_id'], ['jsonstring.id'], ),
+        sa.ForeignKeyConstraint(['previous_id'], ['jsonstring.id'], ),
+        sa.PrimaryKeyConstraint('custno')
+        )
+
+    custnos = bind.execute(sa.text(
+        'SELECT DISTINCT custno FROM jsonstring '
+        'WHERE custno NOT IN (SELECT custno FROM custno_snapshot_pointer)'
+    )).scalars().all()
+    for custno in custnos:
+        latest = bind.execute(sa.text(
+            'SELECT id, date FROM jsonstring WHERE custno = :custno ORDER BY date DESC, id DESC LIMIT 1'
+        ), {'custno': custno}).first()
+        previous = bind.execute(sa.text(
+            'SELECT id FROM jsonstring WHERE custno = :custno AND date < :date ORDER BY date DESC, id DESC LIMIT 1'
+        ), {'custno': custno, 'date': latest.date}).scalar()
+        bind.execute(sa.text(
+            'INSERT INTO custno_snapshot_pointer (custno, latest_id, latest_date, previous_id) '
+            'VALUES (:custno, :latest_id, :latest_date, :previous_id)'
+        ), {'custno': custno, 'latest_id': latest.id, 'latest_date': latest.date, 'previous_id': previous})
+
+
+def downgrade():
+    op.drop_table('custno_snapshot_pointer')
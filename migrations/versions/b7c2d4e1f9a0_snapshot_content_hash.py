@@ -0,0 +1,91 @@
+"""content hash on jsonstring and unchanged_snapshots markers
+
+Revision ID: b7c2d4e1f9a0
+Revises: da553e939bd3
+Create Date: 2026-10-18 13:02:11.408213
+
+Existing rows are hashed in batches; when a custno already stored the same
+payload, the later copies keep a NULL hash so the unique index can be built
+without touching their data.
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c2d4e1f9a0'
+down_revision = 'da553e939bd3'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+jsonstring = sa.table(
+    'jsonstring',
+    sa.column('id', sa.Integer),
+    sa.column('custno', sa.String),
+    sa.column('jsonString', sa.Text),
+    sa.column('content_hash', sa.String),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # db.create_all() in create_app may already have created the new table
+    if 'unchanged_snapshots' not in inspector.get_table_names():
+        op.create_table('unchanged_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('custno', sa.String(length=16), nullable=False),
+        sa.Column('date', sa.String(length=64), nullable=True),
+        sa.Column('snapshot_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['snapshot_id'], ['jsonstring.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_unchanged_snapshots_custno_date', 'unchanged_snapshots', ['custno', 'date'], unique=False)
+        op.create_index('ix_unchanged_snapshots_date', 'unchanged_snapshots', ['date'], unique=False)
+
+    if 'content_hash' not in [c['name'] for c in inspector.get_columns('jsonstring')]:
+        op.add_column('jsonstring', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # Hash the rows that have none yet, in id order and batches; only the
+    # first copy of a payload per custno gets its hash
+    seen = set(bind.execute(
+        sa.select(jsonstring.c.custno, jsonstring.c.content_hash).where(jsonstring.c.content_hash.isnot(None))
+    ).fetchall())
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(jsonstring.c.id, jsonstring.c.custno, jsonstring.c.jsonString)
+            .where(jsonstring.c.id > last_id)
+            .where(jsonstring.c.content_hash.is_(None))
+            .order_by(jsonstring.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for snapshot_id, custno, payload in rows:
+            if payload is None:
+                continue
+            key = (custno, hashlib.sha256(payload.encode('utf-8')).hexdigest())
+            if key in seen:
+                continue
+            seen.add(key)
+            bind.execute(jsonstring.update().where(jsonstring.c.id == snapshot_id).values(content_hash=key[1]))
+        last_id = rows[-1][0]
+
+    if 'ux_jsonstring_custno_hash' not in [i['name'] for i in inspector.get_indexes('jsonstring')]:
+        op.create_index('ux_jsonstring_custno_hash', 'jsonstring', ['custno', 'content_hash'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ux_jsonstring_custno_hash', table_name='jsonstring')
+    with op.batch_alter_table('jsonstring') as batch_op:
+        batch_op.drop_column('content_hash')
+    op.drop_index('ix_unchanged_snapshots_date', table_name='unchanged_snapshots')
+    op.drop_index('ix_unchanged_snapshots_custno_date', table_name='unchanged_snapshots')
+    op.drop_table('unchanged_snapshots')
@@ -0,0 +1,76 @@
+"""store jsonstring payloads zlib-compressed
+
+Revision ID: c41e8a9d2b67
+Revises: b7c2d4e1f9a0
+Create Date: 2026-10-18 14:37:52.206911
+
+Rows are converted in batches with plain zlib; `flask funds train-zdict`
+and `flask funds recompress-payloads` switch them to a shared dictionary
+afterwards. SQLite keeps the declared column type, it stores the blobs as is.
+
+"""
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e8a9d2b67'
+down_revision = 'b7c2d4e1f9a0'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+jsonstring = sa.table(
+    'jsonstring',
+    sa.column('id', sa.Integer),
+    sa.column('jsonString', sa.LargeBinary),
+)
+
+
+def is_compressed(data):
+    return len(data) >= 2 and data[0] & 0x0F == 8 and (data[0] * 256 + data[1]) % 31 == 0
+
+
+def convert(encode):
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(jsonstring.c.id, jsonstring.c.jsonString)
+            .where(jsonstring.c.id > last_id)
+            .order_by(jsonstring.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for snapshot_id, value in rows:
+            if value is None:
+                continue
+            if isinstance(value, str):
+                value = value.encode('utf-8')
+            new = encode(bytes(value))
+            if new is not None:
+                updates.append({'b_id': snapshot_id, 'b_value': new})
+        if updates:
+            bind.execute(
+                jsonstring.update().where(jsonstring.c.id == sa.bindparam('b_id')).values(jsonString=sa.bindparam('b_value')),
+                updates,
+            )
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('jsonstring', 'jsonString', type_=sa.LargeBinary(length=16 * 1024 * 1024), existing_type=sa.Text())
+    convert(lambda data: None if is_compressed(data) else zlib.compress(data, 6))
+
+
+def downgrade():
+    # Rows written with a preset dictionary need it and cannot go back here
+    convert(lambda data: zlib.decompress(data).decode('utf-8') if is_compressed(data) else None)
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('jsonstring', 'jsonString', type_=sa.Text(), existing_type=sa.LargeBinary(length=16 * 1024 * 1024))
@@ -0,0 +1,30 @@
+"""stored_at on jsonstring
+
+Revision ID: c93a6e0d4b18
+Revises: b58e2f7a6c90
+Create Date: 2026-10-18 20:41:53.120674
+
+Existing rows keep a NULL stored_at; responses built only from them are
+sent without Last-Modified and revalidate by ETag alone.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c93a6e0d4b18'
+down_revision = 'b58e2f7a6c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'stored_at' not in [c['name'] for c in inspector.get_columns('jsonstring')]:
+        op.add_column('jsonstring', sa.Column('stored_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('jsonstring') as batch_op:
+        batch_op.drop_column('stored_at')
@@ -0,0 +1,31 @@
+"""scheduler_leases table
+
+Revision ID: d1f4b7c82e56
+Revises: c93a6e0d4b18
+Create Date: 2026-10-18 22:07:31.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f4b7c82e56'
+down_revision = 'c93a6e0d4b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() in create_app may already have created it
+    if 'scheduler_leases' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('scheduler_leases',
+        sa.Column('name', sa.String(length=32), nullable=False),
+        sa.Column('holder', sa.String(length=128), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('scheduler_leases')
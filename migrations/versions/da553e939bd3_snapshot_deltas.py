@@ -0,0 +1,45 @@
+"""snapshot_deltas table
+
+Revision ID: da553e939bd3
+Revises: a3f0e112d0d5
+Create Date: 2026-10-18 11:20:05.671342
+
+Existing snapshots get their deltas with `flask funds recompute-deltas`;
+until then the change endpoints compute missing pairs on the fly.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'da553e939bd3'
+down_revision = 'a3f0e112d0d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() in create_app may already have created the table
+    if 'snapshot_deltas' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table('snapshot_deltas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('snapshot_id', sa.Integer(), nullable=False),
+    sa.Column('previous_id', sa.Integer(), nullable=False),
+    sa.Column('custno', sa.String(length=16), nullable=False),
+    sa.Column('fundcode', sa.String(length=16), nullable=False),
+    sa.Column('share_delta', sa.Float(), nullable=False),
+    sa.Column('amount_delta', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['previous_id'], ['jsonstring.id'], ),
+    sa.ForeignKeyConstraint(['snapshot_id'], ['jsonstring.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_snapshot_deltas_pair', 'snapshot_deltas', ['snapshot_id', 'previous_id'], unique=False)
+    op.create_index('ix_snapshot_deltas_custno', 'snapshot_deltas', ['custno'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_snapshot_deltas_custno', table_name='snapshot_deltas')
+    op.drop_index('ix_snapshot_deltas_pair', table_name='snapshot_deltas')
+    op.drop_table('snapshot_deltas')
@@ -0,0 +1,43 @@
+"""typed DATE columns for snapshot dates
+
+Revision ID: e2a9c7f4d318
+Revises: c41e8a9d2b67
+Create Date: 2026-10-18 15:48:09.713520
+
+The YYYYMMDD strings become DATE values. MySQL converts them itself when
+the column type changes; SQLite keeps the declared type and stores dates as
+YYYY-MM-DD text, so the values are rewritten in place.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c7f4d318'
+down_revision = 'c41e8a9d2b67'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [('jsonstring', 'date'), ('jsonstring', 'navdate'), ('unchanged_snapshots', 'date')]
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table, column in COLUMNS:
+        if bind.dialect.name == 'sqlite':
+            op.execute(
+                f'UPDATE {table} SET "{column}" = substr("{column}", 1, 4) || \'-\' || substr("{column}", 5, 2) || \'-\' || substr("{column}", 7, 2) '
+                f'WHERE length("{column}") = 8 AND "{column}" NOT LIKE \'%-%\''
+            )
+        else:
+            op.alter_column(table, column, type_=sa.Date(), existing_type=sa.String(length=64))
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, column in COLUMNS:
+        if bind.dialect.name == 'sqlite':
+            op.execute(f'UPDATE {table} SET "{column}" = replace("{column}", \'-\', \'\')')
+        else:
+            op.alter_column(table, column, type_=sa.String(length=64), existing_type=sa.Date())
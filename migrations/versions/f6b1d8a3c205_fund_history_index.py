@@ -0,0 +1,27 @@
+"""covering index for per-fund history
+
+Revision ID: f6b1d8a3c205
+Revises: e2a9c7f4d318
+Create Date: 2026-10-18 16:52:30.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b1d8a3c205'
+down_revision = 'e2a9c7f4d318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() in create_app may already have created the index
+    if 'ix_fund_holdings_custno_fundcode' in [i['name'] for i in sa.inspect(op.get_bind()).get_indexes('fund_holdings')]:
+        return
+    op.create_index('ix_fund_holdings_custno_fundcode', 'fund_holdings', ['custno', 'fundcode', 'snapshot_id', 'nav', 'fundvol'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_fund_holdings_custno_fundcode', table_name='fund_holdings')
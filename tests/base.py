@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+
+from app import create_app, db
+
+
+def make_payload(holdings, navdate="20240102"):
+    """构造上游<return>中的JSON文本，holdings为(fundcode, nav, fundvol)列表"""
+    return json.dumps([[{"fundcode": code, "nav": str(nav), "fundvol": str(vol), "navdate": navdate} for code, nav, vol in holdings]])
+
+
+class AppTestCase(unittest.TestCase):
+    """使用内存数据库的应用测试基类"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def add_snapshot(self, custno, date, holdings):
+        from app.ingest import store_snapshot
+        return store_snapshot(custno, date, make_payload(holdings, navdate=date))
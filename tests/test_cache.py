@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+
+from sqlalchemy import event
+
+from app import db
+from app.cache import LRUCache
+from app.snapshots import fund_aggregates, snapshot_cache
+from tests.base import AppTestCase
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    """LRU缓存测试用例"""
+
+    def test_evicts_least_recently_used(self):
+        """测试按条目数淘汰最久未使用的条目"""
+        cache = LRUCache(max_entries=2)
+        cache.put(1, "a")
+        cache.put(2, "b")
+        cache.get(1)
+        cache.put(3, "c")
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), "a")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_memory_bound(self):
+        """测试按估算内存淘汰"""
+        cache = LRUCache(max_entries=100, max_bytes=1000, sizeof=lambda value: 400)
+        for i in range(5):
+            cache.put(i, i)
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.stats()["bytes"], 1000)
+        cache.put("huge", 1)
+        cache = LRUCache(max_bytes=100, sizeof=lambda value: 400)
+        cache.put("huge", 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_counters(self):
+        """测试命中/未命中计数"""
+        cache = LRUCache()
+        loads = []
+        for _ in range(3):
+            cache.get_or_load("k", lambda: loads.append(1) or "v")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertEqual(len(loads), 1)
+
+    def test_thread_safety(self):
+        """测试多线程并发读写"""
+        cache = LRUCache(max_entries=50)
+
+        def work(offset):
+            for i in range(2000):
+                cache.get_or_load((offset + i) % 80, lambda: [i])
+
+        threads = [threading.Thread(target=work, args=(n * 7,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = cache.stats()
+        self.assertEqual(stats["hits"] + stats["misses"], 16000)
+        self.assertLessEqual(stats["entries"], 50)
+
+
+class SnapshotCacheTestCase(AppTestCase):
+    """快照聚合缓存测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.first = self.add_snapshot("C1", "20240101", [("000001", 1.0, 100)])
+        self.second = self.add_snapshot("C1", "20240102", [("000001", 1.5, 120)])
+        snapshot_cache.clear()
+
+    def test_repeat_reads_skip_the_database(self):
+        """测试重复读取同一快照不再查询数据库"""
+        snapshot_id = self.second.id
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            first = fund_aggregates(snapshot_id)
+            second = fund_aggregates(snapshot_id)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        self.assertIs(first, second)
+        self.assertEqual(len(statements), 1)
+
+    def test_by_date_does_not_modify_cached_aggregates(self):
+        """测试接口不会修改缓存中的共享数据"""
+        for _ in range(2):
+            data = self.client.get('/api/funds/by-date?date=20240102').get_json()
+            self.assertEqual(data["description"], "special date")
+        self.assertNotIn("description", fund_aggregates(self.second.id).vol_info())
+        stats = self.client.get('/api/funds/cache-stats').get_json()
+        self.assertGreaterEqual(stats["hits"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sqlalchemy import event
+
+from app import db
+from app.response_cache import response_cache
+from tests.base import AppTestCase
+
+
+class CombinedChangesTestCase(AppTestCase):
+    """多客户合并变化接口测试用例"""
+
+    def add_custnos(self, count, start=0):
+        for c in range(start, start + count):
+            self.add_snapshot(f"C{c:03d}", "20240101", [("000001", 1.5, 100), ("000002", 2.0, 5)])
+            self.add_snapshot(f"C{c:03d}", "20240102", [("000001", 1.5, 100 + c), ("000002", 2.0, 5)])
+
+    def statements_of(self, url):
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        response_cache.clear()
+        db.session.expire_all()
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            response = self.client.get(url)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+        return response, statements
+
+    def test_matches_single_custno_endpoints(self):
+        """测试结果与 nav-changes / volume-changes 一致"""
+        self.add_custnos(3)
+        data = self.client.get("/api/funds/changes?custno=C001,C002").get_json()["custnos"]
+        self.assertEqual(list(data), ["C001", "C002"])
+        for custno, changes in data.items():
+            nav = self.client.get(f"/api/funds/nav-changes?custno={custno}").get_json()
+            volume = self.client.get(f"/api/funds/volume-changes?custno={custno}").get_json()
+            self.assertEqual((changes["date"], changes["previous_date"]), ("20240102", "20240101"))
+            self.assertEqual(changes["nav"], {k: v for k, v in nav.items() if k.isdigit()})
+            self.assertEqual(changes["volume"], {k: v for k, v in volume.items() if k.isdigit()})
+        self.assertEqual(data["C002"]["nav"], {"000001": 3.0})
+        self.assertEqual(data["C002"]["volume"], {"000001": 2.0})
+
+    def test_query_count_does_not_grow(self):
+        """测试查询次数不随客户数增长"""
+        self.add_custnos(5)
+        custnos = ",".join(f"C{c:03d}" for c in range(5))
+        response, few = self.statements_of(f"/api/funds/changes?custno={custnos}")
+        self.assertEqual(len(response.get_json()["custnos"]), 5)
+
+        self.add_custnos(45, start=5)
+        custnos = ",".join(f"C{c:03d}" for c in range(50))
+        response, many = self.statements_of(f"/api/funds/changes?custno={custnos}")
+        self.assertEqual(len(response.get_json()["custnos"]), 50)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(len(many), 3)
+        self.assertTrue(all(" IN (" in s for s in many))
+
+    def test_partial_errors(self):
+        """测试无数据或无可比数据的客户单独报错"""
+        self.add_custnos(1)
+        self.add_snapshot("ONE", "20240102", [("000001", 1.0, 1)])
+        response = self.client.get("/api/funds/changes?custno=C000,ONE,nobody")
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()["custnos"]
+        self.assertIn("nav", data["C000"])
+        self.assertIn("could not find data before 20240102", data["ONE"]["error"])
+        self.assertIn("has no data", data["nobody"]["error"])
+
+    def test_missing_custno(self):
+        """测试缺少 custno 参数"""
+        self.assertEqual(self.client.get("/api/funds/changes").status_code, 400)
+        self.assertEqual(self.client.get("/api/funds/changes?custno=,").status_code, 400)
+
+    def test_conditional_and_invalidation(self):
+        """测试 ETag 随任一客户的新快照变化"""
+        self.add_custnos(2)
+        url = "/api/funds/changes?custno=C000,C001"
+        etag = self.client.get(url).headers["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        self.add_snapshot("C001", "20240103", [("000001", 1.5, 200)])
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["custnos"]["C001"]["volume"], {"000001": 99.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
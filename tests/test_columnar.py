@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.columnar import ColumnView, column_store, fund_flows, init_column_store, rebuild_columns
+from app.importer import import_records
+from tests.base import AppTestCase, make_payload
+
+
+class ColumnStoreTestCase(AppTestCase):
+    """列式历史存储测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "columns")
+        self.init_store(self.directory)
+        self.add_snapshot("C1", "20240101", [("000001", 1.0, 100), ("000002", 2.0, 5)])
+        self.add_snapshot("C2", "20240101", [("000001", 1.0, 7)])
+        self.add_snapshot("C1", "20240102", [("000001", 1.5, 100), ("000001", 1.5, 20)])
+        self.add_snapshot("C1", "20240103", [("000002", 2.5, 4)])
+
+    def tearDown(self):
+        column_store.configure(None)
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def init_store(self, directory):
+        with mock.patch.dict(self.app.config, COLUMN_STORE_ENABLED=True, COLUMN_STORE_DIR=directory):
+            init_column_store(self.app)
+
+    def test_ingest_appends(self):
+        """测试入库时追加列数据"""
+        view = column_store.view()
+        self.assertEqual(len(view), 6)
+        self.assertEqual(view.custnos, ["C1", "C2"])
+        self.assertEqual(list(view.runs["length"]), [2, 1, 2, 1])
+        self.assertIsInstance(view.nav, np.memmap)
+
+    def test_daily_value(self):
+        """测试每日总市值"""
+        dates, values = column_store.view().daily_value("C1")
+        self.assertEqual(dates, ["20240101", "20240102", "20240103"])
+        self.assertEqual(values, [110.0, 180.0, 10.0])
+        self.assertEqual(column_store.view().daily_value("nobody"), ([], []))
+
+    def test_fund_series_and_flows(self):
+        """测试单只基金份额序列与资金流向"""
+        dates, navs, vols = column_store.view().fund_series("C1", "000001")
+        self.assertEqual(navs, [1.0, 1.5, None])
+        self.assertEqual(vols, [100.0, 120.0, 0.0])
+        self.assertEqual(fund_flows(navs, vols), [100.0, 30.0, -180.0])
+
+    def test_view_follows_appends(self):
+        """测试新增数据后视图重新映射，同日最新快照优先"""
+        before = column_store.view()
+        self.add_snapshot("C1", "20240103", [("000002", 2.5, 8)])
+        view = column_store.view()
+        self.assertIsNot(view, before)
+        self.assertEqual(view.daily_value("C1")[1][-1], 20.0)
+
+    def test_batch_import_appends(self):
+        """测试批量导入同样写入列存储"""
+        payload = make_payload([("000003", 3.0, 1)], navdate="20240105")
+        import_records([("dump:1", "C3", "20240105", payload)])
+        self.assertEqual(column_store.view().daily_value("C3"), (["20240105"], [3.0]))
+
+    def test_interrupted_append_is_cut_off(self):
+        """测试中断的追加写入被截断"""
+        with open(os.path.join(self.directory, "nav.f8"), "ab") as f:
+            f.write(b"\x00" * 12)
+        self.add_snapshot("C2", "20240102", [("000001", 1.0, 9)])
+        view = column_store.view()
+        self.assertEqual(view.daily_value("C2")[1], [7.0, 9.0])
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, "nav.f8")), 7 * 8)
+
+    def test_rebuild(self):
+        """测试由数据库重建列存储"""
+        expected = column_store.view().daily_value("C1")
+        os.remove(os.path.join(self.directory, "runs.bin"))
+        self.assertEqual(rebuild_columns(self.directory, batch_size=2), 4)
+        self.assertEqual(ColumnView(self.directory).daily_value("C1"), expected)
+        self.assertEqual(column_store.view().daily_value("C1"), expected)
+
+    def test_rebuild_keeps_snapshots_ingested_meanwhile(self):
+        """测试重建最后一批读取后入库的快照不会在替换时丢失"""
+        rename = os.rename
+        ingested = []
+
+        def ingest_then_rename(src, dst):
+            if not ingested:
+                ingested.append(self.add_snapshot("C2", "20240104", [("000003", 3.0, 2)]))
+            rename(src, dst)
+
+        with mock.patch("app.columnar.os.rename", side_effect=ingest_then_rename):
+            self.assertEqual(rebuild_columns(self.directory, batch_size=2), 5)
+        self.assertEqual(column_store.view().daily_value("C2"), (["20240101", "20240104"], [7.0, 6.0]))
+
+    def test_endpoints(self):
+        """测试分析接口"""
+        data = self.client.get('/api/funds/analytics/value?custno=C1').get_json()
+        self.assertEqual(data["value"], [110.0, 180.0, 10.0])
+        data = self.client.get('/api/funds/analytics/flows?custno=C1&fundcode=000002').get_json()
+        self.assertEqual(data["fundvol"], [5.0, 0.0, 4.0])
+        self.assertEqual(data["flow"], [10.0, -10.0, 10.0])
+        self.assertEqual(self.client.get('/api/funds/analytics/flows?custno=C1').status_code, 400)
+        column_store.configure(None)
+        self.assertEqual(self.client.get('/api/funds/analytics/value?custno=C1').status_code, 503)
+
+
+    def test_existing_database_needs_rebuild(self):
+        """测试已有数据的库上新建的列存储在重建前不追加、接口报未构建"""
+        directory = os.path.join(self.tmp.name, "other")
+        self.init_store(directory)
+        self.assertFalse(column_store.built)
+        response = self.client.get('/api/funds/analytics/value?custno=C1')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("not built", response.get_json()["error"])
+        self.add_snapshot("C1", "20240104", [("000001", 1.0, 1)])
+        self.assertFalse(os.path.exists(os.path.join(directory, "runs.bin")))
+
+        self.assertEqual(rebuild_columns(directory), 5)
+        self.assertTrue(column_store.built)
+        data = self.client.get('/api/funds/analytics/value?custno=C1').get_json()
+        self.assertEqual(data["value"], [110.0, 180.0, 10.0, 1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import zlib
+
+from sqlalchemy import text
+
+from app import db
+from app.compression import MAX_ZDICT_SIZE, PayloadCodec, codec, is_compressed, recompress_payloads, train_dictionary
+from app.models import JsonString
+from tests.base import AppTestCase, make_payload
+
+
+def payloads(count):
+    return [make_payload([(f"{i * 7 + k:06d}", 1.0 + k, 100 * k) for k in range(20)], navdate=f"202401{i % 28 + 1:02d}") for i in range(count)]
+
+
+class PayloadCodecTestCase(unittest.TestCase):
+    """载荷压缩编解码测试用例"""
+
+    def test_round_trip(self):
+        """测试压缩后可以还原，且确实变小"""
+        plain = PayloadCodec()
+        payload = payloads(1)[0] + "天弘"
+        data = plain.compress(payload)
+        self.assertTrue(is_compressed(data))
+        self.assertLess(len(data), len(payload))
+        self.assertEqual(plain.decompress(data), payload)
+
+    def test_dictionary_round_trip(self):
+        """测试使用预置字典压缩，并按字典 id 解压"""
+        samples = payloads(20)
+        zdict = train_dictionary(samples[:10])
+        self.assertLessEqual(len(zdict), MAX_ZDICT_SIZE)
+        trained = PayloadCodec()
+        trained.configure([zdict])
+        data = trained.compress(samples[15])
+        self.assertEqual(data[2:6], zlib.adler32(zdict).to_bytes(4, "big"))
+        self.assertLess(len(data), len(PayloadCodec().compress(samples[15])))
+        self.assertEqual(trained.decompress(data), samples[15])
+
+        with self.assertRaises(ValueError):
+            PayloadCodec().decompress(data)
+
+    def test_plain_text_passes_through(self):
+        """测试压缩前写入的明文仍可读取"""
+        self.assertFalse(is_compressed(b'[[{"fundcode": "000001"}]]'))
+        self.assertEqual(PayloadCodec().decompress(b'[[{"a": 1}]]'), '[[{"a": 1}]]')
+
+
+class CompressedColumnTestCase(AppTestCase):
+    """压缩列存取测试用例"""
+
+    def tearDown(self):
+        codec.configure([])
+        super().tearDown()
+
+    def raw(self, snapshot_id):
+        return db.session.execute(text('SELECT "jsonString" FROM jsonstring WHERE id = :id'), {"id": snapshot_id}).scalar()
+
+    def test_payload_is_stored_compressed(self):
+        """测试入库的载荷以压缩形式存储，读取时透明解压"""
+        snapshot = self.add_snapshot("C1", "20240101", [("000001", 1.0, 100)] * 50)
+        payload = make_payload([("000001", 1.0, 100)] * 50, navdate="20240101")
+        self.assertTrue(is_compressed(self.raw(snapshot.id)))
+        self.assertLess(len(self.raw(snapshot.id)), len(payload))
+        db.session.expire_all()
+        self.assertEqual(db.session.get(JsonString, snapshot.id).jsonString, payload)
+
+    def test_legacy_text_row(self):
+        """测试未迁移的明文行可以读取"""
+        db.session.execute(text('INSERT INTO jsonstring (id, date, "jsonString", custno) VALUES (99, \'2024-01-01\', \'[[]]\', \'C1\')'))
+        self.assertEqual(db.session.get(JsonString, 99).jsonString, "[[]]")
+
+    def test_recompress_with_dictionary(self):
+        """测试训练字典后重写已有载荷"""
+        snapshot = self.add_snapshot("C1", "20240101", [("000001", 1.0, 100)])
+        zdict = train_dictionary(payloads(10))
+        codec.configure([zdict])
+        self.assertEqual(recompress_payloads(batch_size=1), 1)
+        self.assertEqual(self.raw(snapshot.id)[2:6], zlib.adler32(zdict).to_bytes(4, "big"))
+        db.session.expire_all()
+        self.assertEqual(db.session.get(JsonString, snapshot.id).jsonString, make_payload([("000001", 1.0, 100)], navdate="20240101"))
+
+
+if __name__ == '__main__':
+    unittest.main()
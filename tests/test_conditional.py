@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import event
+
+from app import db
+from app.columnar import column_store
+from app.compression import codec
+from app.models import FundHolding
+from tests.base import AppTestCase
+
+
+class ConditionalRequestTestCase(AppTestCase):
+    """ETag / Last-Modified 条件请求测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.add_snapshot("C1", "20240101", [("000001", 1.0, 100), ("000002", 2.0, 5)])
+        self.add_snapshot("C1", "20240102", [("000001", 1.0, 120), ("000002", 2.0, 5)])
+
+    def test_etag_and_cache_control(self):
+        """测试响应带有 ETag、Last-Modified 与 Cache-Control"""
+        for url in (
+            "/api/funds/nav-changes?custno=C1",
+            "/api/funds/volume-changes",
+            "/api/funds/today-changes?custno=C1",
+            "/api/funds/by-date?date=20240102",
+            "/api/funds/compare?datef=20240101&datet=20240102",
+            "/api/funds/history?custno=C1&fundcode=000001",
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertRegex(response.headers["ETag"], r'^"[0-9a-f]{32}"$')
+            self.assertIsNotNone(response.last_modified, url)
+            self.assertEqual(response.headers["Cache-Control"], "private, no-cache")
+            self.assertIn("Cookie", response.vary)
+
+    def test_not_modified_without_reading_holdings(self):
+        """测试 ETag 匹配时返回 304 且不读取持仓与负载"""
+        url = "/api/funds/nav-changes?custno=C1"
+        etag = self.client.get(url).headers["ETag"]
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        db.session.expire_all()
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            with mock.patch.object(codec, "decompress", wraps=codec.decompress) as decompress:
+                response = self.client.get(url, headers={"If-None-Match": etag})
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertFalse(decompress.called)
+        self.assertFalse(any(FundHolding.__tablename__ in s or "snapshot_deltas" in s for s in statements))
+
+        # 代理改写成弱 ETag 后仍可匹配
+        response = self.client.get(url, headers={"If-None-Match": "W/" + etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_snapshots_and_params(self):
+        """测试新快照与不同参数产生不同 ETag"""
+        url = "/api/funds/nav-changes?custno=C1"
+        etag = self.client.get(url).headers["ETag"]
+        self.assertEqual(self.client.get(url).headers["ETag"], etag)
+        self.assertNotEqual(self.client.get("/api/funds/volume-changes?custno=C1").headers["ETag"], etag)
+        self.assertNotEqual(self.client.get(url + "&x=1").headers["ETag"], etag)
+
+        self.add_snapshot("C1", "20240103", [("000001", 1.0, 150), ("000002", 2.0, 5)])
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["000001"], 30.0)
+
+        history = "/api/funds/history?custno=C1&fundcode=000001"
+        etag = self.client.get(history).headers["ETag"]
+        self.add_snapshot("C1", "20231231", [("000001", 1.0, 90)])
+        self.assertEqual(self.client.get(history, headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_if_modified_since(self):
+        """测试 If-Modified-Since 与 If-None-Match 的优先级"""
+        url = "/api/funds/by-date?date=20240102"
+        response = self.client.get(url)
+        last_modified = response.headers["Last-Modified"]
+        self.assertEqual(self.client.get(url, headers={"If-Modified-Since": last_modified}).status_code, 304)
+        earlier = (response.last_modified - timedelta(seconds=1)).strftime("%a, %d %b %Y %H:%M:%S GMT")
+        self.assertEqual(self.client.get(url, headers={"If-Modified-Since": earlier}).status_code, 200)
+        # If-None-Match 存在时忽略 If-Modified-Since
+        response = self.client.get(url, headers={"If-Modified-Since": last_modified, "If-None-Match": '"other"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_rows_without_stored_at(self):
+        """测试旧数据没有 stored_at 时只用 ETag 校验"""
+        from app.models import JsonString
+        JsonString.query.update({JsonString.stored_at: None})
+        db.session.commit()
+        response = self.client.get("/api/funds/compare?datef=20240101&datet=20240102")
+        self.assertIsNone(response.last_modified)
+        since = datetime(2100, 1, 1).strftime("%a, %d %b %Y %H:%M:%S GMT")
+        response = self.client.get("/api/funds/compare?datef=20240101&datet=20240102", headers={"If-Modified-Since": since})
+        self.assertEqual(response.status_code, 200)
+
+    def test_errors_carry_no_validators(self):
+        """测试错误响应不带 ETag"""
+        response = self.client.get("/api/funds/nav-changes?custno=nobody")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response.headers)
+
+    def test_listing_is_revalidated(self):
+        """测试流式列表不带 ETag 且每次重新验证"""
+        response = self.client.get("/api/funds/snapshots")
+        self.assertNotIn("ETag", response.headers)
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+
+class ColumnStoreConditionalTestCase(AppTestCase):
+    """列存分析接口条件请求测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        column_store.configure(os.path.join(self.directory, "columns"))
+        # 空库上新建的列存储
+        column_store.mark_built()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(column_store.configure, None)
+
+    def test_etag_follows_store(self):
+        """测试列存追加后 ETag 改变"""
+        self.add_snapshot("C1", "20240101", [("000001", 1.0, 100)])
+        url = "/api/funds/analytics/value?custno=C1"
+        response = self.client.get(url)
+        self.assertIsNotNone(response.last_modified)
+        etag = response.headers["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        self.add_snapshot("C1", "20240102", [("000001", 1.0, 120)])
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()["dates"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import text
+
+from app import create_app, db
+from config import ProductionConfig, app_config
+
+
+class ProductionConfigTestCase(unittest.TestCase):
+    """生产环境配置测试用例"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        uri = f"sqlite:///{os.path.join(self.tmp.name, 'fundweb.db')}"
+        patcher = mock.patch.multiple(ProductionConfig, SQLALCHEMY_DATABASE_URI=uri, JOBS=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = create_app('production')
+        self.addCleanup(self.app.apscheduler.shutdown, wait=False)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_profile_selected_by_name(self):
+        """测试按名称选择生产配置，关闭调试与SQL日志"""
+        self.assertIs(app_config['production'], ProductionConfig)
+        self.assertFalse(self.app.config['DEBUG'])
+        self.assertFalse(self.app.config['SQLALCHEMY_ECHO'])
+
+    def test_sqlite_pragmas(self):
+        """测试每个SQLite连接都设置了PRAGMA"""
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                pragma = lambda name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                self.assertEqual(pragma("journal_mode"), "wal")
+                self.assertEqual(pragma("synchronous"), 1)
+                self.assertEqual(pragma("busy_timeout"), 5000)
+                self.assertEqual(pragma("cache_size"), -64 * 1024)
+
+
+class EngineOptionsTestCase(unittest.TestCase):
+    """数据库连接池配置测试用例"""
+
+    def test_mysql_pool(self):
+        """测试MySQL启用连接池大小与pre-ping，SQLite不设置"""
+        from config import mysql_engine_options
+        with mock.patch.dict(os.environ, {"DATABASE_URL": "mysql+pymysql://u:p@db/insta_db", "DB_POOL_SIZE": "5"}):
+            options = mysql_engine_options()
+        self.assertEqual(options["pool_size"], 5)
+        self.assertTrue(options["pool_pre_ping"])
+        with mock.patch.dict(os.environ, {"DATABASE_URL": "sqlite:///fundweb.db"}):
+            self.assertEqual(mysql_engine_options(), {})
+
+
+class DotenvTestCase(unittest.TestCase):
+    """.env加载顺序测试用例"""
+
+    def test_dotenv_loaded_before_config(self):
+        """测试导入app时先加载.env，Config能读到其中的设置"""
+        code = (
+            "import os, dotenv\n"
+            "def fake_load_dotenv(*args, **kwargs):\n"
+            "    os.environ['FETCH_TIMEOUT'] = '3'\n"
+            "    os.environ['RETENTION_DAYS'] = '30'\n"
+            "    return True\n"
+            "dotenv.load_dotenv = fake_load_dotenv\n"
+            "import app, config\n"
+            "print(config.Config.FETCH_TIMEOUT, config.Config.RETENTION_DAYS)\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = {k: v for k, v in os.environ.items() if k not in ("FETCH_TIMEOUT", "RETENTION_DAYS")}
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.split(), ["3.0", "30"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from datetime import date
+
+from sqlalchemy import text
+
+from app import db
+from app.dates import parse_day
+from app.ingest import PayloadError, store_snapshot
+from app.snapshots import latest_on_or_before, snapshots_between
+from tests.base import AppTestCase, make_payload
+
+
+class ParseDayTestCase(unittest.TestCase):
+    """日期解析测试用例"""
+
+    def test_formats(self):
+        """测试支持 YYYYMMDD 与 YYYY-MM-DD"""
+        self.assertEqual(parse_day("20240105"), date(2024, 1, 5))
+        self.assertEqual(parse_day("2024-01-05"), date(2024, 1, 5))
+        self.assertEqual(parse_day(date(2024, 1, 5)), date(2024, 1, 5))
+        with self.assertRaises(ValueError):
+            parse_day("2024015")
+
+
+class SnapshotDateTestCase(AppTestCase):
+    """快照日期列与范围查询测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        # Thursday, Friday, then Monday
+        self.thu = self.add_snapshot("C1", "20240104", [("000001", 1.0, 100)])
+        self.fri = self.add_snapshot("C1", "20240105", [("000001", 1.0, 120)])
+        self.mon = self.add_snapshot("C1", "20240108", [("000001", 1.0, 150)])
+        self.other = self.add_snapshot("C2", "20240106", [("000001", 1.0, 1)])
+
+    def test_stored_as_date(self):
+        """测试以 DATE 存储，读取时仍是 YYYYMMDD"""
+        raw = db.session.execute(text("SELECT date, navdate FROM jsonstring WHERE id = :id"), {"id": self.fri.id}).one()
+        self.assertEqual(tuple(raw), ("2024-01-05", "2024-01-05"))
+        db.session.expire_all()
+        self.assertEqual(self.fri.date, "20240105")
+
+    def test_latest_on_or_before(self):
+        """测试取某日及之前最新的快照"""
+        self.assertEqual(latest_on_or_before("20240107", "C1").id, self.fri.id)
+        self.assertEqual(latest_on_or_before(date(2024, 1, 8), "C1").id, self.mon.id)
+        self.assertEqual(latest_on_or_before("20240107").id, self.other.id)
+        self.assertIsNone(latest_on_or_before("20240103", "C1"))
+
+    def test_snapshots_between(self):
+        """测试取日期区间内的全部快照"""
+        self.assertEqual([s.id for s in snapshots_between("20240105", "20240108", "C1")], [self.fri.id, self.mon.id])
+        self.assertEqual(len(snapshots_between("20240101", "20240131")), 4)
+
+    def test_by_date_resolves_weekend(self):
+        """测试按日期查询周末时返回之前最近一天的数据"""
+        data = self.client.get('/api/funds/by-date?date=20240107&custno=C1').get_json()
+        self.assertEqual(data["date"], "20240105")
+        self.assertEqual(data["000001"], 120.0)
+        self.assertEqual(self.client.get('/api/funds/by-date?date=2024-1').status_code, 400)
+        self.assertEqual(self.client.get('/api/funds/by-date?date=20231231').status_code, 404)
+
+    def test_compare_range(self):
+        """测试区间比较两端按日期范围解析"""
+        data = self.client.get('/api/funds/compare?datef=20240104&datet=20240107&custno=C1').get_json()
+        self.assertEqual(data["date"], "20240105")
+        self.assertEqual(data["amountInfo"], {"000001": 20.0})
+
+    def test_by_date_without_custno_is_deterministic(self):
+        """测试不指定 custno 时同一天有多个客户的数据，取编号最小的客户"""
+        self.add_snapshot("C0", "20240108", [("000001", 1.0, 5)])
+        self.add_snapshot("C9", "20240108", [("000001", 1.0, 9)])
+        self.assertEqual(latest_on_or_before("20240108").custno, "C0")
+        data = self.client.get('/api/funds/by-date?date=20240108').get_json()
+        self.assertEqual(data["000001"], 5.0)
+
+    def test_compare_without_custno_stays_on_one_custno(self):
+        """测试不指定 custno 时区间两端取同一客户的快照"""
+        # 截止日最新的是 C2，它在起始日之前没有数据
+        response = self.client.get('/api/funds/compare?datef=20240104&datet=20240107')
+        self.assertEqual(response.status_code, 404)
+        data = self.client.get('/api/funds/compare?datef=20240104&datet=20240105').get_json()
+        self.assertEqual(data["amountInfo"], {"000001": 20.0})
+
+    def test_bad_navdate_rejected(self):
+        """测试 navdate 不是日期的载荷被拒绝"""
+        with self.assertRaises(PayloadError):
+            store_snapshot("C1", "20240109", make_payload([("000001", 1.0, 1)], navdate="soon"))
+
+
+if __name__ == '__main__':
+    unittest.main()
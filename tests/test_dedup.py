@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.ingest import payload_hash, store_snapshot
+from app.models import FundHolding, JsonString, SnapshotDelta, UnchangedSnapshot
+from app.snapshots import latest_on_or_before, latest_snapshot
+from tests.base import AppTestCase, make_payload
+
+
+class DedupTestCase(AppTestCase):
+    """快照内容哈希去重测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.first = self.add_snapshot("C1", "20240104", [("000001", 1.0, 100)])
+        self.friday = self.add_snapshot("C1", "20240105", [("000001", 1.0, 120)])
+        # Weekend fetches return Friday's payload unchanged
+        self.payload = make_payload([("000001", 1.0, 120)], navdate="20240105")
+
+    def test_unchanged_payload_only_records_marker(self):
+        """测试内容不变的抓取只写入标记行，不再复制原文和持仓"""
+        self.assertEqual(self.friday.content_hash, payload_hash(self.payload))
+        saturday = store_snapshot("C1", "20240106", self.payload)
+        sunday = store_snapshot("C1", "20240107", self.payload)
+
+        self.assertEqual(saturday.id, self.friday.id)
+        self.assertEqual(sunday.id, self.friday.id)
+        self.assertEqual(JsonString.query.count(), 2)
+        self.assertEqual(FundHolding.query.count(), 2)
+        self.assertEqual(SnapshotDelta.query.count(), 1)
+        markers = UnchangedSnapshot.query.order_by(UnchangedSnapshot.id).all()
+        self.assertEqual([(m.date, m.snapshot_id) for m in markers], [("20240106", self.friday.id), ("20240107", self.friday.id)])
+
+    def test_changes_do_not_compare_against_duplicate(self):
+        """测试周末之后仍与上一次不同的数据比较"""
+        store_snapshot("C1", "20240106", self.payload)
+        self.assertEqual(latest_snapshot("C1").id, self.friday.id)
+        data = self.client.get('/api/funds/volume-changes?custno=C1').get_json()
+        self.assertEqual(data["000001"], 20.0)
+        data = self.client.get('/api/funds/volume-changes').get_json()
+        self.assertEqual(data["000001"], 20.0)
+
+    def test_marker_date_resolves_to_stored_snapshot(self):
+        """测试按日期查询可以找到标记行指向的快照"""
+        store_snapshot("C1", "20240106", self.payload)
+        self.assertEqual(latest_on_or_before("20240106", "C1").id, self.friday.id)
+
+    def test_marker_back_to_older_snapshot(self):
+        """测试内容变回更早快照时，按日期查询返回标记指向的快照"""
+        # 周四 A、周五 B、周六又变回 A
+        store_snapshot("C1", "20240106", make_payload([("000001", 1.0, 100)], navdate="20240104"))
+        self.assertEqual(latest_on_or_before("20240106", "C1").id, self.first.id)
+        self.assertEqual(latest_on_or_before("20240105", "C1").id, self.friday.id)
+        data = self.client.get('/api/funds/by-date?date=20240106&custno=C1').get_json()
+        self.assertEqual(data["000001"], 100.0)
+
+    def test_same_payload_of_other_custno_is_stored(self):
+        """测试不同 custno 的相同内容分别存储"""
+        other = store_snapshot("C2", "20240106", self.payload)
+        self.assertNotEqual(other.id, self.friday.id)
+        self.assertEqual(UnchangedSnapshot.query.count(), 0)
+
+    def test_unique_hash_index(self):
+        """测试 (custno, content_hash) 唯一索引"""
+        db.session.add(JsonString(date="20240108", navdate="20240105", jsonString=self.payload, custno="C1", content_hash=payload_hash(self.payload)))
+        with self.assertRaises(IntegrityError):
+            db.session.flush()
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest import mock
+
+from sqlalchemy import event
+
+import app as app_module
+from app import db
+from app.compression import codec
+from app.fetcher import FetchSummary
+from app.models import JsonString
+from tests.base import AppTestCase
+
+
+class DeferredLoadingTestCase(AppTestCase):
+    """jsonString 延迟加载与刷新接口查询次数测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(app_module, 'fetch_and_store_fund_data_for_custnos', return_value=FetchSummary())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_custnos(self, count, start=0):
+        holdings = [(f"{f:06d}", 1.0, 100) for f in range(200)]
+        for c in range(start, start + count):
+            for day in ("20240101", "20240102"):
+                self.add_snapshot(f"C{c:03d}", day, holdings)
+
+    def measure(self, method, url):
+        """返回 (响应, SQL 语句数, 解压的负载字节数)"""
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        db.session.expire_all()
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            with mock.patch.object(codec, "decompress", wraps=codec.decompress) as decompress:
+                response = getattr(self.client, method)(url)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+        payload_bytes = sum(len(call.args[0]) for call in decompress.call_args_list)
+        return response, len(statements), payload_bytes
+
+    def test_refresh_is_one_query_whatever_the_custno_count(self):
+        """测试刷新接口的查询次数不随客户数增长且不读取负载"""
+        self.add_custnos(3)
+        response, few, payload_bytes = self.measure("post", "/api/funds/refresh")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(payload_bytes, 0)
+        self.assertEqual(len(response.get_json()["latest_dates"]), 3)
+
+        self.add_custnos(27, start=3)
+        response, many, payload_bytes = self.measure("post", "/api/funds/refresh")
+        self.assertEqual(many, few)
+        self.assertEqual(few, 1)
+        self.assertEqual(payload_bytes, 0)
+        latest_dates = response.get_json()["latest_dates"]
+        self.assertEqual(len(latest_dates), 30)
+        self.assertEqual(set(latest_dates.values()), {"20240102"})
+
+    def test_endpoints_do_not_load_payloads(self):
+        """测试接口加载快照时不读取负载"""
+        self.add_custnos(2)
+        for url in (
+            "/api/funds/nav-changes?custno=C000",
+            "/api/funds/volume-changes",
+            "/api/funds/today-changes?custno=C001",
+            "/api/funds/by-date?date=20240102&custno=C000",
+            "/api/funds/compare?datef=20240101&datet=20240102",
+        ):
+            response, _, payload_bytes = self.measure("get", url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(payload_bytes, 0, url)
+
+    def test_payload_still_loads_on_access(self):
+        """测试访问属性时仍可读取负载"""
+        self.add_custnos(1)
+        db.session.expire_all()
+        snapshot = JsonString.query.first()
+        self.assertNotIn("jsonString", snapshot.__dict__)
+        self.assertTrue(snapshot.jsonString.startswith("[["))
+        snapshot = JsonString.query.options(db.undefer(JsonString.jsonString)).first()
+        self.assertIn("jsonString", snapshot.__dict__)
+
+
+if __name__ == '__main__':
+    unittest.main()
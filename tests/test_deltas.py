@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from app import db
+from app.deltas import load_deltas
+from app.models import FundHolding, SnapshotDelta
+from tests.base import AppTestCase
+
+
+class SnapshotDeltaTestCase(AppTestCase):
+    """预计算变化表测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.first = self.add_snapshot("C1", "20240101", [("000001", 1.0, 100), ("000002", 2.0, 50)])
+        self.second = self.add_snapshot("C1", "20240102", [("000001", 1.5, 120), ("000002", 2.5, 50), ("000003", 3.0, 10)])
+
+    def test_ingest_records_deltas(self):
+        """测试入库时写入相对上一日期快照的变化"""
+        self.assertEqual(SnapshotDelta.query.filter_by(snapshot_id=self.first.id).count(), 0)
+        rows = SnapshotDelta.query.filter_by(snapshot_id=self.second.id).order_by(SnapshotDelta.id).all()
+        self.assertEqual([(r.fundcode, r.share_delta, r.amount_delta) for r in rows],
+                         [("000001", 20.0, 30.0), ("000002", 0.0, 0.0), ("000003", 10.0, 30.0)])
+        self.assertEqual({r.previous_id for r in rows}, {self.first.id})
+
+    def test_same_day_snapshot_compares_with_previous_date(self):
+        """测试同一天的第二次抓取仍与上一日期比较"""
+        third = self.add_snapshot("C1", "20240102", [("000001", 1.5, 130)])
+        self.assertEqual(load_deltas(third.id, self.first.id), [("000001", 30.0, 45.0)])
+
+    def test_endpoints_read_stored_deltas(self):
+        """测试接口直接读取预计算结果，不再聚合持仓"""
+        FundHolding.query.delete()
+        db.session.commit()
+
+        data = self.client.get('/api/funds/volume-changes?custno=C1').get_json()
+        self.assertEqual(data["000001"], 20.0)
+        self.assertEqual(data["000003"], 10.0)
+        self.assertNotIn("000002", data)
+
+        data = self.client.get('/api/funds/nav-changes?custno=C1').get_json()
+        self.assertEqual(data["000001"], 30.0)
+
+        text = self.client.get('/api/funds/today-changes?custno=C1').get_data(as_text=True)
+        self.assertIn("000003: Share change 10.0, Amount change 30.0", text)
+
+    def test_recompute_command(self):
+        """测试重新计算命令"""
+        SnapshotDelta.query.delete()
+        FundHolding.query.filter_by(snapshot_id=self.second.id, fundcode="000001").update({FundHolding.fundvol: 150})
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=["funds", "recompute-deltas", "--custno", "C1"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Recomputed deltas for 1 snapshots", result.output)
+        self.assertEqual(load_deltas(self.second.id, self.first.id)[0], ("000001", 50.0, 75.0))
+        self.assertEqual(SnapshotDelta.query.count(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+
+from app import diff_engine
+
+
+def legacy_diff(items, last_items):
+    """旧的逐基金循环实现，用作对照"""
+    navInfo = {}
+    for item in items:
+        navInfo[item["fundcode"]] = float(item["nav"])
+    volInfo = {}
+    for item in items:
+        if item["fundcode"] in volInfo:
+            volInfo[item["fundcode"]] = volInfo[item["fundcode"]] + float(item["fundvol"])
+        else:
+            volInfo[item["fundcode"]] = float(item["fundvol"])
+    lastVolInfo = {}
+    for item in last_items:
+        if item["fundcode"] in lastVolInfo:
+            lastVolInfo[item["fundcode"]] = lastVolInfo[item["fundcode"]] + float(item["fundvol"])
+        else:
+            lastVolInfo[item["fundcode"]] = float(item["fundvol"])
+    return [(k, v - lastVolInfo.get(k, 0), (v - lastVolInfo.get(k, 0)) * navInfo[k]) for k, v in volInfo.items()]
+
+
+def frame_from_items(items):
+    """由解析后的上游持仓列表构造快照"""
+    return diff_engine.frame_from_rows(
+        [item["fundcode"] for item in items],
+        [float(item["nav"]) for item in items],
+        [float(item["fundvol"]) for item in items],
+    )
+
+
+def random_items(rng, count, codes):
+    return [{"fundcode": f"{rng.randrange(codes):06d}", "nav": f"{rng.uniform(0.5, 5):.4f}", "fundvol": f"{rng.uniform(0, 1e5):.2f}"} for _ in range(count)]
+
+
+class DiffEngineTestCase(unittest.TestCase):
+    """向量化差异引擎测试用例"""
+
+    def test_matches_legacy_loops(self):
+        """测试与旧的循环实现结果一致"""
+        rng = random.Random(7)
+        for count in (1, 10, 1000):
+            items = random_items(rng, count, max(1, count // 2))
+            last_items = random_items(rng, count, max(1, count // 2))
+            result = diff_engine.diff(frame_from_items(items), frame_from_items(last_items)).rows()
+            expected = legacy_diff(items, last_items)
+            self.assertEqual([r[0] for r in result], [e[0] for e in expected])
+            for (_, share, amount), (_, e_share, e_amount) in zip(result, expected):
+                self.assertAlmostEqual(share, e_share, places=6)
+                self.assertAlmostEqual(amount, e_amount, places=4)
+
+    def test_frame_from_rows(self):
+        """测试重复基金份额相加、净值取最后一条、保持首次出现顺序"""
+        frame = diff_engine.frame_from_rows(["B", "A", "B"], [1.0, 2.0, 1.5], [10, 5, 20])
+        self.assertEqual(frame.fundcodes.tolist(), ["B", "A"])
+        self.assertEqual(frame.vol_info(), {"B": 30.0, "A": 5.0})
+        self.assertEqual(frame.nav_info(), {"B": 1.5, "A": 2.0})
+
+    def test_new_removed_and_unchanged_funds(self):
+        """测试新增、消失和不变的基金"""
+        current = diff_engine.frame_from_rows(["A", "B", "C"], [1.0, 2.0, 3.0], [10.0, 5.0, 7.0])
+        previous = diff_engine.frame_from_rows(["B", "D", "A"], [1.0, 1.0, 1.0], [5.0, 9.0, 4.0])
+        result = diff_engine.diff(current, previous)
+        self.assertEqual(result.rows(), [("A", 6.0, 6.0), ("B", 0.0, 0.0), ("C", 7.0, 21.0)])
+        self.assertEqual(result.changed().rows(), [("A", 6.0, 6.0), ("C", 7.0, 21.0)])
+
+    def test_empty_frames(self):
+        """测试空快照"""
+        current = diff_engine.frame_from_rows(["A"], [2.0], [3.0])
+        self.assertEqual(diff_engine.diff(current, diff_engine.EMPTY).rows(), [("A", 3.0, 6.0)])
+        self.assertEqual(diff_engine.diff(diff_engine.EMPTY, current).rows(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import gzip
+import json
+import unittest
+import zlib
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app import encoding
+from app.encoding import OrjsonProvider, json_provider
+from tests.base import AppTestCase
+
+
+class SerializerTestCase(unittest.TestCase):
+    """JSON 序列化器测试用例"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    @unittest.skipIf(encoding.orjson is None, "orjson is not installed")
+    def test_orjson_matches_stdlib(self):
+        """测试 orjson 与标准库输出解析后一致且键同样排序"""
+        data = {"b": [1.5, 0.1 + 0.2, -3e-7, None], "a": {"z": "基金", "y": 2}, "000001": 12.25}
+        fast = OrjsonProvider(self.app)
+        slow = DefaultJSONProvider(self.app)
+        self.assertEqual(json.loads(fast.dumps(data)), json.loads(slow.dumps(data)))
+        self.assertEqual(list(json.loads(fast.dumps(data))), ["000001", "a", "b"])
+        with self.app.app_context():
+            response = fast.response(data)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(json.loads(response.get_data()), json.loads(slow.dumps(data)))
+
+    def test_provider_choice(self):
+        """测试 JSON_SERIALIZER 选择序列化器"""
+        self.app.config["JSON_SERIALIZER"] = "stdlib"
+        self.assertIs(type(json_provider(self.app)), DefaultJSONProvider)
+        self.app.config["JSON_SERIALIZER"] = "auto"
+        expected = OrjsonProvider if encoding.orjson is not None else DefaultJSONProvider
+        self.assertIs(type(json_provider(self.app)), expected)
+        self.app.config["JSON_SERIALIZER"] = "yaml"
+        with self.assertRaises(ValueError):
+            json_provider(self.app)
+
+    def test_fallback_without_orjson(self):
+        """测试未安装 orjson 时回退到标准库"""
+        original = encoding.orjson
+        encoding.orjson = None
+        try:
+            self.assertIs(type(json_provider(self.app)), DefaultJSONProvider)
+            self.app.config["JSON_SERIALIZER"] = "orjson"
+            with self.assertRaises(RuntimeError):
+                json_provider(self.app)
+        finally:
+            encoding.orjson = original
+
+
+class CompressionTestCase(AppTestCase):
+    """响应压缩协商测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        holdings = [(f"{f:06d}", 1.0, 100) for f in range(200)]
+        self.add_snapshot("C1", "20240101", holdings)
+        self.add_snapshot("C1", "20240102", [(code, nav, vol + 1) for code, nav, vol in holdings])
+        self.url = "/api/funds/volume-changes?custno=C1"
+
+    def test_gzip_and_deflate(self):
+        """测试按 Accept-Encoding 选择 gzip 或 deflate"""
+        plain = self.client.get(self.url)
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertIn("Accept-Encoding", plain.vary)
+
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertLess(len(response.data), len(plain.data))
+        self.assertEqual(response.headers["ETag"], plain.headers["ETag"][:-1] + '-gzip"')
+
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip;q=0.5, deflate"})
+        self.assertEqual(response.headers["Content-Encoding"], "deflate")
+        self.assertEqual(zlib.decompress(response.data), plain.data)
+
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip;q=0, br"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_threshold_and_errors(self):
+        """测试小响应与错误响应不压缩"""
+        headers = {"Accept-Encoding": "gzip"}
+        response = self.client.get("/api/funds/history?custno=C1&fundcode=000001", headers=headers)
+        self.assertLess(len(response.data), 1024)
+        self.assertNotIn("Content-Encoding", response.headers)
+        response = self.client.get("/api/funds/nav-changes?custno=nobody", headers=headers)
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.app.config["COMPRESS_LEVEL"] = 0
+        self.assertNotIn("Content-Encoding", self.client.get(self.url, headers=headers).headers)
+
+    def test_conditional_with_compressed_etag(self):
+        """测试压缩表示的 ETag 可用于条件请求"""
+        headers = {"Accept-Encoding": "gzip"}
+        etag = self.client.get(self.url, headers=headers).headers["ETag"]
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        # 同一 ETag 未压缩的请求也视为未修改
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+import xml.dom.minidom
+from xml.etree.ElementTree import ParseError
+
+from app.extractor import extract_return_text, iter_return_texts
+
+
+def legacy_extract(text):
+    """旧的minidom解析路径，用作对照"""
+    DOMTree = xml.dom.minidom.parseString(text.encode("raw_unicode_escape").decode("raw_unicode_escape").encode("utf8")).documentElement.getElementsByTagName("return")
+    return DOMTree[0].childNodes[0].data
+
+
+def soap(inner):
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            f'<ns2:getAssetsListNewResponse xmlns:ns2="http://example.com/">{inner}</ns2:getAssetsListNewResponse>'
+            '</soap:Body></soap:Envelope>')
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class ExtractorTestCase(unittest.TestCase):
+    """流式<return>提取测试用例"""
+
+    def assertSameAsLegacy(self, text):
+        expected = legacy_extract(text)
+        data = text.encode("utf8")
+        for size in (1, 7, 4096, len(data)):
+            self.assertEqual(extract_return_text(chunked(data, size)), expected)
+        return expected
+
+    def test_plain_payload(self):
+        """测试普通JSON数据与旧路径一致"""
+        payload = json.dumps([[{"fundcode": "000001", "nav": "1.2345", "fundvol": "1000.0", "navdate": "20240115"}]])
+        self.assertEqual(self.assertSameAsLegacy(soap(f"<return>{payload}</return>")), payload)
+
+    def test_unicode_payload(self):
+        """测试中文字符与旧路径一致"""
+        payload = json.dumps([[{"fundcode": "000001", "fundname": "华夏成长", "navdate": "20240115"}]], ensure_ascii=False)
+        self.assertSameAsLegacy(soap(f"<return>{payload}</return>"))
+
+    def test_unicode_escapes_expanded(self):
+        """测试\\uXXXX转义与旧路径一样被还原"""
+        payload = json.dumps([[{"fundname": "华夏成长"}]])
+        self.assertIn("\\u", payload)
+        self.assertEqual(self.assertSameAsLegacy(soap(f"<return>{payload}</return>")), '[[{"fundname": "华夏成长"}]]')
+
+    def test_large_escaped_payload(self):
+        """测试跨越分块边界的转义与旧路径一致"""
+        payload = json.dumps([[{"fundcode": f"{i:06d}", "fundname": "华夏成长\\路径", "nav": "1.0"} for i in range(5000)]])
+        self.assertGreater(len(payload), 200000)
+        self.assertSameAsLegacy(soap(f"<return>{payload}</return>"))
+
+    def test_entities(self):
+        """测试XML实体与旧路径一致"""
+        self.assertSameAsLegacy(soap("<return>[[{&quot;a&quot;: &quot;x &amp; y&quot;}]]</return>"))
+
+    def test_unprefixed_return(self):
+        """测试无命名空间的<return>"""
+        self.assertSameAsLegacy("<root><return>[1]</return><return>[2]</return></root>")
+
+    def test_iter_yields_every_return(self):
+        """测试单次遍历返回所有<return>文本"""
+        data = b"<root><return>[1]</return><x/><return>[2]</return></root>"
+        self.assertEqual(list(iter_return_texts(chunked(data, 3))), ["[1]", "[2]"])
+
+    def test_missing_and_empty_return(self):
+        """测试没有或空的<return>返回None"""
+        self.assertIsNone(extract_return_text([b"<root><other>1</other></root>"]))
+        self.assertIsNone(extract_return_text([b"<root><return/></root>"]))
+
+    def test_malformed(self):
+        """测试格式错误的XML抛出ParseError"""
+        with self.assertRaises(ParseError):
+            extract_return_text([b"<root><return>[1]</return>"])
+
+    def test_str_chunks(self):
+        """测试str分块输入"""
+        self.assertEqual(extract_return_text(["<root><ret", "urn>[1]</return></root>"]), "[1]")
+
+
+if __name__ == '__main__':
+    unittest.main()
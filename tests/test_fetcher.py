@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from app.fetcher import FundFetcher, FetchError
+
+
+def soap_response(payload):
+    return ('<?xml version="1.0" encoding="UTF-8"?><soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+            f'<soap:Body><ns2:resp xmlns:ns2="http://example.com/"><return>{payload}</return></ns2:resp></soap:Body></soap:Envelope>')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        custno = parse_qs(urlparse(self.path).query)["custno"][0]
+        server = self.server
+        with server.counter_lock:
+            server.calls[custno] = server.calls.get(custno, 0) + 1
+            calls = server.calls[custno]
+        time.sleep(server.delay)
+        status = 200
+        if custno == "flaky" and calls == 1:
+            status = 503
+        elif custno == "broken":
+            status = 500
+        elif custno == "missing":
+            status = 404
+        body = soap_response(json.dumps([[{"fundcode": "000001", "nav": "1.0", "fundvol": "1.0", "navdate": "20240115"}]]))
+        if custno == "noreturn":
+            body = "<root><other>1</other></root>"
+        body = body.encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out close the socket before the stub answers
+        pass
+
+
+class FundFetcherTestCase(unittest.TestCase):
+    """并发抓取引擎测试用例"""
+
+    def setUp(self):
+        self.server = StubServer(("127.0.0.1", 0), StubHandler)
+        self.server.calls = {}
+        self.server.counter_lock = threading.Lock()
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_url = f"http://127.0.0.1:{self.server.server_address[1]}/api"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetch_many_collects_payloads(self):
+        """测试所有custno的返回数据都交给handler"""
+        received = {}
+        with FundFetcher(self.api_url, max_workers=4, retries=0) as fetcher:
+            summary = fetcher.fetch_many(["a", "b", "c"], lambda custno, payload: received.update({custno: payload}))
+        self.assertEqual(sorted(summary.succeeded), ["a", "b", "c"])
+        self.assertEqual(summary.failed, {})
+        self.assertEqual(json.loads(received["a"])[0][0]["navdate"], "20240115")
+
+    def test_retry_with_backoff(self):
+        """测试5xx错误会重试"""
+        with FundFetcher(self.api_url, max_workers=2, retries=2, backoff=0.01) as fetcher:
+            summary = fetcher.fetch_many(["flaky", "broken"])
+        self.assertEqual(summary.succeeded, ["flaky"])
+        self.assertEqual(summary.attempts["flaky"], 2)
+        self.assertIn("broken", summary.failed)
+        self.assertEqual(self.server.calls["broken"], 3)
+
+    def test_client_errors_are_not_retried(self):
+        """测试4xx错误和无<return>的响应不重试，直接记录失败"""
+        with FundFetcher(self.api_url, max_workers=2, retries=3, backoff=0.01) as fetcher:
+            summary = fetcher.fetch_many(["missing", "noreturn"])
+        self.assertEqual(set(summary.failed), {"missing", "noreturn"})
+        self.assertEqual(self.server.calls["missing"], 1)
+        self.assertEqual(self.server.calls["noreturn"], 1)
+
+    def test_handler_errors_mark_failure(self):
+        """测试handler抛出的异常记为该custno失败"""
+        def handler(custno, payload):
+            if custno == "b":
+                raise FetchError("bad data")
+        with FundFetcher(self.api_url, max_workers=2, retries=0) as fetcher:
+            summary = fetcher.fetch_many(["a", "b"], handler)
+        self.assertEqual(summary.succeeded, ["a"])
+        self.assertEqual(summary.failed, {"b": "bad data"})
+
+    def test_timeout(self):
+        """测试请求超时后记录失败"""
+        self.server.delay = 0.5
+        with FundFetcher(self.api_url, max_workers=1, timeout=0.05, retries=0) as fetcher:
+            summary = fetcher.fetch_many(["a"])
+        self.assertIn("a", summary.failed)
+
+    def test_pool_runs_concurrently(self):
+        """测试工作线程池并发请求"""
+        self.server.delay = 0.2
+        custnos = [f"c{i}" for i in range(8)]
+        with FundFetcher(self.api_url, max_workers=8, retries=0) as fetcher:
+            summary = fetcher.fetch_many(custnos)
+        self.assertEqual(len(summary.succeeded), 8)
+        # One worker would need 1.6s
+        self.assertLess(summary.elapsed, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from app import db
+from app.models import JsonString
+from tests.base import AppTestCase
+
+
+class FundHistoryTestCase(AppTestCase):
+    """单只基金历史序列接口测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.add_snapshot("C1", "20240101", [("000001", 1.0, 100), ("000002", 2.0, 5)])
+        self.add_snapshot("C1", "20240102", [("000001", 1.5, 100), ("000001", 1.5, 20)])
+        self.add_snapshot("C1", "20240103", [("000002", 2.0, 5)])
+        self.add_snapshot("C1", "20240104", [("000001", 2.0, 50)])
+        self.add_snapshot("C2", "20240102", [("000001", 9.0, 1)])
+
+    def test_series(self):
+        """测试返回日期、净值、份额与市值数组"""
+        data = self.client.get('/api/funds/history?custno=C1&fundcode=000001').get_json()
+        self.assertEqual(data["dates"], ["20240101", "20240102", "20240104"])
+        self.assertEqual(data["nav"], [1.0, 1.5, 2.0])
+        self.assertEqual(data["fundvol"], [100.0, 120.0, 50.0])
+        self.assertEqual(data["value"], [100.0, 180.0, 100.0])
+        self.assertEqual((data["custno"], data["fundcode"]), ("C1", "000001"))
+
+    def test_range(self):
+        """测试按日期区间过滤"""
+        data = self.client.get('/api/funds/history?custno=C1&fundcode=000001&from=20240102&to=20240103').get_json()
+        self.assertEqual(data["dates"], ["20240102"])
+
+    def test_newest_snapshot_of_a_date_wins(self):
+        """测试同一天多次抓取时取最新一次"""
+        self.add_snapshot("C1", "20240104", [("000001", 2.0, 70)])
+        data = self.client.get('/api/funds/history?custno=C1&fundcode=000001&from=20240104').get_json()
+        self.assertEqual(data["fundvol"], [70.0])
+
+    def test_does_not_parse_payloads(self):
+        """测试序列来自持仓表而不解析jsonString"""
+        JsonString.query.update({JsonString.jsonString: "not json"})
+        db.session.commit()
+        data = self.client.get('/api/funds/history?custno=C1&fundcode=000002').get_json()
+        self.assertEqual(data["fundvol"], [5.0, 5.0])
+
+    def test_bad_parameters(self):
+        """测试参数缺失或日期非法时返回 400"""
+        self.assertEqual(self.client.get('/api/funds/history?custno=C1').status_code, 400)
+        self.assertEqual(self.client.get('/api/funds/history?custno=C1&fundcode=000001&from=2024').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
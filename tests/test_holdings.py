@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from app import db, diff_engine
+from app.ingest import PayloadError, store_snapshot
+from app.models import FundHolding, JsonString
+from app.snapshots import fund_aggregates, fund_history, snapshot_cache
+from tests.base import AppTestCase
+
+
+class FundHoldingsTestCase(AppTestCase):
+    """基金持仓表测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.old = self.add_snapshot("C1", "20240101", [("000001", 1.0, 100), ("000002", 2.0, 50), ("000001", 1.0, 20), ("000003", 3.0, 10)])
+        self.new = self.add_snapshot("C1", "20240102", [("000001", 1.5, 100), ("000002", 2.5, 80), ("000001", 1.5, 40), ("000003", 3.5, 10)])
+
+    def test_ingest_writes_holdings(self):
+        """测试入库时批量写入持仓行"""
+        self.assertEqual(FundHolding.query.filter_by(snapshot_id=self.new.id).count(), 4)
+        frame = fund_aggregates(self.new.id)
+        navInfo, volInfo = frame.nav_info(), frame.vol_info()
+        self.assertEqual(list(volInfo), ["000001", "000002", "000003"])
+        self.assertEqual(volInfo["000001"], 140.0)
+        self.assertEqual(navInfo["000002"], 2.5)
+
+    def test_repeated_fundcode_takes_last_nav(self):
+        """测试重复基金代码取最后一行的净值，各读取路径一致"""
+        holdings = [("000001", 2.0, 100), ("000002", 1.0, 5), ("000001", 1.0, 40)]
+        snapshot = self.add_snapshot("C2", "20240102", holdings)
+        parsed = diff_engine.frame_from_rows(*zip(*holdings))
+        snapshot_cache.clear()
+        frame = fund_aggregates(snapshot.id)
+        self.assertEqual(frame.nav_info(), parsed.nav_info())
+        self.assertEqual(frame.nav_info()["000001"], 1.0)
+        self.assertEqual(frame.vol_info()["000001"], 140.0)
+        history = fund_history("C2", "000001")
+        self.assertEqual((history["nav"], history["fundvol"]), ([1.0], [140.0]))
+
+    def test_invalid_payload_is_rejected(self):
+        """测试无效数据不会留下任何行"""
+        with self.assertRaises(PayloadError):
+            store_snapshot("C1", "20240103", '[[{"navdate": "20240103", "fundcode": "000001", "nav": "x", "fundvol": "1"}]]')
+        with self.assertRaises(PayloadError):
+            store_snapshot("C1", "20240103", '{"0": []}')
+        self.assertEqual(JsonString.query.count(), 2)
+        self.assertEqual(FundHolding.query.count(), 8)
+
+    def test_endpoints_do_not_read_blobs(self):
+        """测试接口只使用持仓表，不解析jsonString"""
+        JsonString.query.update({JsonString.jsonString: "not json"})
+        db.session.commit()
+
+        data = self.client.get('/api/funds/volume-changes?custno=C1').get_json()
+        self.assertEqual(data["000001"], 20.0)
+        self.assertEqual(data["000002"], 30.0)
+        self.assertNotIn("000003", data)
+        self.assertEqual(data["date"], "20240102")
+
+        data = self.client.get('/api/funds/nav-changes?custno=C1').get_json()
+        self.assertEqual(data["000001"], 30.0)
+        self.assertEqual(data["000002"], 75.0)
+
+        text = self.client.get('/api/funds/today-changes?custno=C1').get_data(as_text=True)
+        self.assertIn("000001: Share change 20.0, Amount change 30.0", text)
+        self.assertIn("20240102 vs 20240101", text)
+
+        data = self.client.get('/api/funds/by-date?date=20240101').get_json()
+        self.assertEqual(data["000001"], 120.0)
+        self.assertEqual(data["description"], "special date")
+
+        data = self.client.get('/api/funds/compare?datef=20240101&datet=20240102').get_json()
+        self.assertEqual(data["amountInfo"], {"000001": 20.0, "000002": 30.0})
+        self.assertEqual(data["000002"], 75.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
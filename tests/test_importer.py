@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+import unittest
+
+from app.importer import import_records, iter_files
+from app.models import FundHolding, JsonString, SnapshotDelta, UnchangedSnapshot
+from tests.base import AppTestCase, make_payload
+
+
+class ImporterTestCase(AppTestCase):
+    """历史数据批量导入测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def jsonl(self, records):
+        return self.write("dump.jsonl", "\n".join(json.dumps(r) for r in records) + "\n")
+
+    def test_jsonl_import(self):
+        """测试导入 JSONL，去重并重建变化表"""
+        day1 = make_payload([("000001", 1.0, 100), ("000002", 2.0, 5)], navdate="20240101")
+        day2 = make_payload([("000001", 1.0, 120)], navdate="20240102")
+        path = self.jsonl([
+            {"custno": "C1", "date": "20240101", "payload": day1},
+            {"custno": "C1", "date": "20240102", "payload": day2},
+            {"custno": "C1", "date": "20240103", "payload": day2},
+            {"custno": "C2", "date": "20240101", "payload": json.loads(day1)},
+        ])
+        summary = import_records(iter_files([path]), chunk_size=2)
+        self.assertEqual((summary.stored, summary.unchanged, summary.holdings, summary.rejected), (3, 1, 5, 0))
+        self.assertEqual(JsonString.query.count(), 3)
+        self.assertEqual(FundHolding.query.count(), 5)
+        marker = UnchangedSnapshot.query.one()
+        self.assertEqual((marker.custno, marker.date), ("C1", "20240103"))
+        self.assertEqual(summary.custnos, {"C1", "C2"})
+        self.assertIn("rows/s", str(summary))
+
+        # Importing the same dump again only records markers
+        again = import_records(iter_files([path]))
+        self.assertEqual((again.stored, again.unchanged), (0, 4))
+
+    def test_invalid_records_are_rejected(self):
+        """测试使用与实时抓取相同的规则校验，坏记录被跳过"""
+        good = make_payload([("000001", 1.0, 100)], navdate="20240101")
+        path = self.write("bad.jsonl", "\n".join([
+            json.dumps({"custno": "C1", "date": "20240101", "payload": good}),
+            "{not json",
+            json.dumps({"custno": "C1", "date": "20240102", "payload": "[[{\"fundcode\": \"1\"}]]"}),
+            json.dumps({"custno": "C1", "date": "2024-13-01", "payload": good}),
+            json.dumps({"date": "20240102", "payload": good}),
+        ]))
+        summary = import_records(iter_files([path]))
+        self.assertEqual((summary.stored, summary.rejected), (1, 4))
+        self.assertTrue(summary.rejects[0].startswith(f"{path}:2"))
+
+    def test_xml_import(self):
+        """测试导入原始 XML 响应，custno 和日期取自文件名"""
+        payload = make_payload([("000001", 1.0, 100)], navdate="20240105")
+        path = self.write("C9_20240106.xml", f"<soap:Envelope xmlns:soap=\"urn:x\"><soap:Body><return>{payload}</return></soap:Body></soap:Envelope>")
+        summary = import_records(iter_files([path]))
+        self.assertEqual(summary.stored, 1)
+        snapshot = JsonString.query.one()
+        self.assertEqual((snapshot.custno, snapshot.date, snapshot.navdate), ("C9", "20240106", "20240105"))
+
+        broken = self.write("C9_20240107.xml", "<return>")
+        self.assertEqual(import_records(iter_files([broken])).rejected, 1)
+
+    def test_cli(self):
+        """测试 flask funds import 命令"""
+        path = self.jsonl([
+            {"custno": "C1", "date": "20240101", "payload": make_payload([("000001", 1.0, 100)], navdate="20240101")},
+            {"custno": "C1", "date": "20240102", "payload": make_payload([("000001", 1.0, 150)], navdate="20240102")},
+        ])
+        result = self.app.test_cli_runner().invoke(args=["funds", "import", path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("2 snapshots (2 holdings) stored", result.output)
+        self.assertEqual(SnapshotDelta.query.one().share_delta, 50.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from apscheduler.schedulers.base import STATE_PAUSED, STATE_RUNNING
+
+import config
+from app import create_app, db
+from app.leader import DatabaseLease, FileLease, LeaderElector
+from app.models import SchedulerLease
+from tests.base import AppTestCase
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _try_lease(path, barrier, results):
+    lease = FileLease(path)
+    results.put(lease.acquire())
+    # Hold the lease until every process has tried
+    barrier.wait()
+
+
+class FileLeaseTestCase(unittest.TestCase):
+    """文件锁选主测试用例"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "scheduler.lock")
+
+    def test_one_holder(self):
+        """测试同一时间只有一个持有者，释放后可被接管"""
+        first, second = FileLease(self.path), FileLease(self.path)
+        self.assertTrue(first.acquire())
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+        second.release()
+
+    def test_one_leader_among_processes(self):
+        """测试多个进程中只有一个获得锁"""
+        ctx = multiprocessing.get_context("fork")
+        barrier = ctx.Barrier(4)
+        results = ctx.Queue()
+        processes = [ctx.Process(target=_try_lease, args=(self.path, barrier, results)) for _ in range(4)]
+        for p in processes:
+            p.start()
+        outcomes = [results.get(timeout=30) for _ in processes]
+        for p in processes:
+            p.join()
+        self.assertEqual(outcomes.count(True), 1)
+
+
+class DatabaseLeaseTestCase(AppTestCase):
+    """数据库租约选主测试用例"""
+
+    def test_lease_expires_and_moves(self):
+        """测试租约续期、过期后被接管"""
+        first, second = DatabaseLease(self.app, ttl=60), DatabaseLease(self.app, ttl=60)
+        self.assertTrue(first.acquire())
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+
+        lease = db.session.get(SchedulerLease, "scheduler")
+        lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        self.assertTrue(second.acquire())
+        self.assertFalse(first.acquire())
+
+        second.release()
+        self.assertTrue(first.acquire())
+
+
+class LeaderElectorTestCase(unittest.TestCase):
+    """调度器选主测试用例"""
+
+    def test_resume_and_pause(self):
+        """测试获得租约时恢复调度，失去时暂停"""
+        lease = mock.Mock()
+        scheduler = mock.Mock()
+        elector = LeaderElector(lease, scheduler)
+        lease.acquire.return_value = False
+        self.assertFalse(elector.check())
+        scheduler.resume.assert_not_called()
+        lease.acquire.return_value = True
+        self.assertTrue(elector.check())
+        self.assertTrue(elector.check())
+        scheduler.resume.assert_called_once_with()
+        lease.acquire.return_value = False
+        self.assertFalse(elector.check())
+        scheduler.pause.assert_called_once_with()
+
+    def test_one_app_runs_the_jobs(self):
+        """测试多个应用实例中只有一个运行调度任务"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = {"SCHEDULER_LEADER": "file", "SCHEDULER_LEASE_PATH": os.path.join(directory, "scheduler.lock")}
+        with mock.patch.multiple(config.TestingConfig, **settings):
+            apps = [create_app('testing') for _ in range(3)]
+        electors = [app.extensions['scheduler_leader'] for app in apps]
+        for app, elector in zip(apps, electors):
+            self.addCleanup(app.apscheduler.shutdown, wait=False)
+            self.addCleanup(elector.stop)
+        self.assertEqual([e.leader for e in electors], [True, False, False])
+        self.assertEqual([app.apscheduler.state for app in apps], [STATE_RUNNING, STATE_PAUSED, STATE_PAUSED])
+        self.assertEqual([app.test_client().get('/health').get_json()["scheduler_leader"] for app in apps], [True, False, False])
+
+        # 主进程退出后由其他实例接管
+        electors[0].stop()
+        electors[1].check()
+        self.assertEqual(apps[1].apscheduler.state, STATE_RUNNING)
+
+
+    def test_database_lease_without_file_locks(self):
+        """测试没有文件锁的平台上改用数据库租约"""
+        code = (
+            "import sys; sys.modules['fcntl'] = None; sys.modules['msvcrt'] = None\n"
+            "import config; from app import create_app\n"
+            "config.TestingConfig.SCHEDULER_LEADER = 'file'\n"
+            "app = create_app('testing'); elector = app.extensions['scheduler_leader']\n"
+            "print(type(elector.lease).__name__, elector.leader); elector.stop(); app.apscheduler.shutdown(wait=False)\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.splitlines()[-1], "DatabaseLease True")
+
+
+class WsgiTestCase(unittest.TestCase):
+    """生产入口测试用例"""
+
+    def test_production_profile_whatever_flask_config_says(self):
+        """测试 wsgi 入口忽略 .env 中的 FLASK_CONFIG=development"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        env = dict(
+            os.environ,
+            FLASK_CONFIG="development",
+            DATABASE_URL=f"sqlite:///{os.path.join(directory, 'fundweb.db')}",
+            SCHEDULER_LEADER="none",
+            COLUMN_STORE_ENABLED="0",
+        )
+        code = "from wsgi import app; print(app.debug, app.config['SQLALCHEMY_ECHO']); app.apscheduler.shutdown(wait=False)"
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.splitlines()[-1], "False False")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from app.locking import lock_file, unlock_file
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+class FileLockTestCase(unittest.TestCase):
+    """跨进程文件锁测试用例"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "lock")
+
+    def test_imports_without_fcntl(self):
+        """测试没有 fcntl 的平台（Windows）上应用仍可导入"""
+        code = "import sys; sys.modules['fcntl'] = None; import app.ingest; from app import create_app"
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_msvcrt_fallback(self):
+        """测试没有 fcntl 时改用 msvcrt 锁定首字节"""
+        msvcrt = mock.Mock(LK_NBLCK=2, LK_UNLCK=0)
+        with mock.patch.dict(sys.modules, {"fcntl": None, "msvcrt": msvcrt}), open(self.path, "a+") as f:
+            self.assertTrue(lock_file(f, blocking=False))
+            msvcrt.locking.assert_called_once_with(f.fileno(), 2, 1)
+            unlock_file(f)
+            msvcrt.locking.assert_called_with(f.fileno(), 0, 1)
+
+            msvcrt.locking.side_effect = [OSError("locked"), OSError("locked"), None]
+            self.assertFalse(lock_file(f, blocking=False))
+            self.assertTrue(lock_file(f))
+
+    def test_exclusive(self):
+        """测试同一时间只有一个打开的文件持有锁"""
+        with open(self.path, "a+") as first, open(self.path, "a+") as second:
+            self.assertTrue(lock_file(first, blocking=False))
+            self.assertFalse(lock_file(second, blocking=False))
+            unlock_file(first)
+            self.assertTrue(lock_file(second, blocking=False))
+            unlock_file(second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import flask_migrate
+from alembic.script import ScriptDirectory
+from flask import Flask
+
+import config
+from app import create_app, db
+from app.models import JsonString
+from tests.base import make_payload
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "migrations")
+
+# Schema of a database created by db.create_all() before migrations were used
+BASELINE_SCHEMA = """
+CREATE TABLE employees (
+    id INTEGER NOT NULL,
+    username VARCHAR(80) NOT NULL,
+    email VARCHAR(120) NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (username),
+    UNIQUE (email)
+);
+CREATE TABLE departments (
+    id INTEGER NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE jsonstring (
+    id INTEGER NOT NULL,
+    date VARCHAR(8),
+    navdate VARCHAR(9),
+    "jsonString" VARCHAR(99999), custno TEXT DEFAULT '2403',
+    PRIMARY KEY (id)
+);
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    username VARCHAR(80) NOT NULL,
+    password_hash VARCHAR(128) NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (username)
+);
+"""
+
+
+class MigrationTestCase(unittest.TestCase):
+    """已有数据库的迁移升级测试用例"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.instance = os.path.join(self.tmp.name, "instance")
+        os.makedirs(self.instance)
+        self.path = os.path.join(self.instance, "fundweb.db")
+        conn = sqlite3.connect(self.path)
+        conn.executescript(BASELINE_SCHEMA)
+        conn.executemany("INSERT INTO jsonstring (date, navdate, jsonString, custno) VALUES (?, ?, ?, ?)", [
+            ("20240101", "20240101", make_payload([("000001", 1.0, 100)], navdate="20240101"), "C1"),
+            ("20240102", "20240102", make_payload([("000001", 1.5, 120)], navdate="20240102"), "C1"),
+        ])
+        conn.commit()
+        conn.close()
+        # 迁移命令不在实例目录下执行
+        cwd = os.path.join(self.tmp.name, "cwd")
+        os.makedirs(cwd)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(cwd)
+
+    def test_stamp_and_upgrade_relative_url(self):
+        """测试相对路径的SQLite库按实例目录解析，stamp后可升级到最新版本"""
+        with mock.patch.object(config.TestingConfig, "SQLALCHEMY_DATABASE_URI", "sqlite:///fundweb.db"), \
+                mock.patch.object(Flask, "auto_find_instance_path", return_value=self.instance):
+            app = create_app('testing')
+        self.addCleanup(app.apscheduler.shutdown, wait=False)
+        with app.app_context():
+            flask_migrate.stamp(MIGRATIONS, "363b3e881f8a")
+            flask_migrate.upgrade(MIGRATIONS)
+            self.assertEqual(JsonString.query.count(), 2)
+            self.assertTrue(all(s.content_hash for s in JsonString.query))
+            db.session.remove()
+            db.engine.dispose()
+
+        self.assertEqual(os.listdir(os.getcwd()), [])
+        conn = sqlite3.connect(self.path)
+        revision = conn.execute("SELECT version_num FROM alembic_version").fetchone()[0]
+        conn.close()
+        self.assertEqual(revision, ScriptDirectory(MIGRATIONS).get_current_head())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sqlalchemy import event
+
+from app import db
+from app.importer import import_records
+from app.ingest import store_snapshot
+from app.models import SnapshotPointer
+from app.pointers import snapshot_pair
+from tests.base import AppTestCase, make_payload
+
+
+class SnapshotPointerTestCase(AppTestCase):
+    """最新/上一日期快照指针测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.c1_day1 = self.add_snapshot("C1", "20240101", [("000001", 1.0, 100)])
+        self.c2_day1 = self.add_snapshot("C2", "20240101", [("000001", 1.0, 7)])
+        self.c2_day2 = self.add_snapshot("C2", "20240102", [("000001", 1.0, 9)])
+        self.c1_day2 = self.add_snapshot("C1", "20240102", [("000001", 1.0, 120)])
+
+    def pointer(self, custno):
+        pointer = db.session.get(SnapshotPointer, custno)
+        return pointer.latest_id, pointer.latest_date, pointer.previous_id
+
+    def test_pointer_follows_ingest(self):
+        """测试入库时更新指针"""
+        self.assertEqual(self.pointer("C1"), (self.c1_day2.id, "20240102", self.c1_day1.id))
+        self.assertEqual(self.pointer("C2"), (self.c2_day2.id, "20240102", self.c2_day1.id))
+
+    def test_same_date_refetch(self):
+        """测试同一天再次抓取只移动最新指针"""
+        again = self.add_snapshot("C1", "20240102", [("000001", 1.0, 130)])
+        self.assertEqual(self.pointer("C1"), (again.id, "20240102", self.c1_day1.id))
+        later = self.add_snapshot("C1", "20240103", [("000001", 1.0, 140)])
+        self.assertEqual(self.pointer("C1"), (later.id, "20240103", again.id))
+
+    def test_backfill_and_unchanged(self):
+        """测试补录旧日期与重复内容不改变指针"""
+        self.add_snapshot("C1", "20231231", [("000001", 1.0, 90)])
+        store_snapshot("C1", "20240103", make_payload([("000001", 1.0, 120)], navdate="20240102"))
+        self.assertEqual(self.pointer("C1"), (self.c1_day2.id, "20240102", self.c1_day1.id))
+
+    def test_batch_import(self):
+        """测试批量导入更新指针"""
+        import_records([
+            ("dump:1", "C3", "20240105", make_payload([("000001", 1.0, 1)], navdate="20240105")),
+            ("dump:2", "C3", "20240104", make_payload([("000001", 1.0, 2)], navdate="20240104")),
+        ])
+        latest, previous = snapshot_pair("C3")
+        self.assertEqual((latest.date, previous.date), ("20240105", "20240104"))
+
+    def test_without_custno_uses_newest_custno(self):
+        """测试不带 custno 时比较同一客户的两期数据"""
+        latest, previous = snapshot_pair()
+        self.assertEqual((latest.id, previous.id), (self.c1_day2.id, self.c1_day1.id))
+        data = self.client.get('/api/funds/volume-changes').get_json()
+        self.assertEqual(data["000001"], 20.0)
+        data = self.client.get('/api/funds/nav-changes').get_json()
+        self.assertEqual(data["000001"], 20.0)
+
+    def test_primary_key_reads(self):
+        """测试按 custno 查询只做主键读取"""
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        db.session.expire_all()
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            snapshot_pair("C1")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+        self.assertEqual(len(statements), 3)
+        self.assertFalse(any("ORDER BY" in s for s in statements))
+
+    def test_rows_without_pointer(self):
+        """测试没有指针的旧数据仍可比较"""
+        SnapshotPointer.query.delete()
+        db.session.commit()
+        latest, previous = snapshot_pair("C2")
+        self.assertEqual((latest.id, previous.id), (self.c2_day2.id, self.c2_day1.id))
+        latest, previous = snapshot_pair()
+        self.assertEqual((latest.id, previous.id), (self.c1_day2.id, self.c1_day1.id))
+        self.assertEqual(snapshot_pair("nobody"), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sqlalchemy import text
+
+from app import db, snapshots
+from app.ingest import payload_hash
+from app.models import FundHolding, JsonString, SnapshotDelta
+from tests.base import AppTestCase
+
+
+class QueryPlanTestCase(AppTestCase):
+    """快照查询执行计划回归测试：任何查询都不能退化为全表扫描"""
+
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 4):
+            for custno in ("C1", "C2"):
+                self.add_snapshot(custno, f"2024010{day}", [("000001", 1.0, day), ("000002", 2.0, day)])
+
+    def explain(self, query):
+        sql = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True})
+        return [row[3] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+    def assertIndexed(self, query, allow_temp=False):
+        plan = self.explain(query)
+        for detail in plan:
+            self.assertFalse(detail.startswith("SCAN"), f"full scan in plan: {plan}")
+            if not allow_temp:
+                self.assertNotIn("TEMP B-TREE", detail, f"sort in plan: {plan}")
+        return plan
+
+    def test_latest_snapshot(self):
+        """测试最新快照查询走(custno, date, id)索引且无需排序"""
+        plan = self.assertIndexed(snapshots.latest_snapshot_query("C1").limit(1))
+        self.assertIn("ix_jsonstring_custno_date_id", plan[0])
+
+    def test_previous_snapshot(self):
+        """测试上一日期快照查询走索引范围扫描"""
+        plan = self.assertIndexed(snapshots.previous_snapshot_query("C1", "20240103").limit(1))
+        self.assertIn("date<?", plan[0])
+        self.assertEqual(snapshots.previous_snapshot("C1", "20240103").date, "20240102")
+
+    def test_latest_on_or_before(self):
+        """测试“某日及之前最新快照”走索引范围扫描"""
+        plan = self.assertIndexed(snapshots.latest_on_or_before_query("20240102", "C1").limit(1))
+        self.assertIn("ix_jsonstring_custno_date_id", plan[0])
+        self.assertIn("date<?", plan[0])
+        plan = self.assertIndexed(snapshots.latest_on_or_before_query("20240102").limit(1))
+        self.assertIn("ix_jsonstring_date", plan[0])
+
+    def test_snapshots_between(self):
+        """测试日期区间查询走索引范围扫描"""
+        plan = self.assertIndexed(snapshots.snapshots_between_query("20240101", "20240102", "C1"))
+        self.assertIn("date>? AND date<?", plan[0])
+        self.assertIndexed(snapshots.snapshots_between_query("20240101", "20240102"))
+
+    def test_snapshot_listing(self):
+        """测试快照列表的游标分页走索引且无需排序"""
+        plan = self.assertIndexed(snapshots.snapshot_listing_query("C1", ("20240101", 1)).limit(10))
+        self.assertIn("ix_jsonstring_custno_date_id", plan[0])
+        plan = self.assertIndexed(snapshots.snapshot_listing_query(None, ("20240101", 1)).limit(10))
+        self.assertIn("ix_jsonstring_date", plan[0])
+
+    def test_latest_marker_on_or_before(self):
+        """测试“某日及之前最新未变化标记”走(custno, date)索引"""
+        plan = self.assertIndexed(snapshots.latest_marker_on_or_before_query("20240102", "C1").limit(1), allow_temp=True)
+        self.assertIn("ix_unchanged_snapshots_custno_date", plan[0])
+
+    def test_duplicate_lookup(self):
+        """测试内容哈希查重走(custno, content_hash)唯一索引"""
+        plan = self.assertIndexed(JsonString.query.filter_by(custno="C1", content_hash=payload_hash("x")).limit(1))
+        self.assertIn("ux_jsonstring_custno_hash", plan[0])
+
+    def test_snapshot_by_id(self):
+        """测试按主键查询"""
+        self.assertIndexed(JsonString.query.filter_by(id=3))
+
+    def test_fund_aggregates(self):
+        """测试持仓聚合只读取单个快照的行"""
+        query = db.session.query(FundHolding.fundcode).filter(FundHolding.snapshot_id == 1).order_by(FundHolding.id)
+        self.assertIndexed(query)
+
+    def test_fund_history(self):
+        """测试单只基金历史走覆盖索引，不回表读取持仓"""
+        plan = self.assertIndexed(snapshots.fund_history_query("C1", "000001", "20240101", "20240103"), allow_temp=True)
+        self.assertIn("COVERING INDEX ix_fund_holdings_custno_fundcode", plan[0])
+
+    def test_stored_deltas(self):
+        """测试读取预计算变化走(snapshot_id, previous_id)索引"""
+        query = SnapshotDelta.query.filter(SnapshotDelta.snapshot_id == 3, SnapshotDelta.previous_id == 1).order_by(SnapshotDelta.id)
+        plan = self.assertIndexed(query, allow_temp=True)
+        self.assertIn("ix_snapshot_deltas_pair", plan[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
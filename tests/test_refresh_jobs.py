@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import app as app_module
+from app.fetcher import FetchSummary
+from app.jobs import RefreshQueue
+from tests.base import AppTestCase
+
+
+def wait_for(client, url, timeout=5.0):
+    deadline = time.time() + timeout
+    while True:
+        data = client.get(url).get_json()
+        if data["status"] not in ("queued", "running") or time.time() > deadline:
+            return data
+        time.sleep(0.01)
+
+
+class RefreshJobTestCase(AppTestCase):
+    """后台刷新任务测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.release = threading.Event()
+        self.calls = []
+
+        def fake_fetch(custnos, progress=None):
+            self.calls.append(sorted(custnos))
+            self.release.wait(5)
+            summary = FetchSummary()
+            for custno in custnos:
+                if custno == "bad":
+                    progress(custno, RuntimeError("HTTP 500"))
+                else:
+                    progress(custno, None)
+            return summary
+
+        patcher = mock.patch.object(app_module, 'fetch_and_store_fund_data_for_custnos', side_effect=fake_fetch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Do not leave a blocked job behind for the next test
+        self.addCleanup(self.release.set)
+
+    def test_refresh_returns_job_immediately(self):
+        """测试刷新接口立即返回任务号，结果通过轮询获取"""
+        response = self.client.post('/api/funds/refresh', data={"custno": "C1"})
+        self.assertEqual(response.status_code, 202)
+        data = response.get_json()
+        self.assertIn(data["status"], ("queued", "running"))
+        self.assertFalse(data["coalesced"])
+
+        self.release.set()
+        job = wait_for(self.client, data["status_url"])
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["results"], {"C1": {"status": "ok"}})
+        self.assertEqual((job["done"], job["total"]), (1, 1))
+
+    def test_concurrent_refreshes_coalesce(self):
+        """测试相同 custno 的并发刷新合并为一个任务"""
+        first = self.client.post('/api/funds/refresh', data={"custno": "C1"}).get_json()
+        second = self.client.post('/api/funds/refresh', data={"custno": "C1"}).get_json()
+        other = self.client.post('/api/funds/refresh', data={"custno": "C2"}).get_json()
+        self.assertEqual(first["job_id"], second["job_id"])
+        self.assertTrue(second["coalesced"])
+        self.assertNotEqual(first["job_id"], other["job_id"])
+
+        self.release.set()
+        wait_for(self.client, first["status_url"])
+        wait_for(self.client, other["status_url"])
+        self.assertEqual(sorted(self.calls), [["C1"], ["C2"]])
+
+        # Once finished, a new refresh starts a new job
+        third = self.client.post('/api/funds/refresh', data={"custno": "C1"}).get_json()
+        self.assertNotEqual(third["job_id"], first["job_id"])
+        wait_for(self.client, third["status_url"])
+
+    def test_overlapping_refreshes_fetch_each_custno_once(self):
+        """测试部分重叠的刷新只抓取尚未在抓取中的 custno"""
+        self.add_snapshot("C1", "20240101", [("000001", 1.0, 100)])
+        self.add_snapshot("C2", "20240101", [("000001", 1.0, 100)])
+        first = self.client.post('/api/funds/refresh').get_json()
+        second = self.client.post('/api/funds/refresh', data={"custno": "C2"}).get_json()
+        self.assertEqual(first["job_id"], second["job_id"])
+        self.add_snapshot("C3", "20240101", [("000001", 1.0, 100)])
+        third = self.client.post('/api/funds/refresh').get_json()
+        self.assertNotEqual(third["job_id"], first["job_id"])
+
+        self.release.set()
+        job = wait_for(self.client, third["status_url"])
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["results"], {c: {"status": "ok"} for c in ("C1", "C2", "C3")})
+        self.assertEqual(sorted(self.calls), [["C1", "C2"], ["C3"]])
+
+    def test_scheduled_fetch_shares_the_queue(self):
+        """测试定时任务与手动刷新不会同时抓取同一个 custno"""
+        # job1 writes its log to the cwd
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp.name)
+        manual = self.client.post('/api/funds/refresh', data={"custno": "C1"}).get_json()
+        scheduled = threading.Thread(target=app_module.fetch_and_store_fund_data, args=(1, 2))
+        with mock.patch.dict('os.environ', {"DEFAULT_CUSTNOS": "C1,C2"}):
+            scheduled.start()
+            deadline = time.time() + 5
+            while len(self.calls) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(sorted(self.calls), [["C1"], ["C2"]])
+
+        self.release.set()
+        scheduled.join(5)
+        self.assertFalse(scheduled.is_alive())
+        self.assertEqual(wait_for(self.client, manual["status_url"])["status"], "done")
+        self.assertFalse(app_module.lock.locked())
+
+    def test_per_custno_failures_are_reported(self):
+        """测试按 custno 报告失败原因"""
+        self.release.set()
+        self.add_snapshot("C1", "20240101", [("000001", 1.0, 100)])
+        self.add_snapshot("bad", "20240101", [("000001", 1.0, 100)])
+        data = self.client.post('/api/funds/refresh').get_json()
+        job = wait_for(self.client, data["status_url"])
+        self.assertEqual(job["custnos"], ["C1", "bad"])
+        self.assertEqual(job["results"]["C1"], {"status": "ok"})
+        self.assertEqual(job["results"]["bad"], {"status": "failed", "error": "HTTP 500"})
+
+    def test_unknown_job(self):
+        """测试查询不存在的任务返回 404"""
+        self.assertEqual(self.client.get('/api/funds/refresh/nope').status_code, 404)
+
+
+class RefreshQueueTestCase(unittest.TestCase):
+    """刷新任务队列测试用例"""
+
+    def test_failed_job_and_history(self):
+        """测试任务异常被记录，且只保留最近的已完成任务"""
+        queue = RefreshQueue(max_workers=1, history=2)
+        app = app_module.create_app('testing')
+
+        def boom(custnos, progress):
+            raise RuntimeError("upstream down")
+
+        jobs = [queue.submit(app, [str(i)], boom)[0] for i in range(3)]
+        deadline = time.time() + 5
+        while any(job.active for job in jobs) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(jobs[2].state, "failed")
+        self.assertEqual(jobs[2].error, "upstream down")
+        queue.submit(app, ["x"], lambda custnos, progress: None)
+        self.assertIsNone(queue.get(jobs[0].id))
+        self.assertLessEqual(len(queue), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
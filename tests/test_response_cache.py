@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.deltas import recompute_deltas
+from app.response_cache import MemoryBackend, SQLiteBackend, response_cache
+from config import TestingConfig
+from tests.base import AppTestCase
+
+
+class ResponseCacheTestCase(AppTestCase):
+    """接口响应缓存测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        response_cache.configure(response_cache.backend, os.path.join(self.directory, "responses.generation"))
+        for custno in ("C1", "C2"):
+            self.add_snapshot(custno, "20240101", [("000001", 1.0, 100)])
+            self.add_snapshot(custno, "20240102", [("000001", 1.0, 120)])
+
+    def statements_of(self, url):
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        db.session.expire_all()
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            response = self.client.get(url)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+        return response, statements
+
+    def test_repeat_is_served_from_cache(self):
+        """测试相同请求第二次直接返回缓存的响应"""
+        url = "/api/funds/nav-changes?custno=C1"
+        first, statements = self.statements_of(url)
+        self.assertTrue(any("snapshot_deltas" in s for s in statements))
+        second, statements = self.statements_of(url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.headers["ETag"], first.headers["ETag"])
+        self.assertEqual(second.mimetype, "application/json")
+        self.assertFalse(any("snapshot_deltas" in s or "fund_holdings" in s for s in statements))
+
+        text = self.client.get("/api/funds/today-changes?custno=C1")
+        again = self.client.get("/api/funds/today-changes?custno=C1")
+        self.assertEqual(again.data, text.data)
+        self.assertEqual(again.mimetype, "text/html")
+
+    def test_ingest_invalidates_custno(self):
+        """测试新快照入库只清除该客户的缓存"""
+        for custno in ("C1", "C2"):
+            self.client.get(f"/api/funds/nav-changes?custno={custno}")
+            self.client.get(f"/api/funds/history?custno={custno}&fundcode=000001")
+        self.assertEqual(response_cache.stats()["entries"], 4)
+        self.add_snapshot("C1", "20240103", [("000001", 1.0, 150)])
+        self.assertEqual(response_cache.stats()["entries"], 2)
+        data = self.client.get("/api/funds/nav-changes?custno=C1").get_json()
+        self.assertEqual(data["000001"], 30.0)
+
+        # 不带 custno 的响应按解析出的客户缓存
+        self.client.get("/api/funds/volume-changes")
+        entries = response_cache.stats()["entries"]
+        self.add_snapshot("C1", "20240104", [("000001", 1.0, 160)])
+        self.assertEqual(response_cache.stats()["entries"], entries - 2)
+
+    def test_recompute_deltas_invalidates(self):
+        """测试重建差异后清除缓存"""
+        self.client.get("/api/funds/nav-changes?custno=C2")
+        recompute_deltas(["C2"])
+        self.assertEqual(response_cache.stats()["entries"], 0)
+
+    def test_recompute_deltas_changes_key_of_other_workers(self):
+        """测试重建差异后其他进程的内存缓存不再命中"""
+        url = "/api/funds/nav-changes?custno=C2"
+        first = self.client.get(url)
+        # 其他进程的内存缓存收不到清除
+        with mock.patch.object(response_cache, "invalidate"):
+            recompute_deltas(["C2"])
+        self.assertEqual(response_cache.stats()["entries"], 1)
+        second, statements = self.statements_of(url)
+        self.assertNotEqual(second.headers["ETag"], first.headers["ETag"])
+        self.assertTrue(any("snapshot_deltas" in s for s in statements))
+        self.assertEqual(second.data, first.data)
+
+    def test_startup_keeps_shared_cache(self):
+        """测试新进程启动时不清空共享的SQLite缓存"""
+        path = os.path.join(self.directory, "responses.db")
+        with mock.patch.multiple(TestingConfig, RESPONSE_CACHE_BACKEND="sqlite", RESPONSE_CACHE_PATH=path):
+            for worker in range(2):
+                app = create_app('testing')
+                self.addCleanup(app.apscheduler.shutdown, wait=False)
+                if worker == 0:
+                    response_cache.put("k1", ["C1"], b"one", "application/json")
+        self.assertEqual(response_cache.get("k1"), (b"one", "application/json"))
+
+    def test_errors_are_not_cached(self):
+        """测试错误响应不进入缓存"""
+        self.client.get("/api/funds/nav-changes?custno=nobody")
+        self.client.get("/api/funds/by-date?date=20000101")
+        self.assertEqual(response_cache.stats()["entries"], 0)
+
+
+class BackendTestCase(unittest.TestCase):
+    """缓存后端测试用例"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def check_backend(self, backend):
+        backend.put("k1", ["C1"], b"one", "application/json")
+        backend.put("k2", ["C1", "C2"], b"two", "text/html")
+        backend.put("k3", ["C3"], b"three", "application/json")
+        self.assertEqual(backend.get("k2"), (b"two", "text/html"))
+        self.assertEqual(backend.invalidate(["C2"]), 1)
+        self.assertIsNone(backend.get("k2"))
+        self.assertEqual(backend.get("k1"), (b"one", "application/json"))
+        self.assertEqual(backend.invalidate(["C1", "C3"]), 2)
+        self.assertEqual(backend.stats()["entries"], 0)
+
+    def test_memory(self):
+        """测试进程内后端"""
+        self.check_backend(MemoryBackend())
+
+    def test_sqlite(self):
+        """测试 SQLite 后端"""
+        self.check_backend(SQLiteBackend(os.path.join(self.directory, "responses.db")))
+
+    def test_sqlite_is_shared(self):
+        """测试多个进程共享同一个 SQLite 文件"""
+        path = os.path.join(self.directory, "responses.db")
+        worker1, worker2 = SQLiteBackend(path), SQLiteBackend(path)
+        worker1.put("k1", ["C1"], b"one", "application/json")
+        self.assertEqual(worker2.get("k1"), (b"one", "application/json"))
+        worker2.invalidate(["C1"])
+        self.assertIsNone(worker1.get("k1"))
+
+    def test_sqlite_evicts_least_recently_used(self):
+        """测试超过条目上限时淘汰最久未用的条目"""
+        backend = SQLiteBackend(os.path.join(self.directory, "responses.db"), max_entries=2)
+        backend.put("k1", ["C1"], b"one", "application/json")
+        backend.put("k2", ["C1"], b"two", "application/json")
+        backend.get("k1")
+        backend.put("k3", ["C1"], b"three", "application/json")
+        self.assertIsNone(backend.get("k2"))
+        self.assertIsNotNone(backend.get("k1"))
+        self.assertEqual(backend.stats()["entries"], 2)
+
+    def test_sqlite_errors_are_misses(self):
+        """测试缓存文件不可用时按未命中处理"""
+        backend = SQLiteBackend(self.directory)
+        self.assertIsNone(backend.get("k1"))
+        backend.put("k1", ["C1"], b"one", "application/json")
+        self.assertGreater(backend.stats()["errors"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import glob
+import gzip
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from app import db
+from app.ingest import store_snapshot
+from app.models import ArchivedSnapshot, FundHolding, FundRollup, JsonString, SnapshotDelta, UnchangedSnapshot
+from app.retention import apply_retention, restore_snapshots
+from tests.base import AppTestCase, make_payload
+
+
+class RetentionTestCase(AppTestCase):
+    """快照保留、汇总与归档测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.add_snapshot("C1", "20240101", [("000001", 1.0, 100)])
+        self.add_snapshot("C1", "20240102", [("000001", 1.2, 110)])
+        self.add_snapshot("C1", "20240103", [("000001", 0.9, 120), ("000002", 2.0, 5)])
+        self.add_snapshot("C1", "20240108", [("000001", 1.1, 130)])
+        self.add_snapshot("C1", "20240201", [("000001", 1.3, 140)])
+        self.add_snapshot("C1", "20240301", [("000001", 1.4, 150)])
+        self.add_snapshot("C1", "20240302", [("000001", 1.5, 160)])
+        # 1月4日抓取的数据与1月3日相同
+        store_snapshot("C1", "20240104", make_payload([("000001", 0.9, 120), ("000002", 2.0, 5)], navdate="20240103"))
+        # 长期未变化的客户
+        self.add_snapshot("C2", "20240101", [("000001", 1.0, 7)])
+        store_snapshot("C2", "20240305", make_payload([("000001", 1.0, 7)], navdate="20240101"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def retain(self, today, **kwargs):
+        return apply_retention(30, self.tmp.name, today=today, **kwargs)
+
+    def rollup(self, period, start, fundcode="000001"):
+        return FundRollup.query.filter_by(custno="C1", fundcode=fundcode, period=period, period_start=start).one()
+
+    def archive_lines(self):
+        count = 0
+        for path in glob.glob(os.path.join(self.tmp.name, "*", "*", "*.jsonl.gz")):
+            with gzip.open(path, "rt") as f:
+                count += sum(1 for _ in f)
+        return count
+
+    def test_moves_old_snapshots_out(self):
+        """测试过期快照被归档删除，最新两期与仍被引用的快照保留"""
+        summary = self.retain(date(2024, 3, 10), batch_size=2)
+        self.assertEqual(summary.archived, 5)
+        kept = sorted((s.custno, s.date) for s in JsonString.query)
+        self.assertEqual(kept, [("C1", "20240301"), ("C1", "20240302"), ("C2", "20240101")])
+        ids = {s.id for s in JsonString.query}
+        self.assertTrue(all(h.snapshot_id in ids for h in FundHolding.query))
+        self.assertTrue(all(d.snapshot_id in ids and d.previous_id in ids for d in SnapshotDelta.query))
+        self.assertEqual([m.date for m in UnchangedSnapshot.query], ["20240305"])
+        self.assertEqual(ArchivedSnapshot.query.count(), 5)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "2024", "01", "20240103.jsonl.gz")))
+        self.assertEqual(self.archive_lines(), 5)
+
+        response = self.client.get('/api/funds/nav-changes?custno=C1')
+        self.assertEqual(response.status_code, 200)
+
+    def test_rollups(self):
+        """测试按周、按月汇总"""
+        self.retain(date(2024, 3, 10))
+        week = self.rollup("week", "20240101")
+        self.assertEqual((week.snapshots, week.last_date, week.nav_last, week.fundvol_last), (3, "20240103", 0.9, 120.0))
+        self.assertEqual((week.nav_min, week.nav_max, week.fundvol_sum), (0.9, 1.2, 330.0))
+        self.assertEqual(self.rollup("week", "20240108").snapshots, 1)
+        month = self.rollup("month", "20240101")
+        self.assertEqual((month.snapshots, month.last_date, month.fundvol_last), (4, "20240108", 130.0))
+        self.assertEqual(self.rollup("month", "20240101", "000002").snapshots, 1)
+
+    def test_rollup_of_repeated_fundcode_takes_last_nav(self):
+        """测试重复基金代码汇总时取最后一行的净值"""
+        self.add_snapshot("C3", "20240102", [("000001", 2.0, 100), ("000001", 1.0, 40)])
+        self.add_snapshot("C3", "20240301", [("000001", 1.0, 1)])
+        self.add_snapshot("C3", "20240302", [("000001", 1.0, 2)])
+        self.retain(date(2024, 3, 10))
+        week = FundRollup.query.filter_by(custno="C3", fundcode="000001", period="week", period_start="20240101").one()
+        self.assertEqual((week.nav_last, week.fundvol_last), (1.0, 140.0))
+
+    def test_rollups_merge_across_runs(self):
+        """测试跨多次运行的汇总合并"""
+        self.retain(date(2024, 2, 2))
+        self.assertEqual(self.rollup("week", "20240101").snapshots, 2)
+        self.retain(date(2024, 3, 10))
+        week = self.rollup("week", "20240101")
+        self.assertEqual((week.snapshots, week.last_date, week.fundvol_sum), (3, "20240103", 330.0))
+
+    def test_restore(self):
+        """测试从归档恢复，再次清理时不重复归档与汇总"""
+        self.retain(date(2024, 3, 10))
+        summary = restore_snapshots(self.tmp.name, date(2024, 1, 1), date(2024, 1, 31), {"C1"})
+        self.assertEqual(summary.stored, 4)
+        self.assertEqual(JsonString.query.filter_by(custno="C1", date="20240103").one().navdate, "20240103")
+        self.assertEqual(FundHolding.query.filter_by(custno="C1", fundcode="000002").count(), 1)
+
+        summary = self.retain(date(2024, 3, 10))
+        self.assertEqual((summary.archived, summary.dropped), (0, 4))
+        self.assertEqual(self.rollup("month", "20240101").snapshots, 4)
+        self.assertEqual(self.archive_lines(), 5)
+        self.assertEqual(JsonString.query.filter_by(custno="C1").count(), 2)
+
+    def test_history_by_period(self):
+        """测试历史接口按周返回汇总序列"""
+        self.retain(date(2024, 3, 10))
+        data = self.client.get('/api/funds/history?custno=C1&fundcode=000001&period=week').get_json()
+        self.assertEqual(data["dates"], ["20240101", "20240108", "20240129"])
+        self.assertEqual(data["fundvol"], [120.0, 130.0, 140.0])
+        self.assertEqual(data["snapshots"], [3, 1, 1])
+        self.assertEqual(data["period"], "week")
+        self.assertEqual(self.client.get('/api/funds/history?custno=C1&fundcode=000001&period=day').status_code, 400)
+
+    def test_nothing_to_archive(self):
+        """测试保留期内的数据不受影响"""
+        summary = self.retain(date(2024, 1, 5))
+        self.assertEqual(summary.archived, 0)
+        self.assertEqual(JsonString.query.count(), 8)
+        self.assertEqual(db.session.query(FundRollup).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from apscheduler.util import ref_to_obj
+from flask import current_app
+
+import app as app_module
+from app.fetcher import FetchSummary
+from config import Config
+from tests.base import AppTestCase
+
+
+class ScheduledJobTestCase(AppTestCase):
+    """定时任务测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def test_job_ref_resolves_to_package_function(self):
+        """测试任务引用指向同一个模块对象，而不是重复导入的 app.__init__"""
+        self.assertIs(ref_to_obj(Config.JOBS[0]['func']), app_module.fetch_and_store_fund_data)
+
+    def test_job_runs_in_existing_app(self):
+        """测试任务在已创建的应用中运行，不再每次调用 create_app"""
+        seen = []
+
+        def fake_fetch(custnos, progress=None):
+            seen.append(current_app._get_current_object())
+            return FetchSummary()
+
+        with mock.patch.object(app_module, 'create_app', side_effect=AssertionError("create_app called")), \
+                mock.patch.object(app_module, 'fetch_and_store_fund_data_for_custnos', side_effect=fake_fetch):
+            app_module.fetch_and_store_fund_data(1, 2)
+
+        self.assertEqual(seen, [self.app])
+        with open("apscheduler_job1.log") as f:
+            log = f.read()
+        self.assertIn("startup ", log)
+        self.assertIn("0/0 custno fetched", log)
+        self.assertFalse(app_module.lock.locked())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import unittest
+
+from sqlalchemy import event
+
+from app import db
+from tests.base import AppTestCase
+
+
+class SnapshotListingTestCase(AppTestCase):
+    """快照列表分页接口测试用例"""
+
+    def setUp(self):
+        super().setUp()
+        # 按日期乱序写入，列表仍按 (date, id) 排序
+        self.add_snapshot("C1", "20240103", [("000001", 1.0, 1)])
+        for day in ("20240101", "20240102"):
+            self.add_snapshot("C1", day, [("000001", 1.0, 1), ("000002", 2.0, 2), ("000002", 2.0, 3)])
+            self.add_snapshot("C2", day, [("000001", 1.0, 5)])
+
+    def get(self, query):
+        response = self.client.get(f'/api/funds/snapshots?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        return response.get_json()
+
+    def test_metadata(self):
+        """测试返回元数据而非负载内容"""
+        data = self.get("custno=C1&limit=1")
+        item = data["snapshots"][0]
+        self.assertEqual(set(item), {"id", "date", "navdate", "custno", "payload_bytes", "funds"})
+        self.assertEqual((item["date"], item["navdate"], item["custno"], item["funds"]), ("20240101", "20240101", "C1", 2))
+        self.assertGreater(item["payload_bytes"], 0)
+
+    def test_keyset_pages(self):
+        """测试游标分页遍历全部快照"""
+        seen = []
+        query = "limit=2"
+        while True:
+            data = self.get(query)
+            seen.extend((s["date"], s["custno"]) for s in data["snapshots"])
+            if data["next"] is None:
+                break
+            query = f"limit=2&after={data['next']}"
+        self.assertEqual(seen, [
+            ("20240101", "C1"), ("20240101", "C2"), ("20240102", "C1"), ("20240102", "C2"), ("20240103", "C1"),
+        ])
+
+    def test_custno_filter(self):
+        """测试按 custno 过滤"""
+        data = self.get("custno=C2")
+        self.assertEqual([s["date"] for s in data["snapshots"]], ["20240101", "20240102"])
+        self.assertIsNone(data["next"])
+        first = self.get("custno=C2&limit=1")
+        data = self.get(f"custno=C2&after={first['next']}")
+        self.assertEqual([s["date"] for s in data["snapshots"]], ["20240102"])
+
+    def test_payload_not_loaded(self):
+        """测试不读取 jsonString 列"""
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            self.get("limit=10")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+        self.assertTrue(statements)
+        for statement in statements:
+            self.assertIsNone(re.search(r'"jsonString"(?!\))', statement), statement)
+
+    def test_bad_parameters(self):
+        """测试非法的 limit 与游标返回 400"""
+        for query in ("limit=0", "limit=abc", "limit=100000", "after=20240101", "after=2024:1", "after=20240101:x"):
+            self.assertEqual(self.client.get(f'/api/funds/snapshots?{query}').status_code, 400, query)
+
+
+if __name__ == '__main__':
+    unittest.main()
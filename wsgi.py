@@ -0,0 +1,21 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    waitress-serve --listen=0.0.0.0:5000 --threads=8 wsgi:app
+
+Every worker process builds its own app; only the one holding the
+scheduler lease (SCHEDULER_LEADER) runs the scheduled jobs, the others
+only serve HTTP. The app always uses the production profile: FLASK_CONFIG
+(development in .env.sample) only applies to run.py.
+"""
+from os.path import join, dirname
+
+from dotenv import load_dotenv
+
+dotenv_path = join(dirname(__file__), '.env')  # Address of your .env file
+load_dotenv(dotenv_path)
+
+from app import create_app
+
+app = create_app('production')